@@ -1,11 +1,15 @@
 import json
+import sqlite3
+import time
 from base64 import b64decode, b64encode
 from typing import Any
 
 import httpx
 from redis import asyncio as redis
+from redis.exceptions import NoScriptError
 
 from core.config import cache_rate_limit_settings as settings
+from core.local_cache import SqliteRedis
 
 
 class UpstashRestRedis:
@@ -37,11 +41,12 @@ class UpstashRestRedis:
             self._client = httpx.AsyncClient(timeout=5.0, headers=self._headers)
         return self._client
 
+    async def _post(self, *parts: Any) -> httpx.Response:
+        return await self._http().post(self._url, json=[str(part) for part in parts])
+
     async def _command(self, *parts: Any) -> Any:
         """Run one Redis command; ``None`` if it failed, matching the client."""
-        response = await self._http().post(
-            self._url, json=[str(part) for part in parts]
-        )
+        response = await self._post(*parts)
         if response.status_code != 200:
             return None
         return response.json().get("result")
@@ -49,6 +54,9 @@ class UpstashRestRedis:
     async def get(self, key: str) -> Any:
         return await self._command("GET", key)
 
+    async def mget(self, keys: list[str]) -> list[Any] | None:
+        return await self._command("MGET", *keys)
+
     async def setex(self, key: str, ttl_seconds: int, value: str) -> Any:
         return await self._command("SET", key, value, "EX", ttl_seconds)
 
@@ -63,32 +71,78 @@ class UpstashRestRedis:
     async def expire(self, key: str, ttl_seconds: int) -> Any:
         return await self._command("EXPIRE", key, ttl_seconds)
 
-    async def delete(self, key: str) -> Any:
-        return await self._command("DEL", key)
+    async def delete(self, *keys: str) -> int:
+        result = await self._command("DEL", *keys)
+        return int(result) if result is not None else 0
+
+    async def sadd(self, key: str, *members: str) -> Any:
+        return await self._command("SADD", key, *members)
+
+    async def smembers(self, key: str) -> list[str]:
+        return await self._command("SMEMBERS", key) or []
+
+    async def zincrby(self, key: str, amount: float, member: str) -> Any:
+        return await self._command("ZINCRBY", key, amount, member)
+
+    async def zrevrange(
+        self, key: str, start: int, end: int, withscores: bool = False
+    ) -> list[Any]:
+        parts = ["ZREVRANGE", key, start, end] + (["WITHSCORES"] if withscores else [])
+        result = await self._command(*parts) or []
+        if not withscores:
+            return result
+        # REST returns a flat member, score, member, score list; redis-py pairs.
+        return [(result[i], float(result[i + 1])) for i in range(0, len(result) - 1, 2)]
+
+    async def eval(self, script: str, numkeys: int, *keys_and_args: Any) -> Any:
+        return await self._command("EVAL", script, numkeys, *keys_and_args)
+
+    async def script_load(self, script: str) -> str | None:
+        return await self._command("SCRIPT", "LOAD", script)
 
+    async def evalsha(self, sha: str, numkeys: int, *keys_and_args: Any) -> Any:
+        response = await self._post("EVALSHA", sha, numkeys, *keys_and_args)
+        if response.status_code != 200:
+            # Raised like redis-py does, so run_script can resend the body.
+            if "NOSCRIPT" in response.text:
+                raise NoScriptError(response.text)
+            return None
+        return response.json().get("result")
 
-_client: redis.Redis | UpstashRestRedis | None = None
+
+_client: redis.Redis | UpstashRestRedis | SqliteRedis | None = None
 
 
 def redis_enabled() -> bool:
-    return bool(settings.redis_url) or bool(
-        settings.upstash_rest_url and settings.upstash_rest_token
+    return (
+        bool(settings.redis_url)
+        or bool(settings.upstash_rest_url and settings.upstash_rest_token)
+        or bool(settings.local_cache_path)
     )
 
 
-def get_redis() -> redis.Redis | UpstashRestRedis | None:
+def get_redis() -> redis.Redis | UpstashRestRedis | SqliteRedis | None:
     global _client
     if _client is not None:
         return _client
 
     # A wire-protocol URL wins when both are set: it is the faster transport
-    # and the one the rest of the ecosystem assumes.
+    # and the one the rest of the ecosystem assumes. The local file is a last
+    # resort, since it is only shared by processes on the same machine.
     if settings.redis_url:
         _client = redis.from_url(settings.redis_url, decode_responses=True)
     elif settings.upstash_rest_url and settings.upstash_rest_token:
         _client = UpstashRestRedis(
             settings.upstash_rest_url, settings.upstash_rest_token
         )
+    elif settings.local_cache_path:
+        try:
+            _client = SqliteRedis(
+                settings.local_cache_path, settings.local_cache_compact_interval_seconds
+            )
+        except (OSError, sqlite3.Error):
+            # An unwritable path leaves the app uncached, as before, not down.
+            return None
 
     return _client
 
@@ -109,6 +163,36 @@ async def get_json(key: str) -> dict[str, Any] | None:
         return None
 
 
+async def get_many_json(keys: list[str]) -> dict[str, dict[str, Any]] | None:
+    """Every key that holds JSON, read in one MGET; ``None`` if the read failed.
+
+    Missing and unreadable keys are simply absent from the result. A failed
+    read is reported separately so callers can tell "nothing is cached" from
+    "could not ask", and fall back to :func:`get_json` for the latter.
+    """
+    if not keys:
+        return {}
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        values = await client.mget(keys)
+    except Exception:
+        return None
+    if not isinstance(values, list) or len(values) != len(keys):
+        return None
+
+    found: dict[str, dict[str, Any]] = {}
+    for key, value in zip(keys, values):
+        if not value:
+            continue
+        try:
+            found[key] = json.loads(value)
+        except ValueError:
+            continue
+    return found
+
+
 async def set_json(key: str, value: dict[str, Any], ttl_seconds: int) -> None:
     client = get_redis()
     if client is None:
@@ -119,6 +203,154 @@ async def set_json(key: str, value: dict[str, Any], ttl_seconds: int) -> None:
         return
 
 
+async def delete(*keys: str) -> None:
+    client = get_redis()
+    if client is None or not keys:
+        return
+    try:
+        await client.delete(*keys)
+    except Exception:
+        return
+
+
+# script body -> SHA1 the server returned from SCRIPT LOAD.
+_script_shas: dict[str, str] = {}
+
+
+async def run_script(script: str, keys: list[str], args: list[Any]) -> Any:
+    """Run a Lua script in one round trip; ``None`` when it could not run.
+
+    Each script is loaded once and then called by its SHA, so a request sends
+    a 40-character digest rather than the whole body. A server that has since
+    lost the script (a restart, ``SCRIPT FLUSH``, a failover) answers
+    ``NOSCRIPT`` and gets the body once more through ``EVAL``, which also
+    caches it there again.
+
+    Callers keep a command-by-command fallback for ``None``, so a server with
+    scripting disabled degrades to slower requests rather than failed ones.
+    """
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        sha = _script_shas.get(script)
+        if sha is None:
+            sha = await client.script_load(script)
+            if not sha:
+                return None
+            _script_shas[script] = sha
+        try:
+            return await client.evalsha(sha, len(keys), *keys, *args)
+        except NoScriptError:
+            return await client.eval(script, len(keys), *keys, *args)
+    except Exception:
+        return None
+
+
+# KEYS come in pairs per tag: the tag's index of generations, then the set for
+# generation ARGV[2]. Adds the generation to the index and every key in
+# ARGV[3..] to the set, and stretches both TTLs to at least ARGV[1] so neither
+# expires before the keys it indexes.
+TAG_SCRIPT = """
+local ttl = tonumber(ARGV[1])
+for i = 1, #KEYS, 2 do
+  redis.call('SADD', KEYS[i], ARGV[2])
+  redis.call('SADD', KEYS[i + 1], unpack(ARGV, 3))
+  for j = i, i + 1 do
+    if redis.call('TTL', KEYS[j]) < ttl then
+      redis.call('EXPIRE', KEYS[j], ttl)
+    end
+  end
+end
+return #KEYS / 2
+"""
+
+# Keys deleted per DEL when purging, keeping each command a sensible size.
+PURGE_CHUNK = 500
+
+# A tag's keys are indexed in one set per week they were written in. A single
+# set had its TTL stretched by every write and so never expired, keeping every
+# key it had ever held; now each set stops growing after its week and expires
+# with the longest-lived key written in it.
+TAG_GENERATION_SECONDS = 7 * 86400
+
+
+def tag_key(tag: str) -> str:
+    return f"tag:{tag.lower()}"
+
+
+def _generation_key(tag: str, generation: int | str) -> str:
+    return f"{tag_key(tag)}:{generation}"
+
+
+def user_tag(username: str) -> str:
+    return f"user:{username}"
+
+
+def repo_tag(full_name: str) -> str:
+    return f"repo:{full_name}"
+
+
+async def tag_keys(keys: list[str], tags: list[str], ttl_seconds: int) -> None:
+    """Index ``keys`` under every tag so :func:`purge_tags` can find them.
+
+    Cache keys are opaque -- response entries are digests of the request, and
+    attribution entries embed the repo's ``pushed_at`` -- so without an index
+    the only way to drop what is held for one user was to wait out the TTL.
+    """
+    if not keys or not tags:
+        return
+    generation = int(time.time() // TAG_GENERATION_SECONDS)
+    sets = [key for tag in tags for key in (tag_key(tag), _generation_key(tag, generation))]
+    reply = await run_script(TAG_SCRIPT, sets, [ttl_seconds, generation, *keys])
+    if reply is not None:
+        return
+
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        for tag in tags:
+            await client.sadd(tag_key(tag), str(generation))
+            await client.sadd(_generation_key(tag, generation), *keys)
+            for key in (tag_key(tag), _generation_key(tag, generation)):
+                if await client.ttl(key) < ttl_seconds:
+                    await client.expire(key, ttl_seconds)
+    except Exception:
+        return
+
+
+async def purge_tags(tags: list[str]) -> int:
+    """Delete every key indexed under ``tags``, and the tags themselves.
+
+    Each tag is rebuilt from nothing afterwards, index and generations alike,
+    so whatever it held is gone for good. Returns how many cached entries
+    were actually removed; keys that had already expired on their own are
+    not counted.
+    """
+    client = get_redis()
+    if client is None:
+        return 0
+
+    purged = 0
+    for tag in tags:
+        try:
+            sets = [
+                _generation_key(tag, generation)
+                for generation in await client.smembers(tag_key(tag)) or []
+            ]
+            for generation_set in sets:
+                members = list(await client.smembers(generation_set) or [])
+                for start in range(0, len(members), PURGE_CHUNK):
+                    purged += int(
+                        await client.delete(*members[start : start + PURGE_CHUNK]) or 0
+                    )
+            await client.delete(tag_key(tag), *sets)
+        except Exception:
+            continue
+    return purged
+
+
 def encode_body(body: bytes) -> str:
     return b64encode(body).decode("ascii")
 
@@ -0,0 +1,147 @@
+"""Canonical request identity for the response cache.
+
+The cache used to key on the raw path and sorted query string, so requests the
+API answers identically still built and stored separate entries:
+``/TashifKhan/stats`` and ``/tashifkhan/stats``, ``?theme=dark`` and no theme,
+``exclude=Go,Rust`` and ``exclude=Rust,Go``. README cards are embedded with
+every variant imaginable, so each one paid for its own cold build.
+
+Each route below lists the query parameters it reads, how FastAPI parses them
+and their defaults. A request is reduced to what the handler would actually
+see: the handle lowercased (GitHub logins are case-insensitive), parameters
+equal to their default dropped, booleans and integers in one spelling, and the
+language exclusion list sorted and deduplicated. Parameters a route does not
+declare are kept verbatim, so a newly added one can only split the cache,
+never merge two different responses.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from routes.dependencies import DEFAULT_EXCLUDED_LANGUAGES
+
+# The spellings pydantic accepts for a bool query parameter.
+TRUE_VALUES = {"1", "on", "t", "true", "y", "yes"}
+FALSE_VALUES = {"0", "off", "f", "false", "n", "no"}
+
+# ``exclude`` (comma-separated) and its legacy repeatable twin ``excluded``
+# together, resolved exactly as ``parse_excluded_languages`` resolves them.
+LANGUAGES = "languages"
+BOOL = "bool"
+INT = "int"
+LOWER = "lower"
+
+# Route, as the path after the handle -> parameter -> (kind, default).
+ROUTE_PARAMS: Dict[str, Dict[str, Tuple[str, Any]]] = {
+    "": {},
+    "languages": {
+        "exclude": (LANGUAGES, DEFAULT_EXCLUDED_LANGUAGES),
+        "attributed": (BOOL, True),
+        "include_forks": (BOOL, True),
+    },
+    "contributions/breakdown": {
+        "exclude": (LANGUAGES, DEFAULT_EXCLUDED_LANGUAGES),
+        "include_forks": (BOOL, True),
+    },
+    "contributions": {"starting_year": (INT, None)},
+    "stars": {},
+    "pinned": {"first": (INT, 6)},
+    "repos": {"attributed": (BOOL, True)},
+    "commits": {},
+    "profile-views": {"increment": (BOOL, True), "base": (INT, None)},
+    "stats/svg": {
+        "theme": (LOWER, "dark"),
+        "exclude": (LANGUAGES, []),
+        "attributed": (BOOL, True),
+    },
+    "stats": {"exclude": (LANGUAGES, []), "attributed": (BOOL, True)},
+    "star-lists": {"include_repos": (BOOL, True)},
+    "heatmap": {"view": (LOWER, "all"), "year": (INT, None)},
+    "profile": {},
+    "badges": {},
+    "me/pulls": {},
+    "org-contributions": {},
+    "prs": {},
+}
+
+
+def split_path(path: str) -> Tuple[str, str]:
+    """``/Handle/stats/svg`` -> ``("Handle", "stats/svg")``."""
+    handle, _, route = path.strip("/").partition("/")
+    return handle, route
+
+
+def _languages(values: Dict[str, List[str]], default: List[str]) -> Optional[str]:
+    if "excluded" in values:
+        languages = [item.strip() for item in values["excluded"] if item and item.strip()]
+    elif values.get("exclude") and values["exclude"][-1]:
+        languages = [item.strip() for item in values["exclude"][-1].split(",") if item.strip()]
+    else:
+        languages = list(default)
+
+    canonical = sorted(set(languages))
+    if canonical == sorted(set(default)):
+        return None
+    # Quoted so a legacy ``excluded=A,B`` (one language named "A,B") cannot
+    # collide with ``exclude=A,B`` (two languages).
+    return ",".join(quote(item, safe="") for item in canonical)
+
+
+def _scalar(kind: str, raw: str, default: Any) -> Optional[str]:
+    value: Any = raw.strip()
+    if kind == BOOL:
+        lowered = value.lower()
+        if lowered in TRUE_VALUES:
+            value = True
+        elif lowered in FALSE_VALUES:
+            value = False
+    elif kind == INT:
+        try:
+            value = int(value)
+        except ValueError:
+            pass
+    elif kind == LOWER:
+        value = value.lower()
+
+    if value == default and type(value) is type(default):
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def canonical_query(route: str, pairs: List[Tuple[str, str]]) -> str:
+    """The query string a handler would read, in one canonical spelling."""
+    params = ROUTE_PARAMS.get(route)
+    if params is None:
+        return "&".join(f"{key}={value}" for key, value in sorted(pairs))
+
+    values: Dict[str, List[str]] = {}
+    for key, value in pairs:
+        values.setdefault(key, []).append(value)
+
+    canonical: List[Tuple[str, str]] = []
+    for name, (kind, default) in params.items():
+        if kind == LANGUAGES:
+            value = _languages(values, default)
+            values.pop("excluded", None)
+        elif name in values:
+            # FastAPI reads the last occurrence of a repeated scalar.
+            value = _scalar(kind, values[name][-1], default)
+        else:
+            value = None
+        values.pop(name, None)
+        if value is not None:
+            canonical.append((name, value))
+
+    for key, repeated in values.items():
+        canonical.extend((key, value) for value in repeated)
+
+    return "&".join(f"{key}={value}" for key, value in sorted(canonical))
+
+
+def canonical_request(path: str, pairs: List[Tuple[str, str]]) -> str:
+    """``path:query`` for a request, equal for every spelling of the same one."""
+    handle, route = split_path(path)
+    canonical_path = "/" + "/".join(part for part in (handle.lower(), route) if part)
+    return f"{canonical_path}:{canonical_query(route, pairs)}"
@@ -8,7 +8,20 @@ class CacheRateLimitSettings:
     # seemingly-configured deployment running with no cache.
     upstash_rest_url = os.getenv("UPSTASH_REDIS_REST_URL")
     upstash_rest_token = os.getenv("UPSTASH_REDIS_REST_TOKEN")
+    # A SQLite file to cache in when neither of the above is set, for
+    # single-box deployments. Expired keys are swept every compact interval.
+    local_cache_path = os.getenv("LOCAL_CACHE_PATH")
+    local_cache_compact_interval_seconds = float(
+        os.getenv("LOCAL_CACHE_COMPACT_INTERVAL_SECONDS", "300")
+    )
     cache_ttl_seconds = int(os.getenv("API_CACHE_TTL_SECONDS", "3600"))
+    # Bearer token for DELETE /{username}/cache, also accepted in the
+    # X-Cache-Refresh header to force a rebuild. Both are off when unset.
+    cache_purge_token = os.getenv("CACHE_PURGE_TOKEN")
+    # Per-user request counts feed scripts/refresh_hot.py. Counts are kept in
+    # daily buckets for this many days and halve in weight every half-life.
+    hot_window_days = int(os.getenv("HOT_WINDOW_DAYS", "7"))
+    hot_half_life_days = float(os.getenv("HOT_HALF_LIFE_DAYS", "1"))
     invalid_user_cache_ttl_seconds = int(os.getenv("INVALID_USER_CACHE_TTL_SECONDS", "300"))
     rate_limit_ip_requests = int(os.getenv("RATE_LIMIT_IP_REQUESTS", "60"))
     rate_limit_handle_requests = int(os.getenv("RATE_LIMIT_HANDLE_REQUESTS", "30"))
@@ -18,6 +31,19 @@ class CacheRateLimitSettings:
     invalid_rate_limit_window_seconds = int(os.getenv("INVALID_RATE_LIMIT_WINDOW_SECONDS", "600"))
     rate_limit_backoff_base_seconds = int(os.getenv("RATE_LIMIT_BACKOFF_BASE_SECONDS", "5"))
     rate_limit_backoff_max_seconds = int(os.getenv("RATE_LIMIT_BACKOFF_MAX_SECONDS", "300"))
+    # Each process keeps its own token bucket per limited key and only asks
+    # Redis once a bucket has drained below this fraction of its capacity. 1.0
+    # consults Redis on every request; lower trades cross-instance precision
+    # for fewer round trips. The buckets are also what still limits traffic
+    # when Redis is missing or failing.
+    local_rate_limit_headroom = float(os.getenv("LOCAL_RATE_LIMIT_HEADROOM", "0.5"))
+    # Requests a bucket admits on its own are counted into Redis with the next
+    # check, which is forced once this fraction of the limit is waiting. With
+    # N instances a key gets at most about limit * (1 + N * batch) requests a
+    # window; 1 / limit or less reports every request.
+    local_rate_limit_batch = float(os.getenv("LOCAL_RATE_LIMIT_BATCH", "0.1"))
+    # Least recently seen keys are dropped past this many, bounding memory.
+    local_rate_limit_max_keys = int(os.getenv("LOCAL_RATE_LIMIT_MAX_KEYS", "10000"))
 
 
 class AttributionSettings:
@@ -30,13 +56,17 @@ class AttributionSettings:
     and falls back to whole-repo language bytes until enough repos are warm;
     successive requests widen the cache until the attributed answer takes over.
 
-    Set ``REDIS_URL`` for that warming to persist -- without it every request
-    starts cold and the attributed path never reaches its coverage threshold.
+    Set ``REDIS_URL`` (or ``LOCAL_CACHE_PATH`` on a single box) for that
+    warming to persist -- without it every request starts cold and the
+    attributed path never reaches its coverage threshold.
     """
 
     max_repos = int(os.getenv("ATTRIBUTION_MAX_REPOS", "60"))
     max_commits_per_repo = int(os.getenv("ATTRIBUTION_MAX_COMMITS_PER_REPO", "200"))
     max_commit_details = int(os.getenv("ATTRIBUTION_MAX_COMMIT_DETAILS", "600"))
+    # Commit details each repo in a walk is guaranteed before the rest of the
+    # budget is split in proportion to how many commits each has to measure.
+    min_commits_per_repo = int(os.getenv("ATTRIBUTION_MIN_COMMITS_PER_REPO", "10"))
     concurrency = int(os.getenv("ATTRIBUTION_CONCURRENCY", "10"))
     # How many repos may be measured at once. Bounded so that when the deadline
     # expires only a few repos are half-done, and the rest fall back cleanly.
@@ -49,6 +79,29 @@ class AttributionSettings:
     repo_detail_concurrency = int(os.getenv("REPO_DETAIL_CONCURRENCY", "24"))
     request_timeout_seconds = float(os.getenv("ATTRIBUTION_REQUEST_TIMEOUT", "20"))
     cache_ttl_seconds = int(os.getenv("ATTRIBUTION_CACHE_TTL_SECONDS", "604800"))
+    # A commit's diff never changes, so its reduced per-language tally is kept
+    # far longer than the per-repo results built from it.
+    commit_cache_ttl_seconds = int(os.getenv("ATTRIBUTION_COMMIT_CACHE_TTL_SECONDS", "7776000"))
+    # Histories longer than max_commits_per_repo are sampled from this many
+    # listing pages spread across them (1 measures only the newest commits),
+    # until every language's 95% margin is within this many percentage points.
+    sample_strata = int(os.getenv("ATTRIBUTION_SAMPLE_STRATA", "5"))
+    sample_margin = float(os.getenv("ATTRIBUTION_SAMPLE_MARGIN", "5"))
+    # The clone backend (offline warming only) measures a repo's whole history
+    # from one clone instead of a request per commit. Each clone lives in its
+    # own temporary directory under clone_dir while it is read, repos listed
+    # larger than clone_max_size_mb are left to the API walk, and
+    # clone_concurrency bounds how many exist at once. Repos up to
+    # clone_full_max_size_mb are cloned whole; larger ones are cloned without
+    # file contents and only the user's own commits are diffed.
+    clone_dir = os.getenv("ATTRIBUTION_CLONE_DIR", "")
+    clone_max_size_mb = int(os.getenv("ATTRIBUTION_CLONE_MAX_SIZE_MB", "500"))
+    clone_full_max_size_mb = int(os.getenv("ATTRIBUTION_CLONE_FULL_MAX_SIZE_MB", "100"))
+    clone_concurrency = int(os.getenv("ATTRIBUTION_CLONE_CONCURRENCY", "2"))
+    clone_timeout_seconds = float(os.getenv("ATTRIBUTION_CLONE_TIMEOUT", "600"))
+    # Typical round trip of one GitHub REST call, which is what the dry-run
+    # planner (services/planner.py) turns predicted calls into seconds with.
+    planner_call_seconds = float(os.getenv("ATTRIBUTION_PLANNER_CALL_SECONDS", "0.3"))
     stats_retries = int(os.getenv("ATTRIBUTION_STATS_RETRIES", "3"))
     stats_retry_delay_seconds = float(os.getenv("ATTRIBUTION_STATS_RETRY_DELAY", "0.6"))
 
@@ -72,6 +125,9 @@ class AttributionSettings:
     # language mix is trustworthy enough to serve. Below this a partial sample
     # would misrepresent the user, so the legacy whole-repo split is used.
     min_coverage = float(os.getenv("ATTRIBUTION_MIN_COVERAGE", "0.7"))
+    # Hold ``volume_coverage`` (share of lines) to that threshold instead of
+    # ``coverage`` (share of repos).
+    coverage_by_volume = os.getenv("ATTRIBUTION_COVERAGE_BY_VOLUME", "false").lower() == "true"
 
 
 cache_rate_limit_settings = CacheRateLimitSettings()
@@ -0,0 +1,322 @@
+"""A file-backed stand-in for Redis, for single-box deployments without one.
+
+With neither ``REDIS_URL`` nor Upstash credentials the app used to run with no
+cache at all: every response was rebuilt, rate limits were per-process only,
+and attribution measurements vanished with each request, so the attributed
+language split never got past its coverage threshold. Setting
+``LOCAL_CACHE_PATH`` stores the same keys in a SQLite file instead, which
+survives restarts and is shared by every uvicorn worker on the box.
+
+Only the commands the app issues are implemented, with Redis's return
+conventions. There is no ``EVAL``: ``run_script`` reports ``None`` and the
+caller takes its command-by-command path instead. The rate limiter has no
+such path, so :meth:`SqliteRedis.transact` runs its read-modify-write in one
+transaction, and the limit stays shared by every worker on the box.
+
+Strings live in ``entries``; set and sorted-set members in ``members`` under
+an ``entries`` row with no value, so TTL, EXPIRE and DEL treat every key
+alike. Expired rows are ignored on read and deleted in bulk by a periodic
+compaction. Read-modify-write commands run in ``BEGIN IMMEDIATE``
+transactions, which SQLite serialises across processes, so INCR and friends
+stay atomic between workers.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS entries_expiry ON entries (expires_at)
+    WHERE expires_at IS NOT NULL;
+CREATE TABLE IF NOT EXISTS members (
+    key TEXT NOT NULL,
+    member TEXT NOT NULL,
+    score REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (key, member)
+);
+"""
+
+
+class SqliteRedis:
+    """The Redis commands this app uses, stored in one SQLite file."""
+
+    def __init__(self, path: str, compact_interval_seconds: float = 300.0):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Autocommit, with explicit transactions where a command needs one.
+        self._conn = sqlite3.connect(
+            path, timeout=10.0, isolation_level=None, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        self._compact_interval = compact_interval_seconds
+        self._compacted_at = time.time()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    async def _run(self, method, *args: Any) -> Any:
+        return await asyncio.to_thread(method, *args)
+
+    @staticmethod
+    def _live(conn: sqlite3.Connection, key: str, now: float) -> tuple | None:
+        """The key's ``(value, expires_at)``, dropping it first if it expired."""
+        row = conn.execute(
+            "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] is not None and row[1] <= now:
+            SqliteRedis._drop(conn, key)
+            return None
+        return row
+
+    @staticmethod
+    def _drop(conn: sqlite3.Connection, key: str) -> None:
+        conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        conn.execute("DELETE FROM members WHERE key = ?", (key,))
+
+    def _maybe_compact(self) -> None:
+        if time.time() - self._compacted_at >= self._compact_interval:
+            self.compact()
+
+    def compact(self) -> int:
+        """Delete every expired key; returns how many went."""
+        now = time.time()
+        self._compacted_at = now
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM members WHERE key IN "
+                "(SELECT key FROM entries WHERE expires_at <= ?)",
+                (now,),
+            )
+            removed = conn.execute(
+                "DELETE FROM entries WHERE expires_at <= ?", (now,)
+            ).rowcount
+        return removed
+
+    # Strings
+
+    def _get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return row[0]
+
+    def _mget(self, keys: list[str]) -> list[str | None]:
+        now = time.time()
+        found: dict[str, str] = {}
+        with self._lock:
+            # Chunked to stay under SQLite's bound-parameter limit.
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                marks = ",".join("?" * len(chunk))
+                for key, value, expires_at in self._conn.execute(
+                    f"SELECT key, value, expires_at FROM entries WHERE key IN ({marks})", chunk
+                ):
+                    if expires_at is None or expires_at > now:
+                        found[key] = value
+        return [found.get(key) for key in keys]
+
+    def _setex(self, key: str, ttl_seconds: int, value: str) -> bool:
+        with self._transaction() as conn:
+            self._drop(conn, key)
+            conn.execute(
+                "INSERT INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + int(ttl_seconds)),
+            )
+        self._maybe_compact()
+        return True
+
+    def _incr(self, key: str) -> int:
+        with self._transaction() as conn:
+            row = self._live(conn, key, time.time())
+            value = int(row[0] or 0) + 1 if row else 1
+            conn.execute(
+                "INSERT INTO entries (key, value, expires_at) VALUES (?, ?, NULL) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                (key, str(value)),
+            )
+        return value
+
+    def _transact(
+        self, key: str, change: Callable[[str | None], tuple[str, float, Any]]
+    ) -> Any:
+        with self._transaction() as conn:
+            now = time.time()
+            row = self._live(conn, key, now)
+            value, ttl_seconds, result = change(row[0] if row else None)
+            conn.execute(
+                "INSERT INTO entries (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET "
+                "value = excluded.value, expires_at = excluded.expires_at",
+                (key, value, now + ttl_seconds),
+            )
+        return result
+
+    async def get(self, key: str) -> str | None:
+        return await self._run(self._get, key)
+
+    async def mget(self, keys: list[str]) -> list[str | None]:
+        return await self._run(self._mget, keys)
+
+    async def setex(self, key: str, ttl_seconds: int, value: str) -> bool:
+        return await self._run(self._setex, key, ttl_seconds, value)
+
+    async def incr(self, key: str) -> int:
+        return await self._run(self._incr, key)
+
+    async def transact(
+        self, key: str, change: Callable[[str | None], tuple[str, float, Any]]
+    ) -> Any:
+        """Replace ``key`` with what ``change`` makes of it, atomically.
+
+        ``change`` gets the current value (``None`` when absent) and returns
+        the new value, its TTL in seconds and what to hand back. This is the
+        stand-in for a script's read-modify-write: no other worker can touch
+        the key in between.
+        """
+        return await self._run(self._transact, key, change)
+
+    # Keys
+
+    def _ttl(self, key: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return -2
+        if row[0] is None:
+            return -1
+        remaining = row[0] - time.time()
+        return int(remaining) if remaining > 0 else -2
+
+    def _expire(self, key: str, ttl_seconds: int) -> int:
+        with self._transaction() as conn:
+            if self._live(conn, key, time.time()) is None:
+                return 0
+            conn.execute(
+                "UPDATE entries SET expires_at = ? WHERE key = ?",
+                (time.time() + int(ttl_seconds), key),
+            )
+        return 1
+
+    def _delete(self, *keys: str) -> int:
+        removed = 0
+        with self._transaction() as conn:
+            now = time.time()
+            for key in keys:
+                if self._live(conn, key, now) is not None:
+                    removed += 1
+                self._drop(conn, key)
+        return removed
+
+    async def ttl(self, key: str) -> int:
+        return await self._run(self._ttl, key)
+
+    async def expire(self, key: str, ttl_seconds: int) -> int:
+        return await self._run(self._expire, key, ttl_seconds)
+
+    async def delete(self, *keys: str) -> int:
+        return await self._run(self._delete, *keys)
+
+    # Sets and sorted sets
+
+    def _ensure_collection(self, conn: sqlite3.Connection, key: str) -> None:
+        if self._live(conn, key, time.time()) is None:
+            conn.execute(
+                "INSERT INTO entries (key, value, expires_at) VALUES (?, NULL, NULL)", (key,)
+            )
+
+    def _sadd(self, key: str, *members: str) -> int:
+        with self._transaction() as conn:
+            self._ensure_collection(conn, key)
+            added = 0
+            for member in members:
+                added += conn.execute(
+                    "INSERT OR IGNORE INTO members (key, member) VALUES (?, ?)",
+                    (key, str(member)),
+                ).rowcount
+        return added
+
+    def _smembers(self, key: str) -> list[str]:
+        with self._transaction() as conn:
+            if self._live(conn, key, time.time()) is None:
+                return []
+            rows = conn.execute("SELECT member FROM members WHERE key = ?", (key,)).fetchall()
+        return [row[0] for row in rows]
+
+    def _zincrby(self, key: str, amount: float, member: str) -> float:
+        with self._transaction() as conn:
+            self._ensure_collection(conn, key)
+            conn.execute(
+                "INSERT INTO members (key, member, score) VALUES (?, ?, ?) "
+                "ON CONFLICT (key, member) DO UPDATE SET score = score + excluded.score",
+                (key, str(member), float(amount)),
+            )
+            row = conn.execute(
+                "SELECT score FROM members WHERE key = ? AND member = ?", (key, str(member))
+            ).fetchone()
+        return row[0]
+
+    def _zrevrange(self, key: str, start: int, end: int, withscores: bool) -> list[Any]:
+        with self._transaction() as conn:
+            if self._live(conn, key, time.time()) is None:
+                return []
+            # Redis ranges are inclusive and count negative indexes from the
+            # end, -1 being the last element.
+            if start < 0 or end < 0:
+                size = conn.execute(
+                    "SELECT COUNT(*) FROM members WHERE key = ?", (key,)
+                ).fetchone()[0]
+                start = max(0, size + start) if start < 0 else start
+                end = size + end if end < 0 else end
+            if end < start:
+                return []
+            limit = end - start + 1
+            rows = conn.execute(
+                "SELECT member, score FROM members WHERE key = ? "
+                "ORDER BY score DESC, member DESC LIMIT ? OFFSET ?",
+                (key, limit, start),
+            ).fetchall()
+        if withscores:
+            return [(member, score) for member, score in rows]
+        return [member for member, _ in rows]
+
+    async def sadd(self, key: str, *members: str) -> int:
+        return await self._run(self._sadd, key, *members)
+
+    async def smembers(self, key: str) -> list[str]:
+        return await self._run(self._smembers, key)
+
+    async def zincrby(self, key: str, amount: float, member: str) -> float:
+        return await self._run(self._zincrby, key, amount, member)
+
+    async def zrevrange(
+        self, key: str, start: int, end: int, withscores: bool = False
+    ) -> list[Any]:
+        return await self._run(self._zrevrange, key, start, end, withscores)
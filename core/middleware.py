@@ -1,15 +1,39 @@
 import hashlib
+import hmac
 import re
 import json
+import time
 from collections.abc import Callable
+from dataclasses import dataclass, field
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any
 
 from fastapi import Request
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse, Response
 
-from core.cache import decode_body, encode_body, get_json, redis_enabled, set_json
+from core.cache import (
+    decode_body,
+    encode_body,
+    get_json,
+    run_script,
+    set_json,
+    tag_keys,
+    user_tag,
+)
+from core.cache_keys import canonical_request
 from core.config import cache_rate_limit_settings as settings
-from core.rate_limit import RateLimitResult, check_rate_limit
+from core.popularity import bucket_ttl_seconds, day_index, hot_key, record_hit
+from core.rate_limit import (
+    LIMIT_LUA,
+    RateLimitResult,
+    RateLimitRule,
+    check_rate_limit,
+    local_limiter,
+    result_from_reply,
+    script_now,
+    settle_locally,
+)
 
 
 SKIP_PATHS = {"/", "/docs", "/redoc", "/openapi.json", "/favicon.ico"}
@@ -35,17 +59,112 @@ def _handle_from_path(path: str) -> str | None:
     return segment.lower()
 
 
-def _query_string(request: Request) -> str:
-    pairs = sorted(request.query_params.multi_items())
-    return "&".join(f"{key}={value}" for key, value in pairs)
+def _route_canonically(request: Request) -> None:
+    """Hand the route the lowercased handle the cache key was built from.
 
+    The key folds the handle's case, so a body echoing the spelling of
+    whichever request missed first would be served to every other spelling.
+    """
+    for field, slash in (("path", "/"), ("raw_path", b"/")):
+        path = request.scope.get(field)
+        if not path:
+            continue
+        lead = len(path) - len(path.lstrip(slash))
+        head, separator, rest = path[lead:].partition(slash)
+        request.scope[field] = path[:lead] + head.lower() + separator + rest
 
-def _cache_key(platform: str, request: Request) -> str:
-    raw = f"{request.method}:{request.url.path}:{_query_string(request)}"
+
+def cache_key(platform: str, method: str, path: str, pairs: list[tuple[str, str]]) -> str:
+    """The response cache key for a request, shared with scripts that inspect it."""
+    raw = f"{method}:{canonical_request(path, pairs)}"
     digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()
     return f"cache:{platform}:{digest}"
 
 
+def _cache_key(platform: str, request: Request) -> str:
+    return cache_key(platform, request.method, request.url.path, request.query_params.multi_items())
+
+
+def _refresh_requested(request: Request) -> bool:
+    """``X-Cache-Refresh: <CACHE_PURGE_TOKEN>`` rebuilds the entry unconditionally.
+
+    Used by scripts/refresh_hot.py to replace popular entries before they
+    expire. Without the token the header is ignored, so it cannot be used to
+    make the API skip its cache or its rate limits.
+    """
+    supplied = request.headers.get("x-cache-refresh")
+    expected = settings.cache_purge_token
+    if not supplied or not expected:
+        return False
+    return hmac.compare_digest(supplied.encode("utf-8"), expected.encode("utf-8"))
+
+
+def _meta_key(key: str) -> str:
+    return f"{key}:meta"
+
+
+def _etag(body: bytes) -> str:
+    """Strong validator for a cached body: it changes exactly when the bytes do."""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """``If-None-Match`` uses the weak comparison, so ``W/`` prefixes are ignored.
+
+    Proxies that re-encode a body (camo, CDNs gzipping on the fly) routinely
+    weaken the validator they pass on, and a strict comparison would turn every
+    one of their revalidations back into a full download.
+    """
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == wanted
+        for candidate in if_none_match.split(",")
+    )
+
+
+def _not_modified(request: Request, etag: str | None, built_at: float | None) -> bool:
+    """Whether the client's copy is still current.
+
+    ``If-None-Match`` wins whenever it is sent, as RFC 9110 requires; the date
+    is only consulted for clients that kept nothing but ``Last-Modified``.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return bool(etag) and _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if not if_modified_since or built_at is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(built_at) <= since
+
+
+def _validator_headers(meta: dict) -> dict:
+    headers = {"ETag": meta["etag"]}
+    if meta.get("built_at") is not None:
+        headers["Last-Modified"] = _http_date(meta["built_at"])
+    return headers
+
+
+def _not_modified_response(meta: dict, cache_status: str) -> Response:
+    """A bodiless 304 carrying the validators and caching policy of the entry."""
+    headers = _validator_headers(meta)
+    headers["Cache-Control"] = meta.get("cache_control") or (
+        f"public, max-age={settings.cache_ttl_seconds}"
+    )
+    headers["X-Cache"] = cache_status
+    return Response(status_code=304, headers=headers)
+
+
 def _is_invalid_user(status_code: int, body: bytes) -> bool:
     if status_code == 404:
         return True
@@ -88,13 +207,120 @@ def _ttl_from_cache_control(headers: dict, default: int) -> int:
     return default
 
 
+# Everything a request needs from Redis before it can be answered, in one
+# round trip: the validator record, the cached body, the negative-cache marker
+# and whichever pair of rate limits applies. Done command by command this was
+# around ten sequential calls -- each an HTTPS POST on Upstash -- per miss.
+#
+# The request is also counted towards its user's popularity (core.popularity)
+# before anything else, so hits and revalidations count as well as misses.
+#
+# KEYS: entry, validator record, invalid marker, then one key per rule for the
+#       two normal rules followed by the two invalid-user rules, then today's
+#       popularity bucket.
+# ARGV: now, backoff base, backoff max, (limit, window, label, sent) per
+#       rule, the handle and the popularity bucket's TTL, then the count of
+#       ETag digests the client holds followed by the digests. Rules whose
+#       local bucket is nowhere near empty and owes Redis less than a batch
+#       are sent with sent = 0 and skipped; otherwise sent counts this
+#       request plus those the bucket admitted since it last reported.
+LOOKUP_SCRIPT = LIMIT_LUA + """
+local now = tonumber(ARGV[1])
+local backoff_base = tonumber(ARGV[2])
+local backoff_max = tonumber(ARGV[3])
+
+redis.call('ZINCRBY', KEYS[8], 1, ARGV[20])
+redis.call('EXPIRE', KEYS[8], tonumber(ARGV[21]))
+
+local candidates = tonumber(ARGV[22])
+if candidates > 0 then
+  local meta = redis.call('GET', KEYS[2])
+  local ok, record = pcall(cjson.decode, meta or '')
+  local etag = ok and type(record) == 'table' and record['etag']
+  if type(etag) == 'string' then
+    -- Compared bare, as the digests arrive: no W/ prefix and no quotes.
+    local stored = string.match((string.gsub(etag, '^W/', '')), '^"?(.-)"?$')
+    for i = 1, candidates do
+      -- An empty digest stands for "*", which matches whatever is stored.
+      if ARGV[22 + i] == '' or ARGV[22 + i] == stored then
+        return {'not_modified', meta, '', 1, 0, 0, 0, 0}
+      end
+    end
+  end
+end
+
+local cached = redis.call('GET', KEYS[1])
+if cached then
+  return {'hit', cached, '', 1, 0, 0, 0, 0}
+end
+
+local kind, first = 'miss', 1
+if redis.call('EXISTS', KEYS[3]) == 1 then
+  kind, first = 'invalid', 3
+end
+
+local result, label = {1, 0, 0, 0, 0}, ''
+for rule = first, first + 1 do
+  local a = 3 + (rule - 1) * 4
+  local sent = tonumber(ARGV[a + 4]) or 0
+  if sent > 0 then
+    label = ARGV[a + 3]
+    result = limit(KEYS[3 + rule], tonumber(ARGV[a + 1]), tonumber(ARGV[a + 2]),
+      now, backoff_base, backoff_max, sent - 1)
+    if result[1] == 0 then
+      break
+    end
+  end
+end
+return {kind, '', label, result[1], result[2], result[3], result[4], result[5]}
+"""
+
+
+@dataclass
+class _Lookup:
+    """What Redis knew about a request before any handler ran.
+
+    ``kind`` is ``not_modified``, ``hit``, ``invalid`` or ``miss``. ``entry``
+    holds the validator record or cached response for the first two, and
+    ``limited`` the rate-limit verdict for the last two.
+    """
+
+    kind: str
+    entry: dict | None = None
+    limited: RateLimitResult = field(default_factory=lambda: RateLimitResult(allowed=True))
+
+
+def _etag_digests(request: Request) -> list[str]:
+    """The bare digests a conditional request holds, ``""`` standing for ``*``."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return []
+    if if_none_match.strip() == "*":
+        return [""]
+    return [
+        digest
+        for candidate in if_none_match.split(",")
+        if (digest := candidate.strip().removeprefix("W/").strip('"'))
+    ]
+
+
+def _load(raw: Any) -> dict | None:
+    try:
+        value = json.loads(raw) if raw else None
+    except (TypeError, ValueError):
+        return None
+    return value if isinstance(value, dict) else None
+
+
 class CacheRateLimitMiddleware(BaseHTTPMiddleware):
     def __init__(self, app, platform: str) -> None:
         super().__init__(app)
         self.platform = platform.lower()
 
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        if request.method != "GET" or not redis_enabled() or request.url.path in SKIP_PATHS:
+        # Runs without Redis too: caching is then a no-op, but the per-process
+        # rate limit buckets still apply.
+        if request.method != "GET" or request.url.path in SKIP_PATHS:
             return await call_next(request)
 
         handle = _handle_from_path(request.url.path)
@@ -102,11 +328,28 @@ class CacheRateLimitMiddleware(BaseHTTPMiddleware):
             return await call_next(request)
 
         key = _cache_key(self.platform, request)
-        cached = await get_json(key)
-        if cached is not None:
+        invalid_key = f"invalid:{self.platform}:{handle}"
+        if _refresh_requested(request):
+            lookup = _Lookup("miss")
+        else:
+            lookup = await self._lookup(request, handle, key, invalid_key)
+
+        # Revalidations read only the small validator record, so a README badge
+        # polled by camo costs a few bytes from Redis and none on the wire.
+        if lookup.kind == "not_modified":
+            return _not_modified_response(lookup.entry, "HIT")
+
+        if lookup.kind == "hit":
+            cached = lookup.entry
+            if cached.get("etag") and _not_modified(
+                request, cached["etag"], cached.get("built_at")
+            ):
+                return _not_modified_response(cached, "HIT")
             headers = dict(cached.get("headers") or {})
             headers["X-Cache"] = "HIT"
             headers.setdefault("Cache-Control", f"public, max-age={settings.cache_ttl_seconds}")
+            if cached.get("etag"):
+                headers.update(_validator_headers(cached))
             return Response(
                 content=decode_body(cached["body"]),
                 status_code=int(cached["status_code"]),
@@ -114,22 +357,17 @@ class CacheRateLimitMiddleware(BaseHTTPMiddleware):
                 media_type=cached.get("media_type") or "application/json",
             )
 
-        invalid_key = f"invalid:{self.platform}:{handle}"
-        invalid_cached = await get_json(invalid_key)
-        if invalid_cached is not None:
-            limited = await self._check_invalid_limits(request, handle)
-            if not limited.allowed:
-                return _rate_limited_response(limited)
+        if not lookup.limited.allowed:
+            return _rate_limited_response(lookup.limited)
+
+        if lookup.kind == "invalid":
             return JSONResponse(
                 status_code=404,
                 content={"status": "error", "message": "User does not exist"},
                 headers={"X-Cache": "NEGATIVE-HIT"},
             )
 
-        limited = await self._check_limits(request, handle)
-        if not limited.allowed:
-            return _rate_limited_response(limited)
-
+        _route_canonically(request)
         response = await call_next(request)
         body = b""
         async for chunk in response.body_iterator:
@@ -142,10 +380,23 @@ class CacheRateLimitMiddleware(BaseHTTPMiddleware):
         invalid_user = _is_invalid_user(response.status_code, body)
         if invalid_user:
             await set_json(invalid_key, {"invalid": True}, settings.invalid_user_cache_ttl_seconds)
+            await tag_keys(
+                [invalid_key], [user_tag(handle)], settings.invalid_user_cache_ttl_seconds
+            )
         elif response.status_code == 200:
             headers.setdefault("Cache-Control", f"public, max-age={settings.cache_ttl_seconds}")
             ttl = _ttl_from_cache_control(headers, settings.cache_ttl_seconds)
-            await set_json(key, self._cached_response(response, body), ttl)
+            meta = {
+                "etag": _etag(body),
+                "built_at": int(time.time()),
+                "cache_control": headers.get("cache-control") or headers["Cache-Control"],
+            }
+            await set_json(key, self._cached_response(response, body, meta), ttl)
+            await set_json(_meta_key(key), meta, ttl)
+            await tag_keys([key, _meta_key(key)], [user_tag(handle)], ttl)
+            headers.update(_validator_headers(meta))
+            if _not_modified(request, meta["etag"], meta["built_at"]):
+                return _not_modified_response(meta, "MISS")
 
         return Response(
             content=body,
@@ -155,42 +406,118 @@ class CacheRateLimitMiddleware(BaseHTTPMiddleware):
             background=response.background,
         )
 
-    async def _check_limits(self, request: Request, handle: str) -> RateLimitResult:
+    def _rules(
+        self, request: Request, handle: str
+    ) -> tuple[list[RateLimitRule], list[RateLimitRule]]:
+        """The limits for a normal request and for one naming an unknown user."""
         ip = _client_ip(request)
-        ip_result = await check_rate_limit(
-            f"ip:{self.platform}:{ip}",
-            settings.rate_limit_ip_requests,
-            settings.rate_limit_window_seconds,
-            "ip",
-        )
-        if not ip_result.allowed:
-            return ip_result
-        return await check_rate_limit(
-            f"handle:{self.platform}:{handle}",
-            settings.rate_limit_handle_requests,
-            settings.rate_limit_window_seconds,
-            "handle",
-        )
+        normal = [
+            RateLimitRule(
+                f"ip:{self.platform}:{ip}",
+                settings.rate_limit_ip_requests,
+                settings.rate_limit_window_seconds,
+                "ip",
+            ),
+            RateLimitRule(
+                f"handle:{self.platform}:{handle}",
+                settings.rate_limit_handle_requests,
+                settings.rate_limit_window_seconds,
+                "handle",
+            ),
+        ]
+        invalid = [
+            RateLimitRule(
+                f"invalid-ip:{self.platform}:{ip}",
+                settings.invalid_rate_limit_ip_requests,
+                settings.invalid_rate_limit_window_seconds,
+                "invalid-ip",
+            ),
+            RateLimitRule(
+                f"invalid-handle:{self.platform}:{handle}",
+                settings.invalid_rate_limit_handle_requests,
+                settings.invalid_rate_limit_window_seconds,
+                "invalid-handle",
+            ),
+        ]
+        return normal, invalid
+
+    async def _lookup(
+        self, request: Request, handle: str, key: str, invalid_key: str
+    ) -> _Lookup:
+        normal, invalid = self._rules(request, handle)
+        digests = _etag_digests(request)
+
+        keys = [key, _meta_key(key), invalid_key]
+        args: list[Any] = [
+            script_now(),
+            settings.rate_limit_backoff_base_seconds,
+            settings.rate_limit_backoff_max_seconds,
+        ]
+        sent: dict[str, int] = {}
+        for rule in normal + invalid:
+            keys.extend(rule.redis_keys)
+            args.extend(rule.script_args)
+            if local_limiter.due(rule):
+                sent[rule.key] = local_limiter.unreported(rule) + 1
+            args.append(sent.get(rule.key, 0))
+        keys.append(hot_key(self.platform, day_index()))
+        args.extend([handle, bucket_ttl_seconds()])
+        args.append(len(digests))
+        args.extend(digests)
+
+        reply = await run_script(LOOKUP_SCRIPT, keys, args)
+        if not isinstance(reply, list) or len(reply) != 8:
+            await record_hit(self.platform, handle)
+            return await self._lookup_sequentially(request, key, invalid_key, normal, invalid)
+
+        kind, payload, label = reply[0], reply[1], reply[2] or None
+        if kind in ("not_modified", "hit"):
+            entry = _load(payload)
+            if entry is not None:
+                return _Lookup(kind, entry)
+            # An unreadable entry is a miss, and a miss must still be limited.
+            return await self._lookup_sequentially(request, key, invalid_key, normal, invalid)
+        shared = result_from_reply(reply[3:], label)
+        rules = invalid if kind == "invalid" else normal
+        return _Lookup(kind, limited=settle_locally(rules, shared, sent))
+
+    async def _lookup_sequentially(
+        self,
+        request: Request,
+        key: str,
+        invalid_key: str,
+        normal: list[RateLimitRule],
+        invalid: list[RateLimitRule],
+    ) -> _Lookup:
+        """The same lookup command by command, for servers that cannot script."""
+        if "if-none-match" in request.headers or "if-modified-since" in request.headers:
+            meta = await get_json(_meta_key(key))
+            if meta is not None and _not_modified(
+                request, meta.get("etag"), meta.get("built_at")
+            ):
+                return _Lookup("not_modified", meta)
 
-    async def _check_invalid_limits(self, request: Request, handle: str) -> RateLimitResult:
-        ip = _client_ip(request)
-        ip_result = await check_rate_limit(
-            f"invalid-ip:{self.platform}:{ip}",
-            settings.invalid_rate_limit_ip_requests,
-            settings.invalid_rate_limit_window_seconds,
-            "invalid-ip",
-        )
-        if not ip_result.allowed:
-            return ip_result
-        return await check_rate_limit(
-            f"invalid-handle:{self.platform}:{handle}",
-            settings.invalid_rate_limit_handle_requests,
-            settings.invalid_rate_limit_window_seconds,
-            "invalid-handle",
-        )
+        cached = await get_json(key)
+        if cached is not None:
+            return _Lookup("hit", cached)
+
+        if await get_json(invalid_key) is not None:
+            return _Lookup("invalid", limited=await self._check_limits(invalid))
+        return _Lookup("miss", limited=await self._check_limits(normal))
+
+    @staticmethod
+    async def _check_limits(rules: list[RateLimitRule]) -> RateLimitResult:
+        result = RateLimitResult(allowed=True)
+        for rule in rules:
+            result = await check_rate_limit(
+                rule.key, rule.limit, rule.window_seconds, rule.label
+            )
+            if not result.allowed:
+                return result
+        return result
 
     @staticmethod
-    def _cached_response(response: Response, body: bytes) -> dict:
+    def _cached_response(response: Response, body: bytes, meta: dict) -> dict:
         headers = {
             key: value
             for key, value in response.headers.items()
@@ -201,4 +528,5 @@ class CacheRateLimitMiddleware(BaseHTTPMiddleware):
             "headers": headers,
             "media_type": response.media_type or "application/json",
             "body": encode_body(body),
+            **meta,
         }
@@ -0,0 +1,69 @@
+"""Which users are asked about most, so their cards can be rebuilt ahead of time.
+
+The response cache is purely reactive: whoever asks after an entry expires pays
+for the rebuild, and for a card embedded in a popular README that is someone
+every hour. Counting requests per user lets a scheduled job refresh the hottest
+users' entries shortly before they expire, so those effectively never miss.
+
+Counts live in one sorted set per day and expire after the tracking window.
+Reading them back weights each day by ``0.5 ** (age / half_life)``, a decaying
+counter that needs no rewriting of old scores and no unbounded growth.
+"""
+
+import time
+from typing import List, Tuple
+
+from core.cache import get_redis
+from core.config import cache_rate_limit_settings as settings
+
+DAY_SECONDS = 86400
+# How many of each day's top users are read back; far above any sensible N.
+DAY_TOP = 1000
+
+
+def day_index(now: float | None = None) -> int:
+    return int((time.time() if now is None else now) // DAY_SECONDS)
+
+
+def hot_key(platform: str, day: int) -> str:
+    return f"hot:{platform}:{day}"
+
+
+def bucket_ttl_seconds() -> int:
+    return (settings.hot_window_days + 1) * DAY_SECONDS
+
+
+async def record_hit(platform: str, handle: str) -> None:
+    """Count one request for ``handle``; the middleware's script does this inline."""
+    client = get_redis()
+    if client is None:
+        return
+    key = hot_key(platform, day_index())
+    try:
+        await client.zincrby(key, 1, handle)
+        await client.expire(key, bucket_ttl_seconds())
+    except Exception:
+        return
+
+
+async def hottest(platform: str, limit: int) -> List[Tuple[str, float]]:
+    """The ``limit`` most requested handles with their decayed request counts."""
+    client = get_redis()
+    if client is None or limit <= 0:
+        return []
+
+    today = day_index()
+    scores: dict[str, float] = {}
+    for age in range(settings.hot_window_days):
+        weight = 0.5 ** (age / settings.hot_half_life_days)
+        try:
+            rows = await client.zrevrange(
+                hot_key(platform, today - age), 0, DAY_TOP - 1, withscores=True
+            )
+        except Exception:
+            continue
+        for handle, count in rows or []:
+            scores[handle] = scores.get(handle, 0.0) + float(count) * weight
+
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return ranked[:limit]
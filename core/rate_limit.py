@@ -1,7 +1,13 @@
+import json
+import math
+import sqlite3
 import time
+from collections import OrderedDict
 from dataclasses import dataclass
+from typing import Any
 
-from core.cache import get_redis
+from core.cache import get_redis, run_script
+from core.local_cache import SqliteRedis
 from core.config import cache_rate_limit_settings as settings
 
 
@@ -15,39 +21,345 @@ class RateLimitResult:
     reset_at: int | None = None
 
 
-async def check_rate_limit(key: str, limit: int, window_seconds: int, label: str) -> RateLimitResult:
-    client = get_redis()
-    if client is None:
-        return RateLimitResult(allowed=True)
+@dataclass
+class RateLimitRule:
+    """One limit to enforce: ``limit`` requests per window under ``key``."""
+
+    key: str
+    limit: int
+    window_seconds: int
+    label: str
+
+    @property
+    def redis_keys(self) -> list[str]:
+        return [f"rlw:{self.key}"]
+
+    @property
+    def script_args(self) -> list[Any]:
+        return [self.limit, self.window_seconds, self.label]
+
+
+# A sliding-window limiter as a Lua function, so scripts can enforce limits in
+# the same round trip as whatever else they do.
+#
+# The old limiter was a fixed-window counter assembled from separate INCR,
+# EXPIRE, TTL and SETEX calls. Two things were wrong with it: a process dying
+# between INCR and EXPIRE left a counter with no TTL that locked its key out
+# for good, and a client could spend a full window's allowance at the end of
+# one window and again at the start of the next. Here the whole state -- both
+# window counts, the violation streak and the backoff deadline -- lives in one
+# hash that is read and written atomically, and the previous window's count is
+# weighted by how much of it still overlaps the sliding window.
+#
+# ``served`` is how many requests a process admitted on its own since it last
+# reported; they are counted before the request at hand is judged.
+#
+# Returns ``{allowed, retry_after, limit, remaining, reset_at}``.
+LIMIT_LUA = """
+local function limit(key, max_requests, window, now, backoff_base, backoff_max, served)
+  served = served or 0
+  local state = redis.call('HMGET', key, 'start', 'current', 'previous',
+    'violations', 'violated_at', 'blocked_until')
+  local start = tonumber(state[1]) or 0
+  local current = tonumber(state[2]) or 0
+  local previous = tonumber(state[3]) or 0
+  local violations = tonumber(state[4]) or 0
+  local violated_at = tonumber(state[5]) or 0
+  local blocked_until = tonumber(state[6]) or 0
+
+  local window_start = now - (now % window)
+  if window_start ~= start then
+    if window_start - start == window then
+      previous = current
+    else
+      previous = 0
+    end
+    current = 0
+    start = window_start
+  end
+  current = current + served
+
+  if blocked_until > now then
+    if served > 0 then
+      redis.call('HSET', key, 'start', start, 'current', current, 'previous', previous)
+    end
+    return {0, math.ceil(blocked_until - now), max_requests, 0, math.ceil(blocked_until)}
+  end
+  if now - violated_at >= backoff_max then
+    violations = 0
+  end
+
+  local estimate = previous * (window - (now - start)) / window + current
+  if estimate + 1 <= max_requests then
+    redis.call('HSET', key, 'start', start, 'current', current + 1,
+      'previous', previous, 'violations', 0)
+    redis.call('EXPIRE', key, window * 2)
+    return {1, 0, max_requests, math.floor(max_requests - estimate - 1), math.ceil(start + window)}
+  end
+
+  violations = violations + 1
+  local backoff = math.min(backoff_base * 2 ^ (violations - 1), backoff_max)
+  redis.call('HSET', key, 'start', start, 'current', current, 'previous', previous,
+    'violations', violations, 'violated_at', now, 'blocked_until', now + backoff)
+  redis.call('EXPIRE', key, math.ceil(math.max(window * 2, backoff_max)))
+  return {0, math.ceil(backoff), max_requests, 0, math.ceil(now + backoff)}
+end
+"""
+
+RATE_LIMIT_SCRIPT = LIMIT_LUA + """
+return limit(KEYS[1], tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]),
+  tonumber(ARGV[4]), tonumber(ARGV[5]), tonumber(ARGV[6]))
+"""
 
-    backoff_key = f"backoff:{key}"
-    violations_key = f"violations:{key}"
-    counter_key = f"rl:{key}"
-    now = int(time.time())
 
+def sliding_window(
+    raw: str | None,
+    max_requests: int,
+    window: int,
+    now: float,
+    backoff_base: float,
+    backoff_max: float,
+    served: int = 0,
+) -> tuple[str, float, list[int]]:
+    """``LIMIT_LUA``'s ``limit`` for a backend that cannot run Lua.
+
+    Takes the key's stored state and returns the new state, its TTL and the
+    same ``{allowed, retry_after, limit, remaining, reset_at}`` reply, for
+    :meth:`SqliteRedis.transact` to apply in one transaction.
+    """
     try:
-        retry_after = await client.ttl(backoff_key)
-        if retry_after and retry_after > 0:
-            return RateLimitResult(False, retry_after, label, limit, 0, now + retry_after)
-
-        count = await client.incr(counter_key)
-        if count == 1:
-            await client.expire(counter_key, window_seconds)
-
-        ttl = await client.ttl(counter_key)
-        reset_at = now + max(ttl, 0)
-        remaining = max(limit - count, 0)
-        if count <= limit:
-            await client.delete(violations_key)
-            return RateLimitResult(True, 0, label, limit, remaining, reset_at)
-
-        violations = await client.incr(violations_key)
-        await client.expire(violations_key, settings.rate_limit_backoff_max_seconds)
-        backoff = min(
-            settings.rate_limit_backoff_base_seconds * (2 ** max(violations - 1, 0)),
-            settings.rate_limit_backoff_max_seconds,
+        state = json.loads(raw) if raw else {}
+    except ValueError:
+        state = {}
+    if not isinstance(state, dict):
+        state = {}
+    start = float(state.get("start", 0))
+    current = float(state.get("current", 0))
+    previous = float(state.get("previous", 0))
+    violations = int(state.get("violations", 0))
+    violated_at = float(state.get("violated_at", 0))
+    blocked_until = float(state.get("blocked_until", 0))
+
+    window_start = now - (now % window)
+    if window_start != start:
+        previous = current if window_start - start == window else 0
+        current = 0
+        start = window_start
+    current += served
+
+    if blocked_until > now:
+        reply = [0, math.ceil(blocked_until - now), max_requests, 0, math.ceil(blocked_until)]
+        ttl = math.ceil(max(window * 2, backoff_max))
+        if served > 0:
+            state.update(start=start, current=current, previous=previous)
+            return json.dumps(state), ttl, reply
+        return raw or "{}", ttl, reply
+    if now - violated_at >= backoff_max:
+        violations = 0
+
+    estimate = previous * (window - (now - start)) / window + current
+    state.update(start=start, previous=previous)
+    if estimate + 1 <= max_requests:
+        state.update(current=current + 1, violations=0)
+        reply = [
+            1,
+            0,
+            max_requests,
+            math.floor(max_requests - estimate - 1),
+            math.ceil(start + window),
+        ]
+        return json.dumps(state), window * 2, reply
+
+    violations += 1
+    backoff = min(backoff_base * 2 ** (violations - 1), backoff_max)
+    state.update(
+        current=current,
+        violations=violations,
+        violated_at=now,
+        blocked_until=now + backoff,
+    )
+    reply = [0, math.ceil(backoff), max_requests, 0, math.ceil(now + backoff)]
+    return json.dumps(state), math.ceil(max(window * 2, backoff_max)), reply
+
+
+async def _shared_verdict(key: str, args: list[Any]) -> Any:
+    """The limiter every worker shares: the script on Redis, or the same
+    algorithm in one SQLite transaction on the local cache."""
+    client = get_redis()
+    if isinstance(client, SqliteRedis):
+        try:
+            return await client.transact(key, lambda raw: sliding_window(raw, *args))
+        except sqlite3.Error:
+            return None
+    return await run_script(RATE_LIMIT_SCRIPT, [key], args)
+
+
+def script_now() -> float:
+    """The clock scripts are handed, fine-grained enough to slide the window."""
+    return round(time.time(), 3)
+
+
+def result_from_reply(reply: list[Any], label: str | None) -> RateLimitResult:
+    """Turn ``{allowed, retry_after, limit, remaining, reset_at}`` into a result."""
+    allowed, retry_after, limit, remaining, reset_at = (int(value) for value in reply)
+    return RateLimitResult(bool(allowed), retry_after, label, limit, remaining, reset_at)
+
+
+class LocalRateLimiter:
+    """Approximate per-process token buckets, one per limited key.
+
+    Two jobs. When Redis is absent or failing, the shared limiter fails open,
+    which left the API unprotected exactly when load was highest; these
+    buckets still hold every process to the configured rate. And since a
+    well-behaved client never comes near its limit, a bucket with plenty of
+    tokens left answers on its own, so Redis is only asked once a key is
+    actually getting close.
+
+    Requests a bucket admits on its own are still owed to the shared count:
+    they are tallied per key and sent along with the next shared check,
+    which is made at the latest once ``batch`` of the limit has piled up.
+    Left unreported, N instances could each spend ``limit * (1 - headroom)``
+    before any shared state moved. Now each holds back less than one batch
+    before its next check, and a key the shared limiter has refused is
+    checked on every request until it is let through again, so across N
+    instances a key gets at most about ``limit * (1 + N * batch)`` requests
+    per window.
+
+    Buckets refill continuously at ``limit / window`` tokens per second. Only
+    ``max_keys`` are kept, least recently used first out -- an evicted key just
+    starts again with a full bucket, which errs on the side of allowing.
+    """
+
+    def __init__(self, max_keys: int, headroom: float, batch: float = 0.1):
+        self._max_keys = max(1, max_keys)
+        self._headroom = headroom
+        self._batch = batch
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._unreported: dict[str, int] = {}
+        self._refused: set[str] = set()
+
+    def _tokens(self, rule: RateLimitRule, now: float) -> float:
+        bucket = self._buckets.get(rule.key)
+        if bucket is None:
+            return float(rule.limit)
+        tokens, updated_at = bucket
+        rate = rule.limit / rule.window_seconds
+        return min(float(rule.limit), tokens + (now - updated_at) * rate)
+
+    def near_limit(self, rule: RateLimitRule) -> bool:
+        """True when the next request would leave the bucket below headroom."""
+        tokens = self._tokens(rule, time.monotonic())
+        return tokens - 1 < rule.limit * self._headroom
+
+    def unreported(self, rule: RateLimitRule) -> int:
+        """Requests admitted here that the shared limiter has not counted."""
+        return self._unreported.get(rule.key, 0)
+
+    def due(self, rule: RateLimitRule) -> bool:
+        """True when this request should go to the shared limiter."""
+        if rule.key in self._refused or self.near_limit(rule):
+            return True
+        return self.unreported(rule) + 1 >= max(1, math.ceil(rule.limit * self._batch))
+
+    def reported(self, rule: RateLimitRule, count: int, allowed: bool) -> None:
+        """The shared limiter has counted ``count`` of the unreported, and
+        let the request that carried them through or not."""
+        left = self.unreported(rule) - count
+        if left > 0:
+            self._unreported[rule.key] = left
+        else:
+            self._unreported.pop(rule.key, None)
+        if allowed:
+            self._refused.discard(rule.key)
+        else:
+            self._refused.add(rule.key)
+
+    def take(self, rule: RateLimitRule) -> RateLimitResult:
+        """Spend one token, or refuse when the bucket is empty."""
+        now = time.monotonic()
+        tokens = self._tokens(rule, now)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+            self._unreported[rule.key] = self.unreported(rule) + 1
+
+        self._buckets[rule.key] = (tokens, now)
+        self._buckets.move_to_end(rule.key)
+        while len(self._buckets) > self._max_keys:
+            evicted, _ = self._buckets.popitem(last=False)
+            self._unreported.pop(evicted, None)
+            self._refused.discard(evicted)
+
+        rate = rule.limit / rule.window_seconds
+        wait = 0 if allowed else math.ceil((1 - tokens) / rate)
+        refill = math.ceil((rule.limit - tokens) / rate)
+        return RateLimitResult(
+            allowed,
+            wait,
+            rule.label,
+            rule.limit,
+            int(tokens),
+            int(time.time()) + (refill if allowed else wait),
         )
-        await client.setex(backoff_key, backoff, "1")
-        return RateLimitResult(False, backoff, label, limit, 0, now + backoff)
-    except Exception:
-        return RateLimitResult(allowed=True)
+
+
+def settle_locally(
+    rules: list[RateLimitRule], shared: RateLimitResult, sent: dict[str, int]
+) -> RateLimitResult:
+    """Combine the shared verdict for ``rules`` with this process's buckets.
+
+    Either can refuse: the buckets catch a key this process alone has seen too
+    often, the shared limiter one spread across every instance. ``sent`` is
+    what each rule's key told the shared limiter: its unreported requests
+    plus this one, which counts only if it was let through.
+    """
+    result, taken = shared, set()
+    if shared.allowed:
+        for rule in rules:
+            local = local_limiter.take(rule)
+            if not local.allowed:
+                result = local
+                break
+            taken.add(rule.key)
+    for rule in rules:
+        if sent.get(rule.key):
+            # A bucket that was not charged for this request has one less.
+            local_limiter.reported(
+                rule, sent[rule.key] - (rule.key not in taken), shared.allowed
+            )
+    return result
+
+
+local_limiter = LocalRateLimiter(
+    settings.local_rate_limit_max_keys,
+    settings.local_rate_limit_headroom,
+    settings.local_rate_limit_batch,
+)
+
+
+async def check_rate_limit(key: str, limit: int, window_seconds: int, label: str) -> RateLimitResult:
+    rule = RateLimitRule(key, limit, window_seconds, label)
+    due = local_limiter.due(rule)
+    served = local_limiter.unreported(rule)
+    local = local_limiter.take(rule)
+    if not local.allowed or not due:
+        return local
+
+    reply = await _shared_verdict(
+        rule.redis_keys[0],
+        [
+            limit,
+            window_seconds,
+            script_now(),
+            settings.rate_limit_backoff_base_seconds,
+            settings.rate_limit_backoff_max_seconds,
+            served,
+        ],
+    )
+    if not isinstance(reply, list) or len(reply) != 5:
+        # Redis is missing or failing; the local bucket is all there is, and
+        # the requests it admitted wait for the next shared check.
+        return local
+    result = result_from_reply(reply, label)
+    local_limiter.reported(rule, served + 1, result.allowed)
+    return result
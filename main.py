@@ -41,6 +41,7 @@ app.add_middleware(CacheRateLimitMiddleware, platform="github")
 from routes import (
     analytics_router,
     badges_router,
+    cache_router,
     docs_router,
     heatmap_router,
     profile_router,
@@ -56,6 +57,7 @@ app.include_router(badges_router)
 app.include_router(summary_router)
 app.include_router(analytics_router)
 app.include_router(pr_router)
+app.include_router(cache_router)
 # app.include_router(api_router, tags=["API"])
 
 if __name__ == "__main__":
@@ -13,6 +13,7 @@ from models.contributions import (
     GraphQLResponse,
     Week,
 )
+from models.planner import CostPlan, EndpointCost
 from models.profile import PinnedRepo
 from models.pull_requests import OrganizationContribution, PullRequestDetail
 from models.repositories import Contributor, ReleaseAsset, RepoDetail, RepoRelease
@@ -25,6 +26,8 @@ __all__ = [
     "ContributionLanguageStats",
     "ContributionsCollection",
     "Contributor",
+    "CostPlan",
+    "EndpointCost",
     "GitHubStatsResponse",
     "GithubUser",
     "GraphQLResponse",
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -32,12 +32,24 @@ class RepoContribution(BaseModel):
     # 0-100. ``None`` when GitHub could not supply contributor stats.
     contribution_percentage: Optional[float] = None
 
-    # "commits" when measured from real commit diffs, "estimated" when the
-    # language mix was sampled or derived from the repo's byte breakdown.
+    # "commits" when every commit's own diff was summed, "net" when runs of
+    # consecutive commits were measured by one compare each (lines added and
+    # removed within a run count for nothing, and a file touched twice counts
+    # once), "estimated" when the language mix was sampled or derived from the
+    # repo's byte breakdown, or scaled to the contributor stats' volume.
     method: str = "commits"
 
     # True when a budget cap meant some of the user's commits went unmeasured.
     truncated: bool = False
+    # For a mix sampled across a long history: each language's 95% margin of
+    # error on its percentage, in percentage points. ``None`` when measured
+    # exactly, or when too few commits were sampled to say.
+    language_margins: Optional[Dict[str, float]] = None
+
+    # The user's newest measured commit and its committer date, so the next
+    # measurement after a push only has to walk commits newer than these.
+    head_sha: Optional[str] = None
+    head_date: Optional[str] = None
 
 
 class ContributionLanguageStats(BaseModel):
@@ -65,6 +77,11 @@ class ContributionLanguageStats(BaseModel):
     # ``repos_analyzed``, which only counts repos they actually wrote code in.
     # Callers use this to decide if the language mix is representative.
     coverage: float = 0.0
+    # The same share weighted by lines of code rather than counted per repo:
+    # measured additions for settled repos, an estimate from size for the rest.
+    # A walk that settled the user's main project but not twenty tiny ones is
+    # nearly representative, which ``coverage`` alone does not show.
+    volume_coverage: float = 0.0
     # True when the wall-clock deadline stopped the walk early, so some
     # eligible repos went unmeasured. Call again to widen the cached set.
     partial: bool = False
@@ -0,0 +1,32 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class EndpointCost(BaseModel):
+    """What one call of a heavy endpoint is expected to cost right now."""
+
+    endpoint: str
+    # Repos the endpoint would look at, and how many of those the cache
+    # already answers for free.
+    repos: int = 0
+    cached_repos: int = 0
+
+    # GitHub REST calls and wall-clock seconds one call is expected to spend.
+    github_calls: int = 0
+    seconds: float = 0.0
+
+    # False when one call is expected to stop at its deadline or the rate
+    # limit floor and leave the rest for the next; ``calls_to_complete`` is
+    # then what it takes across however many calls to finish.
+    complete: bool = True
+    calls_to_complete: int = 0
+
+
+class CostPlan(BaseModel):
+    """A dry run: every heavy endpoint's cost for one user, from one listing."""
+
+    username: str
+    # Calls GitHub reported left in the hour, when it said.
+    rate_limit_remaining: Optional[int] = None
+    endpoints: List[EndpointCost] = Field(default_factory=list)
@@ -1,5 +1,6 @@
 from .analytics import analytics_router
 from .badges import router as badges_router
+from .cache import cache_router
 from .docs import docs_router
 from .heatmap import router as heatmap_router
 from .profile import router as profile_router
@@ -11,6 +12,7 @@ from .summary import router as summary_router
 __all__ = [
     "analytics_router",
     "badges_router",
+    "cache_router",
     # "api_router",
     "docs_router",
     "heatmap_router",
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, Path, Query
+from fastapi.responses import JSONResponse
 from typing import Any, Dict, List, Optional
 
 from models.analytics import GitHubStatsResponse, LanguageData
 from models.attribution import ContributionLanguageStats
 from models.commits import CommitDetail
+from models.planner import CostPlan
 from models.repositories import RepoDetail
 from models.stars import StarsData
 from models.canonical import make_envelope
@@ -18,6 +20,21 @@ from services.stats_svg import stats_svg_response
 
 analytics_router = APIRouter()
 
+# A plan is stale as soon as the cache it read warms up, so dry runs are kept
+# for a minute rather than the usual hour.
+DRY_RUN_MAX_AGE = 60
+DRY_RUN_DESCRIPTION = (
+    "Return the expected GitHub calls and wall time of this user's heavy "
+    "endpoints (contributions, repos, commits) instead of running this one"
+)
+
+
+def _dry_run_response(plan: CostPlan) -> JSONResponse:
+    return JSONResponse(
+        plan.model_dump(),
+        headers={"Cache-Control": f"public, max-age={DRY_RUN_MAX_AGE}"},
+    )
+
 
 @analytics_router.get(
     "/{username}/languages",
@@ -107,14 +124,21 @@ async def get_user_language_stats(
     For each repository it reports the user's commit count, lines added and
     removed, files touched, their language mix, and their share of the repo's
     total additions. `method` is `commits` when measured from real commit diffs,
-    or `estimated` when the commit budget forced a sampled language mix scaled to
-    the user's true addition total.
+    `net` when runs of consecutive commits were diffed as one range (edits undone
+    within a run do not count), or `estimated` when the commit budget forced a
+    sampled language mix -- or ranges did -- scaled to the user's true addition
+    total.
 
     Walking commit diffs is slow, so each call measures only what fits in its
     deadline and caches it. `coverage` is the fraction of eligible repos settled
     and `partial` is true when the deadline stopped the walk early -- call again
     to pick up where it left off, or pre-warm with `scripts/warm_attribution.py`.
     Cached repos are re-measured only after they are pushed to again.
+
+    With `dry_run=true` nothing is fetched beyond the repo listing: the response
+    is the plan for every heavy endpoint -- `github_calls` and `seconds` one call
+    is expected to spend, whether it would `complete`, and the
+    `calls_to_complete` across calls if not.
     """,
     responses={
         200: {
@@ -186,8 +210,13 @@ async def get_user_contribution_breakdown(
         True,
         description="Include forked repositories (only the user's own commits in them)",
     ),
+    dry_run: bool = Query(False, description=DRY_RUN_DESCRIPTION),
     analytics_service: AnalyticsService = Depends(get_analytics_service),
 ) -> ContributionLanguageStats:
+    if dry_run:
+        return _dry_run_response(
+            await analytics_service.get_user_cost_plan(username, include_forks=include_forks)
+        )
     excluded_languages = parse_excluded_languages(
         exclude=exclude,
         excluded=excluded,
@@ -374,6 +403,11 @@ async def get_user_pinned(
     `/{username}/contributions/breakdown` or `scripts/warm_attribution.py`.
 
     This endpoint provides comprehensive repository information for portfolio displays.
+
+    With `dry_run=true` nothing is fetched beyond the repo listing: the response
+    is the plan for every heavy endpoint -- `github_calls` and `seconds` one call
+    is expected to spend, whether it would `complete`, and the
+    `calls_to_complete` across calls if not.
     """,
     response_description="List of repository details with comprehensive information",
     responses={
@@ -432,8 +466,11 @@ async def get_user_repos(
             "the cache only; it never walks commit diffs on this endpoint"
         ),
     ),
+    dry_run: bool = Query(False, description=DRY_RUN_DESCRIPTION),
     analytics_service: AnalyticsService = Depends(get_analytics_service),
 ) -> List[RepoDetail]:
+    if dry_run:
+        return _dry_run_response(await analytics_service.get_user_cost_plan(username))
     return await analytics_service.get_user_repos(username, attributed=attributed)
 
 
@@ -447,6 +484,11 @@ async def get_user_repos(
     - Sorted by timestamp (most recent first)
     - Includes commit message, SHA, and URL
     - Provides comprehensive commit history for analysis
+
+    With `dry_run=true` nothing is fetched beyond the repo listing: the response
+    is the plan for every heavy endpoint -- `github_calls` and `seconds` one call
+    is expected to spend, whether it would `complete`, and the
+    `calls_to_complete` across calls if not.
     """,
     response_description="List of commit details across all repositories",
     responses={
@@ -472,8 +514,11 @@ async def get_user_repos(
 )
 async def get_user_commits(
     username: str = Path(..., description="GitHub username"),
+    dry_run: bool = Query(False, description=DRY_RUN_DESCRIPTION),
     analytics_service: AnalyticsService = Depends(get_analytics_service),
 ) -> List[CommitDetail]:
+    if dry_run:
+        return _dry_run_response(await analytics_service.get_user_cost_plan(username))
     return await analytics_service.get_user_commits(username)
 
 
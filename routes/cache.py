@@ -0,0 +1,39 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Path, Query
+
+from core import cache
+from routes.dependencies import require_purge_token
+
+
+cache_router = APIRouter()
+
+
+@cache_router.delete(
+    "/{username}/cache",
+    tags=["Cache"],
+    summary="Purge Everything Cached for a User",
+    description="""
+    Drops every cached response for the user -- stats, cards, languages,
+    negative "user does not exist" entries -- together with their per-repo
+    attribution measurements, so the next request rebuilds from GitHub.
+
+    Pass `repo` (repeatable, `owner/name`) to also drop attribution held for
+    those repositories under every user -- with the repo's cached languages,
+    contributors, contributor stats, fork source and measured commit diffs --
+    e.g. after a rename or force-push.
+
+    Requires `Authorization: Bearer <CACHE_PURGE_TOKEN>`.
+    """,
+    dependencies=[Depends(require_purge_token)],
+)
+async def purge_user_cache(
+    username: str = Path(..., description="GitHub username"),
+    repo: Optional[List[str]] = Query(
+        None, description="Repositories (owner/name) whose attribution to drop too"
+    ),
+):
+    tags = [cache.user_tag(username)]
+    tags.extend(cache.repo_tag(full_name) for full_name in repo or [] if full_name)
+    purged = await cache.purge_tags(tags)
+    return {"status": "success", "username": username, "purged": purged, "tags": tags}
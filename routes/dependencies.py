@@ -1,7 +1,10 @@
 from typing import List, Optional
+import hmac
 import os
 
-from fastapi import Depends, HTTPException
+from fastapi import Depends, Header, HTTPException
+
+from core.config import cache_rate_limit_settings
 
 from services.analytics_service import AnalyticsService
 from services.pr_service import PRService
@@ -16,6 +19,15 @@ async def get_github_token() -> str:
     return token
 
 
+async def require_purge_token(authorization: Optional[str] = Header(None)) -> None:
+    expected = cache_rate_limit_settings.cache_purge_token
+    if not expected:
+        raise HTTPException(status_code=500, detail="Cache purge token not configured")
+    scheme, _, supplied = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(supplied.strip(), expected):
+        raise HTTPException(status_code=401, detail="Invalid or missing purge token")
+
+
 async def get_analytics_service(
     token: str = Depends(get_github_token),
 ) -> AnalyticsService:
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""Time path classification the way a walk exercises it.
+
+A walk resolves every changed file of every commit to a language, so this
+builds a corpus shaped like one -- a few hundred distinct files in a mix of
+source, tests, vendored dependencies, build output and lockfiles, touched a
+handful at a time over thousands of commits -- and times three ways through
+it: the original segment-by-segment scan, the compiled classifier with its
+memo bypassed, and ``classify_paths`` as ``_accumulate_files`` calls it.
+
+    python scripts/bench_language_map.py
+    python scripts/bench_language_map.py --commits 20000 --files 2000
+"""
+
+import argparse
+import os
+import posixpath
+import random
+import sys
+import time
+from typing import Callable, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import language_map  # noqa: E402
+from services.language_map import (  # noqa: E402
+    EXTENSION_LANGUAGES,
+    FILENAME_LANGUAGES,
+    GENERATED_FILENAMES,
+    GENERATED_PATTERNS,
+    VENDORED_SEGMENTS,
+    classify_path,
+    classify_paths,
+)
+
+DIRECTORIES = [
+    "src", "src/components", "src/utils", "app/models", "lib", "pkg/server",
+    "cmd/cli", "tests", "tests/unit", "docs", "scripts", ".github/workflows",
+    "node_modules/react/cjs", "vendor/github.com/pkg/errors", "dist", "build/lib",
+    "frontend/src/pages", "api/proto", "migrations", "internal/store",
+]
+FILENAMES = [
+    "main.py", "index.ts", "App.tsx", "server.go", "lib.rs", "util.js", "styles.scss",
+    "README.md", "Dockerfile", "Makefile", "config.yaml", "schema.pb.go", "bundle.min.js",
+    "package-lock.json", "go.sum", "types.d.ts", "handler.java", "view.kt", "model.rb",
+    "notes.txt", "Cargo.lock", "component.vue", "query.sql", "build.gradle", ".gitignore",
+]
+
+
+def reference(path: str) -> Optional[str]:
+    """The classifier as it was before compilation, for comparison."""
+    normalized = path.replace("\\", "/").lower()
+    parts = normalized.split("/")
+    if any(part in VENDORED_SEGMENTS for part in parts[:-1]):
+        return None
+    if parts[-1] in GENERATED_FILENAMES:
+        return None
+    if any(pattern.search(normalized) for pattern in GENERATED_PATTERNS):
+        return None
+
+    filename = posixpath.basename(path.replace("\\", "/")).lower()
+    if not filename:
+        return None
+    if filename in FILENAME_LANGUAGES:
+        return FILENAME_LANGUAGES[filename]
+    stem = filename.split(".", 1)[0]
+    if stem in {"dockerfile", "makefile", "jenkinsfile"}:
+        return FILENAME_LANGUAGES[stem]
+    _, extension = posixpath.splitext(filename)
+    return EXTENSION_LANGUAGES.get(extension.lower()) if extension else None
+
+
+def corpus(commits: int, files: int, seed: int) -> List[List[str]]:
+    """``commits`` file lists drawn, skewed towards a hot set, from ``files`` paths."""
+    rng = random.Random(seed)
+    paths = [
+        f"{rng.choice(DIRECTORIES)}/{rng.randrange(50)}_{rng.choice(FILENAMES)}"
+        for _ in range(files)
+    ]
+    return [
+        [paths[min(int(rng.paretovariate(1.2)) - 1, files - 1)] for _ in range(rng.randint(1, 12))]
+        for _ in range(commits)
+    ]
+
+
+def timed(label: str, run: Callable[[], None], baseline: Optional[float]) -> float:
+    started = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - started
+    speedup = f"  {baseline / elapsed:5.1f}x" if baseline else ""
+    print(f"{label:<28}{elapsed * 1000:9.1f} ms{speedup}")
+    return elapsed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--commits", type=int, default=5000)
+    parser.add_argument("--files", type=int, default=600, help="Distinct paths in the repo")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    commits = corpus(args.commits, args.files, args.seed)
+    flat = [path for commit in commits for path in commit]
+    print(f"{len(commits)} commits, {len(flat)} files, {len(set(flat))} distinct paths")
+
+    uncached = classify_path.__wrapped__
+    mismatched = [path for path in set(flat) if reference(path) != uncached(path)]
+    if mismatched:
+        print(f"classifiers disagree on {len(mismatched)} paths, e.g. {mismatched[0]}")
+
+    baseline = timed("reference scan", lambda: [reference(p) for p in flat], None)
+    timed("compiled, no memo", lambda: [uncached(p) for p in flat], baseline)
+    classify_path.cache_clear()
+    timed("classify_paths, cold memo", lambda: [classify_paths(c) for c in commits], baseline)
+    timed("classify_paths, warm memo", lambda: [classify_paths(c) for c in commits], baseline)
+    print(f"memo: {classify_path.cache_info()}, limit {language_map.CLASSIFY_CACHE_SIZE}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
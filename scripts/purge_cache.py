@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""Drop everything cached for a user, or for a repository, in one go.
+
+Response entries are keyed by an opaque digest of the request and attribution
+entries by the repo's ``pushed_at``, so neither can be found by name. Both are
+indexed under tags as they are written -- ``user:<handle>`` and
+``repo:<owner/name>`` -- and this script deletes whatever a tag indexes.
+
+    python scripts/purge_cache.py tashifkhan
+    python scripts/purge_cache.py tashifkhan --repo tashifkhan/GitHub-Stats-API
+    python scripts/purge_cache.py --repo someone/renamed-project
+
+The same purge is served over HTTP as ``DELETE /{username}/cache`` for
+deployments whose cache credentials are not readable locally.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+load_dotenv(".env.local")
+
+from core import cache  # noqa: E402
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("usernames", nargs="*", help="GitHub usernames to purge")
+    parser.add_argument(
+        "--repo",
+        action="append",
+        default=[],
+        help="Repository (owner/name) whose attribution to purge; repeatable",
+    )
+    args = parser.parse_args()
+
+    tags = [cache.user_tag(name) for name in args.usernames]
+    tags.extend(cache.repo_tag(full_name) for full_name in args.repo)
+    if not tags:
+        parser.error("name at least one username or --repo")
+
+    if not cache.redis_enabled():
+        print("REDIS_URL is not set, so there is no cache to purge.", file=sys.stderr)
+        return 1
+
+    for tag in tags:
+        purged = await cache.purge_tags([tag])
+        print(f"{tag}: {purged} cached entries removed")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
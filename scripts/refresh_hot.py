@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+"""Rebuild the most requested users' cached responses before they expire.
+
+The response cache only rebuilds on demand, so whoever asks for a popular card
+just after its entry expires waits for the whole GitHub walk -- and for a card
+embedded in a busy README that happens every TTL. The middleware counts
+requests per user (core.popularity); this script takes the top of that list
+and rebuilds their entries while the old ones are still being served.
+
+    python scripts/refresh_hot.py
+    python scripts/refresh_hot.py --top 100 --before 3600
+    python scripts/refresh_hot.py --every 900          # keep running
+    python scripts/refresh_hot.py --base-url https://api.example.com
+
+Requests go through the app in-process unless ``--base-url`` names a running
+deployment. Either way they carry ``X-Cache-Refresh: $CACHE_PURGE_TOKEN``,
+which makes the middleware rebuild instead of answering from cache, so the
+token must match the one the serving app was configured with.
+
+Refreshing spends the same GitHub quota as live traffic. Before each user the
+script asks GitHub how much is left (free of charge) and stops once that falls
+to the attribution walk's floor plus ``--reserve``, so live requests are never
+starved by a warm-up.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+load_dotenv(".env.local")
+
+import httpx  # noqa: E402
+
+from core import cache  # noqa: E402
+from core.config import attribution_settings  # noqa: E402
+from core.config import cache_rate_limit_settings  # noqa: E402
+from core.middleware import cache_key  # noqa: E402
+from core.popularity import hottest  # noqa: E402
+from services.client import GITHUB_API, github_headers  # noqa: E402
+
+PLATFORM = "github"
+# The default variant of every card and snapshot a README typically embeds.
+REFRESH_ROUTES = ("stats/svg", "", "languages", "stats", "profile", "heatmap", "badges")
+
+
+async def quota_remaining(token: str) -> Optional[int]:
+    """Core API calls left for ``token``; /rate_limit itself costs nothing."""
+    try:
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            response = await client.get(f"{GITHUB_API}/rate_limit", headers=github_headers(token))
+        if response.status_code != 200:
+            return None
+        return int(response.json()["resources"]["core"]["remaining"])
+    except (httpx.HTTPError, KeyError, TypeError, ValueError):
+        return None
+
+
+async def stale_paths(username: str, before: int) -> List[str]:
+    """The user's paths with no entry, or one expiring within ``before`` seconds."""
+    client = cache.get_redis()
+    paths = []
+    for route in REFRESH_ROUTES:
+        path = "/" + "/".join(part for part in (username, route) if part)
+        try:
+            ttl = await client.ttl(cache_key(PLATFORM, "GET", path, []))
+        except Exception:
+            ttl = -2
+        # -2: missing, -1: no expiry (never written by the middleware).
+        if ttl != -1 and ttl < before:
+            paths.append(path)
+    return paths
+
+
+async def refresh(http: httpx.AsyncClient, username: str, before: int, refresh_token: str) -> int:
+    """Rebuild ``username``'s stale entries; returns how many were rebuilt."""
+    rebuilt = 0
+    for path in await stale_paths(username, before):
+        started = time.perf_counter()
+        try:
+            response = await http.get(path, headers={"X-Cache-Refresh": refresh_token})
+        except httpx.HTTPError as exc:
+            print(f"  {path}: {type(exc).__name__}: {exc}", file=sys.stderr)
+            continue
+        elapsed = time.perf_counter() - started
+        print(f"  {path}: {response.status_code} in {elapsed:.1f}s")
+        if response.status_code == 200:
+            rebuilt += 1
+    return rebuilt
+
+
+async def run_once(args, http: httpx.AsyncClient, token: str, refresh_token: str) -> int:
+    users = await hottest(PLATFORM, args.top)
+    if not users:
+        print("no request counts recorded yet")
+        return 0
+
+    floor = attribution_settings.rate_limit_floor + args.reserve
+    rebuilt = 0
+    for position, (username, score) in enumerate(users, 1):
+        remaining = await quota_remaining(token)
+        if remaining is not None and remaining < floor:
+            print(
+                f"GitHub quota at {remaining} (floor {floor}); "
+                f"stopping after {position - 1} of {len(users)} users"
+            )
+            break
+        print(f"{position}. {username} ({score:.1f} weighted requests)")
+        rebuilt += await refresh(http, username, args.before, refresh_token)
+
+    print(f"rebuilt {rebuilt} entries")
+    return rebuilt
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--top", type=int, default=50, help="Users to refresh (default: 50)")
+    parser.add_argument(
+        "--before",
+        type=int,
+        default=1800,
+        help="Rebuild entries expiring within this many seconds (default: 1800)",
+    )
+    parser.add_argument(
+        "--reserve",
+        type=int,
+        default=1000,
+        help="GitHub calls to leave for live traffic above the floor (default: 1000)",
+    )
+    parser.add_argument(
+        "--every",
+        type=float,
+        default=0,
+        help="Repeat every this many seconds instead of running once",
+    )
+    parser.add_argument("--base-url", help="Refresh a running deployment instead of in-process")
+    args = parser.parse_args()
+
+    token = os.getenv("GITHUB_TOKEN", "")
+    if not token:
+        print("GITHUB_TOKEN is not set", file=sys.stderr)
+        return 1
+
+    refresh_token = cache_rate_limit_settings.cache_purge_token
+    if not refresh_token:
+        print("CACHE_PURGE_TOKEN is not set, so refreshes cannot be authorised", file=sys.stderr)
+        return 1
+
+    if not cache.redis_enabled():
+        print("REDIS_URL is not set, so there is no cache to refresh", file=sys.stderr)
+        return 1
+
+    if args.base_url:
+        http = httpx.AsyncClient(base_url=args.base_url, timeout=120.0)
+    else:
+        from main import app
+
+        http = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://refresh", timeout=120.0
+        )
+
+    async with http:
+        while True:
+            await run_once(args, http, token, refresh_token)
+            if not args.every:
+                return 0
+            await asyncio.sleep(args.every)
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
@@ -9,20 +9,45 @@ before anyone asks for it.
 
     python scripts/warm_attribution.py tashifkhan
     python scripts/warm_attribution.py tashifkhan someone-else --passes 6
+    python scripts/warm_attribution.py --users-file users.txt --concurrency 8 --budget 20000
 
-Needs GITHUB_TOKEN and REDIS_URL in the environment; without Redis there is no
-cache to warm and the script says so rather than burning API calls for nothing.
+Needs GITHUB_TOKEN (or a comma-separated GITHUB_TOKENS pool) and REDIS_URL in
+the environment; without Redis there is no cache to warm and the script says
+so rather than burning API calls for nothing.
 
-Each pass measures whichever repos are still uncached and stops at the deadline,
-so several passes walk steadily through a large account. Re-running is cheap:
-cached repos cost nothing until they are pushed to again.
+Users are warmed ``--concurrency`` at a time. Each pass measures whichever of a
+user's repos are still uncached and stops at the deadline, so several passes
+walk steadily through a large account; between passes the repo listing is an
+unbilled 304 and the cache is read from the walk's manifest, so a pass that
+finds nothing new costs next to nothing. Every pass is recorded in the
+``--checkpoint`` file, so a crash or an interrupt resumes where it left off and
+users already complete are skipped until their cached results expire
+(``ATTRIBUTION_CACHE_TTL_SECONDS``), when they are warmed again.
+
+Every user is planned first (services/planner.py: one repo listing, free when
+unchanged, and a read of the cache) and warmed cheapest first, so a budget that
+runs out has finished as many users as it could. Before each pass the user is
+planned again and the workers take the token with the most quota left, but only
+one that can pay for the whole pass and still keep the attribution walk's floor
+plus ``--reserve``; when none can, they wait for the earliest hourly reset and
+carry on, so live traffic is never starved. ``--budget`` caps the GitHub calls
+the whole run may spend, counted from the script's own requests so live
+traffic on a shared token is not charged to it, and a pass it cannot cover is
+not started.
+
+``--backend clone`` measures each repo's full history from a local clone
+instead of one API call per commit; it needs ``git`` on the PATH. Commits are
+matched to the user by their noreply address only; pass the names or emails
+they commit under with ``--author``.
 """
 
 import argparse
 import asyncio
+import json
 import os
 import sys
 import time
+from typing import Any, Dict, List, Optional, Tuple
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -31,42 +56,254 @@ from dotenv import load_dotenv
 load_dotenv()
 load_dotenv(".env.local")
 
+import httpx  # noqa: E402
+
 from core import cache  # noqa: E402
 from core.config import attribution_settings  # noqa: E402
+from models.planner import EndpointCost  # noqa: E402
 from services.attribution import get_user_contributions  # noqa: E402
+from services.client import GITHUB_API, github_headers  # noqa: E402
+from services.planner import plan_user  # noqa: E402
+
+
+async def rate_limit(token: str) -> Optional[Tuple[int, float]]:
+    """Core calls left for ``token`` and when they reset; /rate_limit is free."""
+    try:
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            response = await client.get(f"{GITHUB_API}/rate_limit", headers=github_headers(token))
+        if response.status_code != 200:
+            return None
+        core = response.json()["resources"]["core"]
+        return int(core["remaining"]), float(core["reset"])
+    except (httpx.HTTPError, KeyError, TypeError, ValueError):
+        return None
+
+
+class TokenPool:
+    """The run's GitHub tokens, and how much of their quota it has spent.
+
+    Each token's remaining quota is read from /rate_limit, which is what the
+    floor is kept against. Spending is counted per response instead: the
+    tokens may be serving live traffic too, and the drop between two readings
+    would charge those calls to the run's budget.
+    """
+
+    def __init__(self, tokens: List[str], floor: int, budget: int):
+        self.tokens = tokens
+        self.floor = floor
+        self.budget = budget
+        self.spent = 0
+        self._remaining: Dict[str, Optional[int]] = {token: None for token in tokens}
+        self._reset_at: Dict[str, float] = {token: 0.0 for token in tokens}
+        self._lock = asyncio.Lock()
+
+    async def _read(self, token: str) -> None:
+        reading = await rate_limit(token)
+        if reading is None:
+            return
+        self._remaining[token], self._reset_at[token] = reading
+
+    async def count(self, response: httpx.Response) -> None:
+        """Charge one of the run's own responses; a 304 is not billed."""
+        if response.status_code != 304:
+            self.spent += 1
+
+    @property
+    def exhausted(self) -> bool:
+        return bool(self.budget) and self.spent >= self.budget
+
+    def peek(self) -> str:
+        """The token with the most quota at the last reading, for cheap reads."""
+        return max(self.tokens, key=lambda token: self._remaining[token] or 0)
+
+    async def acquire(self, need: int = 0) -> Optional[str]:
+        """The token with the most quota that can spend ``need`` calls and stay
+        above the floor, waiting out resets.
+
+        ``None`` once the run's budget is spent or cannot cover ``need``. A
+        pass larger than any token's headroom goes to the fullest token once
+        they have reset, rather than waiting forever.
+        """
+        async with self._lock:
+            while True:
+                for token in self.tokens:
+                    await self._read(token)
+                if self.exhausted or (self.budget and self.spent + need > self.budget):
+                    return None
+                usable = [
+                    token
+                    for token in self.tokens
+                    if self._remaining[token] is None
+                    or self._remaining[token] - need > self.floor
+                ]
+                if usable:
+                    return max(usable, key=lambda token: self._remaining[token] or 0)
+                # Holding the lock while asleep pauses every worker, as it should.
+                wake = min(self._reset_at.values())
+                print(
+                    f"every token is at the floor ({self.floor}); "
+                    f"waiting until {time.strftime('%H:%M:%S', time.localtime(wake))}"
+                )
+                await asyncio.sleep(max(1.0, wake - time.time() + 5))
+                need = 0
+
+
+class Checkpoint:
+    """Per-user progress, written to disk after every pass."""
+
+    def __init__(self, path: str, fresh: bool):
+        self.path = path
+        self.users: Dict[str, Dict[str, Any]] = {}
+        if not fresh and os.path.exists(path):
+            try:
+                with open(path) as handle:
+                    self.users = dict(json.load(handle).get("users") or {})
+            except (OSError, ValueError):
+                print(f"ignoring unreadable checkpoint {path}", file=sys.stderr)
+
+    def get(self, username: str) -> Dict[str, Any]:
+        return self.users.setdefault(username, {"status": "pending", "passes": 0})
+
+    def current(self, username: str, ttl: float) -> bool:
+        """Whether ``username`` was completed recently enough to still be cached."""
+        state = self.get(username)
+        completed_at = state.get("completed_at")
+        return (
+            state["status"] == "complete"
+            and completed_at is not None
+            and time.time() - completed_at < ttl
+        )
+
+    def save(self) -> None:
+        # Written aside and swapped in, so a crash mid-write keeps the last one.
+        partial = f"{self.path}.tmp"
+        with open(partial, "w") as handle:
+            json.dump({"users": self.users}, handle, indent=1, sort_keys=True)
+        os.replace(partial, self.path)
+
+
+class Throughput:
+    """Repos settled and calls spent since the run started."""
+
+    def __init__(self, pool: TokenPool, checkpoint: Checkpoint, usernames: List[str]):
+        self.pool = pool
+        self.checkpoint = checkpoint
+        self.usernames = usernames
+        self.started = time.perf_counter()
+        self.repos = 0
+
+    def report(self) -> str:
+        minutes = max((time.perf_counter() - self.started) / 60, 1e-9)
+        rate = self.repos / minutes
+        users = [self.checkpoint.get(name) for name in self.usernames]
+        known = [user for user in users if user.get("considered")]
+        left = sum(user["considered"] - user.get("settled", 0) for user in known)
+        # Users not walked yet are assumed to be as large as the ones that were.
+        unknown = sum(1 for user in users if not user.get("considered"))
+        if known and unknown:
+            left += unknown * sum(user["considered"] for user in known) / len(known)
+        calls = f"{self.pool.spent / self.repos:.1f}" if self.repos else "-"
+        eta = f"{left / rate:.0f} min" if rate > 0 else "unknown"
+        planned = sum(
+            user.get("planned", 0) for user in users if user.get("status") != "complete"
+        )
+        return (
+            f"{rate:.1f} repos/min, {calls} calls/repo, {self.pool.spent} calls spent, "
+            f"~{left:.0f} repos and ~{planned} calls left, eta {eta}"
+        )
+
+
+async def plan(username: str, pool: TokenPool, args: argparse.Namespace) -> EndpointCost:
+    """What the next pass over ``username`` is expected to cost."""
+    costs = await plan_user(
+        username, pool.peek(), deadline_seconds=args.deadline, on_response=pool.count
+    )
+    return next(cost for cost in costs.endpoints if cost.endpoint == "contributions")
+
 
+async def warm(
+    username: str,
+    pool: TokenPool,
+    checkpoint: Checkpoint,
+    throughput: Throughput,
+    args: argparse.Namespace,
+) -> bool:
+    """Walk ``username`` until fully cached or ``--passes`` is used up."""
+    state = checkpoint.get(username)
+    passes = 0
+    while passes < args.passes:
+        cost = await plan(username, pool, args)
+        state["planned"] = cost.calls_to_complete
+        # The plan is of an API walk; a clone costs next to no calls.
+        need = cost.github_calls if args.backend == "api" else 0
+        token = await pool.acquire(need)
+        if token is None:
+            if not pool.exhausted:
+                print(
+                    f"{username}: next pass needs ~{need} calls, more than "
+                    f"the budget has left -- run again to continue"
+                )
+            return False
 
-async def warm(username: str, token: str, passes: int, deadline: float) -> bool:
-    """Walk ``username`` until fully cached or ``passes`` is used up."""
-    for attempt in range(1, passes + 1):
         started = time.perf_counter()
         stats = await get_user_contributions(
             username,
             token,
             include_repositories=False,
-            deadline_seconds=deadline,
+            deadline_seconds=args.deadline,
+            backend=args.backend,
+            authors=args.author,
+            on_response=pool.count,
         )
         elapsed = time.perf_counter() - started
 
-        print(
-            f"  pass {attempt}/{passes}: coverage {stats.coverage:.0%} "
-            f"({stats.repos_analyzed} of {stats.repos_considered} repos, "
-            f"{stats.total_commits} commits) in {elapsed:.1f}s"
+        settled = round(stats.coverage * stats.repos_considered)
+        throughput.repos += max(0, settled - state.get("settled", 0))
+        if stats.status != "rate_limited":
+            # A walk cut off by the quota floor used up no pass; it resumes
+            # once acquire() has found a token with room again.
+            passes += 1
+            state["passes"] += 1
+        state.update(
+            status="partial" if stats.partial else "complete",
+            coverage=stats.coverage,
+            considered=stats.repos_considered,
+            settled=settled,
         )
+        if not stats.partial:
+            state["completed_at"] = time.time()
+        checkpoint.save()
 
+        print(
+            f"{username} pass {passes}/{args.passes}: coverage {stats.coverage:.0%} "
+            f"({settled} of {stats.repos_considered} repos, {stats.status}) in {elapsed:.1f}s"
+            f" | {throughput.report()}"
+        )
         if not stats.partial:
-            print(f"  {username} fully cached")
-            for language in stats.languages[:8]:
-                print(f"    {language.name:<20} {language.percentage:6.2f}%")
             return True
 
-    print(f"  {username} still partial -- run again to continue")
+    print(f"{username} still partial after {args.passes} passes -- run again to continue")
     return False
 
 
+def read_usernames(args: argparse.Namespace) -> List[str]:
+    usernames = list(args.usernames)
+    if args.users_file:
+        with open(args.users_file) as handle:
+            for line in handle:
+                name = line.split("#", 1)[0].strip()
+                if name:
+                    usernames.append(name)
+    # Order kept, duplicates dropped.
+    return list(dict.fromkeys(usernames))
+
+
 async def main() -> int:
-    parser = argparse.ArgumentParser(description=__doc__)
-    parser.add_argument("usernames", nargs="+", help="GitHub usernames to warm")
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("usernames", nargs="*", help="GitHub usernames to warm")
+    parser.add_argument("--users-file", help="File of usernames, one per line; # starts a comment")
     parser.add_argument(
         "--passes",
         type=int,
@@ -79,10 +316,51 @@ async def main() -> int:
         default=60.0,
         help="Seconds each walk may spend measuring (default: 60)",
     )
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="Users warmed at once (default: 4)"
+    )
+    parser.add_argument(
+        "--budget",
+        type=int,
+        default=0,
+        help="GitHub calls the whole run may spend; 0 for no cap (default: 0)",
+    )
+    parser.add_argument(
+        "--reserve",
+        type=int,
+        default=1000,
+        help="GitHub calls to leave for live traffic above the floor (default: 1000)",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=".warm_attribution.json",
+        help="Where progress is kept between runs (default: .warm_attribution.json)",
+    )
+    parser.add_argument("--fresh", action="store_true", help="Ignore any existing checkpoint")
+    parser.add_argument(
+        "--backend",
+        choices=["api", "clone"],
+        default="api",
+        help="Measure through the API, or from local git clones (default: api)",
+    )
+    parser.add_argument(
+        "--author",
+        action="append",
+        default=[],
+        help="Another name or email the user commits under (clone backend); repeatable",
+    )
     args = parser.parse_args()
 
-    token = os.getenv("GITHUB_TOKEN", "")
-    if not token:
+    usernames = read_usernames(args)
+    if not usernames:
+        parser.error("name at least one username or --users-file")
+
+    tokens = [
+        token.strip()
+        for token in (os.getenv("GITHUB_TOKENS") or os.getenv("GITHUB_TOKEN", "")).split(",")
+        if token.strip()
+    ]
+    if not tokens:
         print("GITHUB_TOKEN is not set", file=sys.stderr)
         return 1
 
@@ -94,22 +372,57 @@ async def main() -> int:
         )
         return 1
 
+    checkpoint = Checkpoint(args.checkpoint, args.fresh)
+    pool = TokenPool(tokens, attribution_settings.rate_limit_floor + args.reserve, args.budget)
+    throughput = Throughput(pool, checkpoint, usernames)
+    ttl = attribution_settings.cache_ttl_seconds
+    pending = [name for name in usernames if not checkpoint.current(name, ttl)]
+
+    # Planning is one listing per user, an unbilled 304 for anyone walked
+    # before, so the whole list is sized up front and the cheapest go first.
+    slots = asyncio.Semaphore(max(1, args.concurrency))
+
+    async def size_up(username: str) -> None:
+        async with slots:
+            try:
+                cost = await plan(username, pool, args)
+            except Exception as exc:  # warm() reports it again and marks it failed
+                print(f"{username} could not be planned: {type(exc).__name__}", file=sys.stderr)
+                return
+        checkpoint.get(username)["planned"] = cost.calls_to_complete
+
+    await asyncio.gather(*(size_up(name) for name in pending))
+    checkpoint.save()
+    pending.sort(key=lambda name: checkpoint.get(name).get("planned", 0))
     print(
-        f"warming {len(args.usernames)} user(s), "
-        f"{args.deadline:.0f}s per pass, max {args.passes} passes"
+        f"warming {len(pending)} of {len(usernames)} user(s) "
+        f"({len(usernames) - len(pending)} complete and still cached), "
+        f"{args.concurrency} at a time, "
+        f"{len(tokens)} token(s), {args.deadline:.0f}s per pass, max {args.passes} passes, "
+        f"~{sum(checkpoint.get(name).get('planned', 0) for name in pending)} calls planned"
     )
 
-    complete = 0
-    for username in args.usernames:
-        print(f"\n{username}:")
-        try:
-            if await warm(username, token, args.passes, args.deadline):
-                complete += 1
-        except Exception as exc:  # keep going through the rest of the list
-            print(f"  failed: {type(exc).__name__}: {exc}", file=sys.stderr)
-
-    print(f"\n{complete}/{len(args.usernames)} fully cached")
-    return 0 if complete == len(args.usernames) else 2
+    queue: "asyncio.Queue[str]" = asyncio.Queue()
+    for username in pending:
+        queue.put_nowait(username)
+
+    async def worker() -> None:
+        while not queue.empty() and not pool.exhausted:
+            username = queue.get_nowait()
+            try:
+                await warm(username, pool, checkpoint, throughput, args)
+            except Exception as exc:  # keep going through the rest of the list
+                checkpoint.get(username)["status"] = "failed"
+                checkpoint.save()
+                print(f"{username} failed: {type(exc).__name__}: {exc}", file=sys.stderr)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, args.concurrency))))
+
+    if pool.exhausted:
+        print(f"budget of {args.budget} calls spent; run again to continue")
+    complete = sum(1 for name in usernames if checkpoint.get(name)["status"] == "complete")
+    print(f"\n{complete}/{len(usernames)} fully cached | {throughput.report()}")
+    return 0 if complete == len(usernames) else 2
 
 
 if __name__ == "__main__":
@@ -7,6 +7,7 @@ from core.config import attribution_settings
 from models.analytics import GitHubStatsResponse, LanguageData
 from models.attribution import ContributionLanguageStats
 from models.commits import CommitDetail
+from models.planner import CostPlan
 from models.repositories import RepoDetail
 from models.stars import StarsData
 from services.achievements import get_user_achievements
@@ -19,6 +20,7 @@ from services.contributions import (
     get_contribution_graphs,
 )
 from services.languages import get_attributed_language_stats, get_language_stats
+from services.planner import plan_user
 from services.profile import (
     get_user_pinned_repos,
     get_user_profile,
@@ -74,6 +76,18 @@ class AnalyticsService:
             deadline_seconds=attribution_settings.breakdown_deadline_seconds,
         )
 
+    async def get_user_cost_plan(
+        self, username: str, include_forks: bool = True
+    ) -> CostPlan:
+        # Planned against the breakdown endpoint's deadline, since that is the
+        # walk a dry run of it stands in for.
+        return await plan_user(
+            username,
+            self.token,
+            include_forks=include_forks,
+            deadline_seconds=attribution_settings.breakdown_deadline_seconds,
+        )
+
     async def get_user_profile(self, username: str) -> Dict[str, Any]:
         return await get_user_profile(username, self.token)
 
@@ -10,13 +10,19 @@ Cost control, in order of preference:
 
 1. If the user's commit count in a repo fits the budget, every commit diff is
    read and the result is exact.
-2. If it does not, the newest commits are sampled for the *language mix* and
+2. If it does not, commits spread across the user's whole history are
+   sampled for the *language mix*, with a margin of error per language, and
    scaled up to the user's real addition total from the contributor stats.
 3. If commit diffs are unavailable entirely, the user's additions are spread
    across the repo's language byte breakdown.
 
 Per-repo results are cached in Redis keyed by the repo's ``pushed_at``, so a repo
-is only re-measured after it receives new commits.
+is only re-measured after it receives new commits -- and then only the commits
+above the last measured head are walked. A per-user manifest records
+the same results plus the repo listing's ETag, so a warm account is answered
+from one cache read and a conditional listing that GitHub does not bill.
+Repos that share history -- an upstream and the user's forks of it -- count
+each common commit once, against whichever of them listed it first.
 
 A full cold walk costs minutes, far more than a serverless request allows, so
 every walk carries a :class:`Deadline`. Cached repos are always free; uncached
@@ -27,9 +33,17 @@ coverage is too thin.
 """
 
 import asyncio
+import codecs
+import copy
+import json
+import math
+import os
 import re
+import tempfile
 import time
-from typing import Any, Dict, List, Optional, Tuple
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
 
 import httpx
 
@@ -41,12 +55,14 @@ from models.attribution import (
     RepoContribution,
 )
 from services.client import (
+    BASE_GITHUB_URL,
     GITHUB_API,
     github_headers,
     raise_for_github_status,
     rate_limit_remaining,
 )
-from services.language_map import detect_language, filter_languages, is_vendored
+from services import repo_cache
+from services.language_map import classify_paths, filter_languages
 
 CACHE_VERSION = "v1"
 
@@ -120,25 +136,207 @@ class WalkProgress:
     def __init__(self) -> None:
         self.resolved = 0
         self.deferred = 0
+        # full_name -> contribution (``None`` for "nothing of theirs here") for
+        # every repo resolved by name, which is what the manifest records.
+        self.settled: Dict[str, Optional[RepoContribution]] = {}
+
+    def resolve(
+        self, full_name: Optional[str] = None, contribution: Optional[RepoContribution] = None
+    ) -> None:
+        self.resolved += 1
+        if full_name:
+            self.settled[full_name] = contribution
+
+
+class _BudgetPool:
+    """The state every share of one :class:`AttributionBudget` draws on."""
+
+    def __init__(self, total: int, minimum: int):
+        self.remaining = total
+        self.minimum = minimum
+        self.demand: Dict[str, float] = {}
+        self.used: Dict[str, int] = {}
+        self.finished: Set[str] = set()
+
+    def reserved(self, excluding: Optional[str]) -> int:
+        """Calls held back for repos other than ``excluding`` to reach their quota."""
+        active = {
+            key: need
+            for key, need in self.demand.items()
+            if key not in self.finished and need > 0
+        }
+        if not active:
+            return 0
+        # What is left to share among the repos still measuring, counting
+        # what they have already spent from it.
+        pool = self.remaining + sum(self.used.get(key, 0) for key in active)
+        guaranteed = {key: min(need, self.minimum) for key, need in active.items()}
+        if sum(guaranteed.values()) >= pool:
+            total_need = sum(active.values())
+            quotas = {key: pool * need / total_need for key, need in active.items()}
+        else:
+            spare = pool - sum(guaranteed.values())
+            wanted = sum(need - guaranteed[key] for key, need in active.items())
+            quotas = {
+                key: min(
+                    need,
+                    guaranteed[key]
+                    + (spare * (need - guaranteed[key]) / wanted if wanted else 0),
+                )
+                for key, need in active.items()
+            }
+        return math.ceil(
+            sum(
+                max(0.0, quota - self.used.get(key, 0))
+                for key, quota in quotas.items()
+                if key != excluding
+            )
+        )
 
 
 class AttributionBudget:
-    """Caps how many commit-detail requests a single user lookup may spend."""
+    """Caps how many commit-detail requests a single user lookup may spend.
+
+    Handed out first come, first served, the repos that listed first took up
+    to ``max_commits_per_repo`` each and left the rest of the walk with
+    nothing to measure. Instead each repo gets a quota in proportion to the
+    commits it has to measure -- estimated for the whole walk by :meth:`plan`,
+    corrected by :meth:`declare` once its listing is in -- with at least
+    ``minimum_share`` each. A repo may go past its quota only into calls no
+    other repo still has a claim on, and :meth:`finish` hands back whatever it
+    was owed but did not use. Takes made without a :meth:`share` are only
+    limited by what the planned repos are owed.
+
+    Everything here is plain arithmetic with no awaits in between, so the
+    event loop already serialises it and no lock is needed.
+    """
+
+    def __init__(self, max_commit_details: int, minimum_share: int = 0):
+        self._pool = _BudgetPool(max(0, max_commit_details), max(0, minimum_share))
+        self._key: Optional[str] = None
+
+    def share(self, key: Optional[str]) -> "AttributionBudget":
+        """This budget as one repo draws on it, against that repo's quota."""
+        shared = copy.copy(self)
+        shared._key = key
+        return shared
 
-    def __init__(self, max_commit_details: int):
-        self._remaining = max(0, max_commit_details)
-        self._lock = asyncio.Lock()
+    def plan(self, demand: Dict[str, float]) -> None:
+        """Expected commits to measure per repo, before any has been listed."""
+        for key, need in demand.items():
+            self._pool.demand[key] = max(0.0, float(need))
+
+    def declare(self, need: float) -> None:
+        """Correct this share's expected commits once its listing is known."""
+        if self._key is not None:
+            self._pool.demand[self._key] = max(0.0, float(need))
+
+    def finish(self) -> None:
+        """Release what this share was owed but did not take."""
+        if self._key is not None:
+            self._pool.finished.add(self._key)
 
     async def take(self, requested: int) -> int:
         """Reserve up to ``requested`` calls, returning how many were granted."""
-        async with self._lock:
-            granted = min(requested, self._remaining)
-            self._remaining -= granted
-            return granted
+        pool = self._pool
+        available = pool.remaining - pool.reserved(excluding=self._key)
+        granted = max(0, min(requested, available))
+        pool.remaining -= granted
+        if self._key is not None:
+            pool.used[self._key] = pool.used.get(self._key, 0) + granted
+        return granted
 
     @property
     def remaining(self) -> int:
-        return self._remaining
+        return self._pool.remaining
+
+
+class CommitLedger:
+    """Which of the user's repos each of their shared commits counts against.
+
+    A fork repeats its upstream's history, so listing by author finds the
+    user's commits again in every copy: work merged upstream and synced back,
+    and everything once more in a fork of a fork. Each copy used to measure
+    and count them, inflating the totals of anyone with a few forks of the same
+    project. Repos sharing history are grouped into a *network* by their fork
+    source, and within one the first repo to list a commit owns it; the others
+    skip it. Claims are kept per user and network, so they hold across walks
+    in which the owning repo was settled from cache and never listed.
+    """
+
+    def __init__(self, username: str, networks: Dict[str, str], live: Set[str]):
+        self._username = username
+        # full_name -> network, for repos whose network has more than one of them.
+        self._networks = networks
+        # Every repo the user still has; a claim held by any other is released.
+        self._live = live
+        self._claims: Dict[str, Dict[str, str]] = {}
+        self._recorded: Dict[str, Set[str]] = {}
+        self._changed: Set[str] = set()
+
+    def _key(self, network: str) -> str:
+        return f"gh:attr:{CACHE_VERSION}:ledger:{self._username.lower()}:{network}"
+
+    async def load(self) -> None:
+        networks = sorted(set(self._networks.values()))
+        if not networks:
+            return
+        stored = await cache.get_many_json([self._key(network) for network in networks]) or {}
+        for network in networks:
+            entry = stored.get(self._key(network)) or {}
+            self._claims[network] = dict(entry.get("claims") or {})
+            self._recorded[network] = set(entry.get("repos") or [])
+
+    def network(self, full_name: Optional[str]) -> Optional[str]:
+        return self._networks.get(full_name) if full_name else None
+
+    def unrecorded(self, full_name: Optional[str]) -> bool:
+        """Whether a repo in a shared network has never claimed its commits.
+
+        That happens when it was measured before a second repo joined its
+        network, and its cached result may then count commits a sibling
+        counts too; it has to be listed again to claim them.
+        """
+        network = self.network(full_name)
+        return network is not None and full_name not in self._recorded.get(network, set())
+
+    def claim(self, full_name: Optional[str], shas: List[str]) -> List[str]:
+        """The subset of ``shas`` that ``full_name`` owns, claiming any unowned."""
+        network = self.network(full_name)
+        if network is None:
+            return list(shas)
+
+        claims = self._claims.setdefault(network, {})
+        owned = []
+        for sha in shas:
+            holder = claims.get(sha)
+            if holder is None or holder not in self._live:
+                claims[sha] = holder = full_name
+                self._changed.add(network)
+            if holder == full_name:
+                owned.append(sha)
+
+        recorded = self._recorded.setdefault(network, set())
+        if full_name not in recorded:
+            recorded.add(full_name)
+            self._changed.add(network)
+        return owned
+
+    async def save(self) -> None:
+        for network in sorted(self._changed):
+            key = self._key(network)
+            await cache.set_json(
+                key,
+                {
+                    "claims": self._claims.get(network, {}),
+                    "repos": sorted(self._recorded.get(network, set())),
+                },
+                settings.cache_ttl_seconds,
+            )
+            await cache.tag_keys(
+                [key], [cache.user_tag(self._username)], settings.cache_ttl_seconds
+            )
+        self._changed.clear()
 
 
 def _last_page(response: httpx.Response) -> Optional[int]:
@@ -180,15 +378,34 @@ async def _list_commit_shas(
     token: str,
     limit: int,
     deadline: "Deadline",
+    since: Optional[str] = None,
+    dates: Optional[Dict[str, str]] = None,
+    start_page: int = 1,
+    parents: Optional[Dict[str, List[str]]] = None,
+    outcome: Optional[Dict[str, bool]] = None,
 ) -> List[str]:
-    """Newest-first SHAs authored by ``username``, capped at ``limit``."""
+    """Newest-first SHAs authored by ``username``, capped at ``limit``.
+
+    ``since`` restricts the listing to commits dated at or after it, and
+    ``dates`` and ``parents``, when given, are filled with each listed
+    commit's committer date and parent SHAs.
+    Pages are always 100 long, so a listing cut short after ``n`` full pages
+    can carry on from ``start_page=n + 1``.
+
+    ``outcome["finished"]`` is set to whether the listing got to its end: a
+    short or empty page, or ``limit`` SHAs. A failed request or the deadline
+    leave it unfinished -- but not a last page that lands after the deadline.
+    """
     shas: List[str] = []
+    finished = False
     url = f"{GITHUB_API}/repos/{owner}/{repo}/commits"
-    page = 1
+    page = start_page
+    per_page = 100
 
     while len(shas) < limit and not deadline.expired:
-        per_page = min(100, limit - len(shas))
         params = {"author": username, "per_page": str(per_page), "page": str(page)}
+        if since:
+            params["since"] = since
         try:
             response = await client.get(
                 url, params=params, headers=github_headers(token)
@@ -200,17 +417,33 @@ async def _list_commit_shas(
             break
 
         payload = response.json()
-        if not isinstance(payload, list) or not payload:
+        if not isinstance(payload, list):
+            break
+        if not payload:
+            finished = True
             break
 
         for item in payload:
             if isinstance(item, dict) and item.get("sha"):
                 shas.append(item["sha"])
+                if dates is not None:
+                    committer = (item.get("commit") or {}).get("committer") or {}
+                    if committer.get("date"):
+                        dates[item["sha"]] = committer["date"]
+                if parents is not None and isinstance(item.get("parents"), list):
+                    parents[item["sha"]] = [
+                        parent["sha"]
+                        for parent in item["parents"]
+                        if isinstance(parent, dict) and parent.get("sha")
+                    ]
 
         if len(payload) < per_page:
+            finished = True
             break
         page += 1
 
+    if outcome is not None:
+        outcome["finished"] = finished or len(shas) >= limit
     return shas[:limit]
 
 
@@ -261,6 +494,182 @@ async def _fetch_commit_files(
     return files if isinstance(files, list) else []
 
 
+class _ContributorTally:
+    """Per-author totals from ``/stats/contributors``, folded one entry at a time.
+
+    ``authors`` maps each lower-cased login to ``[additions, deletions,
+    commits]``; the weekly breakdown is summed in one pass and dropped, since
+    it is most of the size and nothing downstream needs it. Every author is
+    kept, three numbers each, because the summary is cached per repo and read
+    by every user's walk.
+    """
+
+    def __init__(self) -> None:
+        self.authors: Dict[str, List[int]] = {}
+        self.repo_additions = 0
+
+    def add(self, entry: Any) -> None:
+        if not isinstance(entry, dict):
+            return
+        weeks = entry.get("weeks")
+        additions = deletions = 0
+        for week in weeks if isinstance(weeks, list) else ():
+            if isinstance(week, dict):
+                additions += int(week.get("a") or 0)
+                deletions += int(week.get("d") or 0)
+        self.repo_additions += additions
+
+        author = entry.get("author")
+        login = author.get("login", "") if isinstance(author, dict) else ""
+        if login:
+            self.authors[login.lower()] = [additions, deletions, int(entry.get("total") or 0)]
+
+    def summary(self) -> Dict[str, Any]:
+        return {"repo_additions": self.repo_additions, "authors": self.authors}
+
+
+def _summarize_contributors(payload: Any) -> Optional[Dict[str, Any]]:
+    """Boil a parsed ``/stats/contributors`` reply down to per-author totals."""
+    if not isinstance(payload, list):
+        return None
+    tally = _ContributorTally()
+    for entry in payload:
+        tally.add(entry)
+    return tally.summary()
+
+
+class _ArrayItems:
+    """Decode a JSON array one element at a time, as its bytes arrive.
+
+    ``/stats/contributors`` on a big upstream is megabytes of weekly arrays.
+    ``response.json()`` held the whole body and the whole parsed tree at once;
+    this holds one contributor's entry, plus whatever of the next has arrived.
+    Raises ``ValueError`` when the body is not a well-formed array.
+    """
+
+    _WHITESPACE = " \t\n\r"
+
+    def __init__(self) -> None:
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        # open -> first -> (item -> sep)* -> closed
+        self._state = "open"
+        # An element that would not decode is retried only once the buffer has
+        # doubled, so one large entry arriving in many chunks is not re-parsed
+        # from its start on every chunk.
+        self._retry_at = 0
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        self._buffer += self._text.decode(chunk)
+        if len(self._buffer) < self._retry_at:
+            return []
+        return self._drain(final=False)
+
+    def finish(self) -> List[Any]:
+        self._buffer += self._text.decode(b"", final=True)
+        items = self._drain(final=True)
+        if self._state != "closed":
+            raise ValueError("truncated JSON array")
+        return items
+
+    def _drain(self, final: bool) -> List[Any]:
+        items: List[Any] = []
+        buffer, pos = self._buffer, 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in self._WHITESPACE:
+                pos += 1
+            if pos == len(buffer):
+                break
+            char = buffer[pos]
+            if self._state == "closed":
+                raise ValueError("data after JSON array")
+            if self._state == "open":
+                if char != "[":
+                    raise ValueError("not a JSON array")
+                self._state, pos = "first", pos + 1
+                continue
+            if self._state == "sep" or (self._state == "first" and char == "]"):
+                if char == "]":
+                    self._state = "closed"
+                elif char == "," and self._state == "sep":
+                    self._state = "item"
+                else:
+                    raise ValueError("malformed JSON array")
+                pos += 1
+                continue
+
+            try:
+                item, end = self._json.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                self._retry_at = 2 * (len(buffer) - pos)
+                break
+            if end == len(buffer) and not final and not isinstance(item, (dict, list, str)):
+                # A number cut off mid-digits decodes as a shorter one; wait
+                # for the separator that proves the element is whole.
+                self._retry_at = 0
+                break
+            items.append(item)
+            self._state, pos = "sep", end
+            self._retry_at = 0
+        self._buffer = buffer[pos:]
+        return items
+
+
+async def _read_contributor_summary(response: httpx.Response) -> Optional[Dict[str, Any]]:
+    """Stream a ``/stats/contributors`` body into its per-author summary."""
+    items = _ArrayItems()
+    tally = _ContributorTally()
+    try:
+        async for chunk in response.aiter_bytes():
+            for entry in items.feed(chunk):
+                tally.add(entry)
+        for entry in items.finish():
+            tally.add(entry)
+    except (ValueError, TypeError, httpx.HTTPError):
+        return None
+    return tally.summary()
+
+
+async def _request_contributor_stats(
+    client: httpx.AsyncClient,
+    full_name: str,
+    token: str,
+    guard: Optional["RateLimitGuard"] = None,
+) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """One ask: ``("ready", summary)``, ``("pending", None)`` or ``("failed", None)``."""
+    try:
+        async with client.stream(
+            "GET",
+            f"{GITHUB_API}/repos/{full_name}/stats/contributors",
+            headers=github_headers(token),
+        ) as response:
+            if guard is not None:
+                guard.observe(response)
+            if response.status_code == 202:
+                return "pending", None
+            if response.status_code != 200:
+                return "failed", None
+            summary = await _read_contributor_summary(response)
+    except Exception:
+        return "failed", None
+    return ("ready", summary) if summary is not None else ("failed", None)
+
+
+def _user_totals(summary: Dict[str, Any], username: str) -> Dict[str, int]:
+    additions, deletions, commits = (summary.get("authors") or {}).get(
+        username.lower(), [0, 0, 0]
+    )
+    return {
+        "user_additions": additions,
+        "user_deletions": deletions,
+        "user_commits": commits,
+        "repo_additions": int(summary.get("repo_additions") or 0),
+    }
+
+
 async def _fetch_contributor_totals(
     client: httpx.AsyncClient,
     owner: str,
@@ -268,101 +677,154 @@ async def _fetch_contributor_totals(
     username: str,
     token: str,
     deadline: "Deadline",
+    stats: Optional["ContributorStats"] = None,
+    version: Optional[str] = None,
 ) -> Optional[Dict[str, int]]:
     """The user's exact additions/deletions/commits plus the repo-wide totals.
 
     Returns ``None`` when GitHub cannot produce the stats (it computes them
-    asynchronously and answers 202 while the job is queued).
+    asynchronously and answers 202 while the job is queued). A walk passes
+    ``stats``, which requested them at its start; otherwise they are asked
+    for now and waited on, through the same per-repo cache when ``version``
+    says which push they describe.
     """
-    url = f"{GITHUB_API}/repos/{owner}/{repo}/stats/contributors"
+    if stats is not None:
+        summary = await stats.collect(f"{owner}/{repo}")
+        return _user_totals(summary, username) if summary is not None else None
+
+    key = _stats_key(f"{owner}/{repo}", version) if version else None
+    if key is not None:
+        cached = await cache.get_json(key)
+        if isinstance(cached, dict):
+            return _user_totals(cached, username)
 
-    payload: Any = None
+    summary: Optional[Dict[str, Any]] = None
     for attempt in range(settings.stats_retries):
         if deadline.expired:
             return None
-        try:
-            response = await client.get(url, headers=github_headers(token))
-        except Exception:
-            return None
-
-        if response.status_code == 202:
-            # GitHub is still computing. Only wait if the budget can absorb it.
-            delay = settings.stats_retry_delay_seconds * (attempt + 1)
-            if delay >= deadline.remaining:
-                return None
-            await asyncio.sleep(delay)
-            continue
-        if response.status_code != 200:
-            return None
-
-        try:
-            payload = response.json()
-        except ValueError:
+        state, summary = await _request_contributor_stats(client, f"{owner}/{repo}", token)
+        if state != "pending":
+            break
+        # GitHub is still computing. Only wait if the budget can absorb it.
+        delay = settings.stats_retry_delay_seconds * (attempt + 1)
+        if delay >= deadline.remaining:
             return None
-        break
+        await asyncio.sleep(delay)
 
-    if not isinstance(payload, list):
+    if summary is None:
         return None
+    if key is not None:
+        await cache.set_json(key, summary, settings.cache_ttl_seconds)
+        await cache.tag_keys(
+            [key], [cache.repo_tag(f"{owner}/{repo}")], settings.cache_ttl_seconds
+        )
+    return _user_totals(summary, username)
 
-    target = username.lower()
-    user_additions = user_deletions = user_commits = 0
-    repo_additions = 0
-    found = False
 
-    for entry in payload:
-        if not isinstance(entry, dict):
-            continue
+def _stats_key(full_name: str, version_token: str) -> str:
+    return repo_cache.repo_key("contributor-stats", full_name, version_token)
 
-        author = entry.get("author")
-        login = author.get("login", "") if isinstance(author, dict) else ""
-        weeks = entry.get("weeks")
-        if not isinstance(weeks, list):
-            weeks = []
 
-        additions = sum(int(week.get("a") or 0) for week in weeks if isinstance(week, dict))
-        deletions = sum(int(week.get("d") or 0) for week in weeks if isinstance(week, dict))
-        repo_additions += additions
+class ContributorStats:
+    """Contributor stats for a walk's repos, asked for up front.
 
-        if login.lower() == target:
-            found = True
-            user_additions = additions
-            user_deletions = deletions
-            user_commits = int(entry.get("total") or 0)
+    GitHub computes ``/stats/contributors`` in the background, answering 202
+    until it is done, and asking is what starts the job. Asked for only once
+    a repo's diffs had been walked, each repo then slept through its 202s on
+    the walk's deadline. :meth:`start` asks for every repo at once instead,
+    without waiting, so by the time a repo needs its stats they have usually
+    been computed; one still not ready is polled once more, never slept on.
 
-    if not found:
-        return {
-            "user_additions": 0,
-            "user_deletions": 0,
-            "user_commits": 0,
-            "repo_additions": repo_additions,
-        }
+    The stats describe the whole repo rather than one user, so they are cached
+    per repo and ``pushed_at`` and shared by every user's walk.
+    """
 
-    return {
-        "user_additions": user_additions,
-        "user_deletions": user_deletions,
-        "user_commits": user_commits,
-        "repo_additions": repo_additions,
-    }
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        token: str,
+        semaphore: asyncio.Semaphore,
+        deadline: "Deadline",
+        guard: Optional["RateLimitGuard"] = None,
+    ):
+        self._client = client
+        self._token = token
+        self._semaphore = semaphore
+        self._deadline = deadline
+        self._guard = guard
+        self._keys: Dict[str, str] = {}
+        self._summaries: Dict[str, Dict[str, Any]] = {}
+        self._requests: Dict[str, "asyncio.Task[Tuple[str, Optional[Dict[str, Any]]]]"] = {}
+
+    async def start(self, repos: List[Dict[str, Any]]) -> None:
+        """Read what is cached for ``repos`` and request the rest in the background.
+
+        A repo without a push time has no key, as in :mod:`services.repo_cache`:
+        its stats are requested every time and never cached, since nothing
+        would tell a later push's stats from these.
+        """
+        names: List[str] = []
+        for repo in repos:
+            if not repo.get("full_name"):
+                continue
+            names.append(repo["full_name"])
+            version = repo_cache.version_token(repo)
+            if version is not None:
+                self._keys[repo["full_name"]] = _stats_key(repo["full_name"], version)
+
+        cached = (await cache.get_many_json(list(self._keys.values())) or {}) if self._keys else {}
+        for full_name in names:
+            key = self._keys.get(full_name)
+            if key is not None and isinstance(cached.get(key), dict):
+                self._summaries[full_name] = cached[key]
+            else:
+                self._requests[full_name] = asyncio.create_task(self._request(full_name))
+
+    async def _request(self, full_name: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """One ask within the walk's limits, caching the summary if it is ready."""
+        async with self._semaphore:
+            if self._deadline.expired:
+                return "failed", None
+            state, summary = await _request_contributor_stats(
+                self._client, full_name, self._token, self._guard
+            )
+        if summary is None:
+            return state, None
+
+        if full_name in self._keys:
+            key = self._keys[full_name]
+            await cache.set_json(key, summary, settings.cache_ttl_seconds)
+            await cache.tag_keys(
+                [key], [cache.repo_tag(full_name)], settings.cache_ttl_seconds
+            )
+        return "ready", summary
+
+    async def collect(self, full_name: str) -> Optional[Dict[str, Any]]:
+        """The repo's summary, or ``None`` if GitHub has not produced it yet."""
+        if full_name in self._summaries:
+            return self._summaries[full_name]
+
+        request = self._requests.pop(full_name, None)
+        state, summary = await (request if request is not None else self._request(full_name))
+        if state == "pending":
+            # The job has had the walk so far to run; ask once more and move on.
+            state, summary = await self._request(full_name)
+        if summary is not None:
+            self._summaries[full_name] = summary
+        return summary
+
+    async def close(self) -> None:
+        """Drop the requests for repos the walk never got to."""
+        for request in self._requests.values():
+            request.cancel()
+        await asyncio.gather(*self._requests.values(), return_exceptions=True)
+        self._requests.clear()
 
 
 async def _fetch_repo_language_bytes(
-    client: httpx.AsyncClient, owner: str, repo: str, token: str
+    client: httpx.AsyncClient, repo: Dict[str, Any], token: str
 ) -> Dict[str, int]:
-    url = f"{GITHUB_API}/repos/{owner}/{repo}/languages"
-    try:
-        response = await client.get(url, headers=github_headers(token))
-    except Exception:
-        return {}
-
-    if response.status_code != 200:
-        return {}
-
-    try:
-        payload = response.json()
-    except ValueError:
-        return {}
-
-    return payload if isinstance(payload, dict) else {}
+    return await repo_cache.languages(client, repo, token)
 
 
 def _accumulate_files(
@@ -374,15 +836,9 @@ def _accumulate_files(
     """Fold one commit's file list into the running per-language tallies."""
     additions = deletions = counted = 0
 
-    for entry in files:
-        if not isinstance(entry, dict):
-            continue
-
-        path = entry.get("filename") or ""
-        if not path or is_vendored(path):
-            continue
-
-        language = detect_language(path)
+    entries = [entry for entry in files if isinstance(entry, dict)]
+    languages = classify_paths([entry.get("filename") or "" for entry in entries])
+    for entry, language in zip(entries, languages):
         if not language:
             continue
 
@@ -404,6 +860,469 @@ def _accumulate_files(
     return additions, deletions, counted
 
 
+def _commit_key(sha: str) -> str:
+    return f"gh:commit:{CACHE_VERSION}:{sha}"
+
+
+def _reduce_commit(files: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """One commit's diff boiled down to per-language tallies.
+
+    An empty list stands for a merge commit (see :func:`_fetch_commit_files`),
+    which is remembered as such so it is never fetched again either.
+    """
+    additions: Dict[str, int] = {}
+    deletions: Dict[str, int] = {}
+    files_by_language: Dict[str, int] = {}
+    _accumulate_files(files, additions, deletions, files_by_language)
+    return {
+        "merge": not files,
+        "additions": additions,
+        "deletions": deletions,
+        "files": files_by_language,
+    }
+
+
+def _fold_commit(
+    reduced: Dict[str, Any],
+    additions_by_language: Dict[str, int],
+    deletions_by_language: Dict[str, int],
+    files_by_language: Dict[str, int],
+) -> Tuple[int, int, int]:
+    """Add a reduced commit into the running tallies, like :func:`_accumulate_files`."""
+    totals = []
+    for source, target in (
+        (reduced.get("additions") or {}, additions_by_language),
+        (reduced.get("deletions") or {}, deletions_by_language),
+        (reduced.get("files") or {}, files_by_language),
+    ):
+        for language, value in source.items():
+            target[language] = target.get(language, 0) + int(value)
+        totals.append(sum(int(value) for value in source.values()))
+    return totals[0], totals[1], totals[2]
+
+
+async def _cached_commits(shas: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Reduced results already cached for ``shas``, in one read.
+
+    Keyed by SHA alone: a commit's content is identical in every repo and fork
+    that contains it, and for every user who asks about it.
+    """
+    if not shas:
+        return {}
+    found = await cache.get_many_json([_commit_key(sha) for sha in shas])
+    if not found:
+        return {}
+    return {sha: found[_commit_key(sha)] for sha in shas if _commit_key(sha) in found}
+
+
+# A compare lists at most 300 files, and one at the cap may be missing some.
+COMPARE_FILE_LIMIT = 300
+# Longer runs are split so a single failed compare never costs much to redo.
+COMPARE_MAX_COMMITS = 50
+# Runs are also cut after roughly one commit in this many, chosen by the SHA
+# itself, so the cuts -- and so the cached ranges -- stay where they are when
+# newer commits are pushed or older ones scroll out of the listing.
+_ANCHOR_SPACING = COMPARE_MAX_COMMITS // 2
+
+# What the other commits of a run measured by one compare contribute: the
+# whole run's tally is carried by its newest commit, which is marked ``net``.
+_EMPTY_TALLY: Dict[str, Any] = {
+    "merge": False,
+    "carried": True,
+    "additions": {},
+    "deletions": {},
+    "files": {},
+}
+
+
+def _is_anchor(sha: str) -> bool:
+    return zlib.crc32(sha.encode()) % _ANCHOR_SPACING == 0
+
+
+def _anchored_chunks(run: List[str]) -> List[List[str]]:
+    """Split a newest-first run into compare-sized pieces, newest first.
+
+    Cuts fall after anchor commits and, failing one, every
+    ``COMPARE_MAX_COMMITS`` counted up from the previous cut. Counting from
+    the newest commit instead moved every boundary with each push, and no
+    cached range was ever asked for again.
+    """
+    chunks: List[List[str]] = []
+    chunk: List[str] = []
+    for sha in reversed(run):
+        chunk.append(sha)
+        if len(chunk) >= COMPARE_MAX_COMMITS or _is_anchor(sha):
+            chunks.append(chunk[::-1])
+            chunk = []
+    if chunk:
+        chunks.append(chunk[::-1])
+    return chunks[::-1]
+
+
+def _contiguous_runs(shas: List[str], parents: Dict[str, List[str]]) -> List[List[str]]:
+    """Group newest-first ``shas`` into runs that are consecutive in history.
+
+    The listing holds only the user's own commits, so two neighbours in it are
+    adjacent in the history exactly when the newer one's only parent is the
+    older one. A run's combined diff is then one compare between the oldest
+    commit's parent and the newest commit. Merges and commits of unknown
+    parentage stay on their own.
+
+    That combined diff is the run's *net* change: lines added by one commit
+    and removed by a later one in the same run are in neither count, and a
+    file touched twice counts once. Runs therefore report fewer additions
+    and files than measuring each commit would, so their tallies are marked
+    ``net`` and a measurement that used any is not reported as ``commits``.
+    """
+    runs: List[List[str]] = []
+    for sha in shas:
+        run = runs[-1] if runs else None
+        if run and parents.get(run[-1]) == [sha]:
+            run.append(sha)
+        else:
+            runs.append([sha])
+
+    # The compare base is the oldest commit's parent, so a run ending in a
+    # root or merge commit leaves that commit to be measured by itself.
+    split: List[List[str]] = []
+    for run in runs:
+        if len(run) > 1 and len(parents.get(run[-1]) or []) != 1:
+            split.extend(_anchored_chunks(run[:-1]))
+            split.append(run[-1:])
+        else:
+            split.extend(_anchored_chunks(run))
+    return split
+
+
+def _range_key(run: List[str], parents: Dict[str, List[str]]) -> Optional[str]:
+    if len(run) < 2:
+        return None
+    return f"gh:range:{CACHE_VERSION}:{parents[run[-1]][0]}...{run[0]}"
+
+
+async def _fetch_compare_files(
+    client: httpx.AsyncClient,
+    owner: str,
+    repo: str,
+    base: str,
+    head: str,
+    expected_commits: int,
+    token: str,
+    semaphore: asyncio.Semaphore,
+    deadline: "Deadline",
+    guard: Optional["RateLimitGuard"] = None,
+) -> Optional[List[Dict[str, Any]]]:
+    """Files changed across ``base...head``, or ``None`` if they cannot be trusted."""
+    url = f"{GITHUB_API}/repos/{owner}/{repo}/compare/{base}...{head}"
+    async with semaphore:
+        if deadline.expired:
+            return None
+        try:
+            response = await client.get(url, headers=github_headers(token))
+        except Exception:
+            return None
+
+    if guard is not None:
+        guard.observe(response)
+    if response.status_code != 200:
+        return None
+    try:
+        payload = response.json()
+    except ValueError:
+        return None
+    if not isinstance(payload, dict):
+        return None
+
+    # Someone else's commit inside the range, or a file list at the cap, would
+    # make the combined diff wrong; measuring commit by commit is still right.
+    if payload.get("total_commits") != expected_commits:
+        return None
+    files = payload.get("files")
+    if not isinstance(files, list) or len(files) >= COMPARE_FILE_LIMIT:
+        return None
+    return files
+
+
+async def _measure_run(
+    client: httpx.AsyncClient,
+    owner: str,
+    repo: str,
+    run: List[str],
+    parents: Dict[str, List[str]],
+    token: str,
+    budget: AttributionBudget,
+    semaphore: asyncio.Semaphore,
+    deadline: "Deadline",
+    guard: Optional["RateLimitGuard"] = None,
+) -> List[Optional[Dict[str, Any]]]:
+    """One reduced result per commit of ``run`` that was paid for.
+
+    The run's one reserved call goes to a compare when it has several commits.
+    If that is refused, the commits are fetched one by one instead, as far as
+    the budget stretches.
+    """
+    if len(run) > 1:
+        files = await _fetch_compare_files(
+            client, owner, repo, parents[run[-1]][0], run[0], len(run),
+            token, semaphore, deadline, guard,
+        )
+        if files is not None:
+            reduced = {**_reduce_commit(files), "merge": False, "net": True}
+            await cache.set_json(
+                _range_key(run, parents), reduced, settings.commit_cache_ttl_seconds
+            )
+            return [reduced] + [_EMPTY_TALLY] * (len(run) - 1)
+        if deadline.expired:
+            return [None]
+        run = run[: 1 + await budget.take(len(run) - 1)]
+
+    async def measure(sha: str) -> Optional[Dict[str, Any]]:
+        files = await _fetch_commit_files(
+            client, owner, repo, sha, token, semaphore, deadline, guard
+        )
+        if files is None:
+            return None
+        reduced = _reduce_commit(files)
+        await cache.set_json(_commit_key(sha), reduced, settings.commit_cache_ttl_seconds)
+        return reduced
+
+    return list(await asyncio.gather(*(measure(sha) for sha in run)))
+
+
+async def _measure_shas(
+    client: httpx.AsyncClient,
+    owner: str,
+    repo: str,
+    shas: List[str],
+    parents: Dict[str, List[str]],
+    token: str,
+    budget: AttributionBudget,
+    semaphore: asyncio.Semaphore,
+    deadline: "Deadline",
+    guard: Optional["RateLimitGuard"] = None,
+) -> List[Optional[Dict[str, Any]]]:
+    """Reduced results for newest-first ``shas``, paying only for what is new.
+
+    Cached commits and runs cost nothing. The rest are grouped into runs of
+    consecutive commits and each run is measured with one compare call rather
+    than one call per commit -- for a repo with a single author that is most
+    of its history in a handful of calls, counted as each run's net diff
+    (see :func:`_contiguous_runs`). Returns one entry per commit that
+    was cached or paid for, ``None`` where a fetch failed, so its length says
+    how far the budget reached.
+    """
+    known = await _cached_commits(shas)
+    runs = _contiguous_runs([sha for sha in shas if sha not in known], parents)
+    range_keys = [_range_key(run, parents) for run in runs if len(run) > 1]
+    ranges = (await cache.get_many_json(range_keys) or {}) if range_keys else {}
+
+    results: List[Optional[Dict[str, Any]]] = list(known.values())
+    pending: List[List[str]] = []
+    for run in runs:
+        cached_run = ranges.get(_range_key(run, parents) or "")
+        if cached_run is not None:
+            results.extend([{**cached_run, "net": True}] + [_EMPTY_TALLY] * (len(run) - 1))
+        else:
+            pending.append(run)
+
+    # One call per run, newest first when the budget cannot cover them all.
+    pending = pending[: await budget.take(len(pending))]
+    measured = await asyncio.gather(
+        *(
+            _measure_run(
+                client, owner, repo, run, parents, token, budget, semaphore, deadline, guard
+            )
+            for run in pending
+        )
+    )
+    written: List[str] = []
+    for run, run_results in zip(pending, measured):
+        results.extend(run_results)
+        if len(run) > 1 and run_results and (run_results[0] or {}).get("net"):
+            written.append(_range_key(run, parents) or "")
+        else:
+            written.extend(
+                _commit_key(sha) for sha, item in zip(run, run_results) if item is not None
+            )
+    # Commits are shared with every fork, but indexed under the repo that
+    # paid for them: a purge of that repo makes it measure them afresh.
+    await cache.tag_keys(
+        written, [cache.repo_tag(f"{owner}/{repo}")], settings.commit_cache_ttl_seconds
+    )
+    return results
+
+
+# Commits measured from each stratum per round of stratified sampling.
+_SAMPLE_ROUND = 4
+# Two-sided 95% normal quantile, for the sampled language mix's margins.
+_Z_95 = 1.96
+
+
+def _stratum_pages(total: int, strata: int) -> List[int]:
+    """Listing pages spread evenly across a history of ``total`` commits."""
+    pages = max(1, math.ceil(total / 100))
+    if pages <= strata:
+        return list(range(1, pages + 1))
+    return sorted({round(1 + i * (pages - 1) / (strata - 1)) for i in range(strata)})
+
+
+def _stratum_sizes(chosen: List[int], total: int) -> List[float]:
+    """How many of the ``total`` commits each chosen page stands for.
+
+    Each page represents the stretch of history up to halfway to its
+    neighbours, so the sizes add up to ``total``.
+    """
+    pages = max(1, math.ceil(total / 100))
+    bounds = [0.5] + [(a + b) / 2 for a, b in zip(chosen, chosen[1:])] + [pages + 0.5]
+    return [total * (hi - lo) / pages for lo, hi in zip(bounds, bounds[1:])]
+
+
+def _spread(shas: List[str]) -> List[str]:
+    """``shas`` reordered so that every prefix is spread evenly across them."""
+    bits = max(1, (len(shas) - 1).bit_length())
+    return [
+        shas[i]
+        for i in sorted(range(len(shas)), key=lambda i: int(f"{i:0{bits}b}"[::-1], 2))
+    ]
+
+
+def _stratified_estimate(
+    strata: List[Tuple[float, List[Dict[str, Any]]]],
+) -> Optional[Tuple[Dict[str, int], Dict[str, int], Dict[str, int], Dict[str, float]]]:
+    """Whole-history tallies from per-stratum samples, with the mix's margins.
+
+    Each stratum is ``(size, sampled commits)``. Totals are the usual
+    stratified expansion; each language's share is a combined ratio estimate
+    whose 95% margin, in percentage points, comes from the ratio residuals
+    with a finite-population correction. Margins are left out until every
+    stratum has two commits to estimate its spread from. Pages stand in for
+    the history around them, so the margins are approximate, not exact.
+    A run measured by one compare is one observation, not one per commit:
+    the empty tallies its other commits carry stay out of the spread.
+    """
+    observed = [(size, sample) for size, sample in strata if sample]
+    if not observed:
+        return None
+    # Strata that yielded nothing are covered by the others.
+    total = sum(size for size, _ in strata)
+    scale = total / sum(size for size, _ in observed)
+
+    additions: Dict[str, float] = {}
+    deletions: Dict[str, float] = {}
+    files: Dict[str, float] = {}
+    expanded = 0.0
+    for size, sample in observed:
+        weight = size * scale / len(sample)
+        for reduced in sample:
+            for source, target in (
+                (reduced.get("additions") or {}, additions),
+                (reduced.get("deletions") or {}, deletions),
+                (reduced.get("files") or {}, files),
+            ):
+                for language, value in source.items():
+                    target[language] = target.get(language, 0.0) + weight * int(value)
+            expanded += weight * sum(int(v) for v in (reduced.get("additions") or {}).values())
+
+    measured = [
+        (size, [reduced for reduced in sample if not reduced.get("carried")])
+        for size, sample in observed
+    ]
+    margins: Dict[str, float] = {}
+    if expanded > 0 and all(len(sample) >= 2 for _, sample in measured):
+        for language, estimate in additions.items():
+            ratio = estimate / expanded
+            variance = 0.0
+            for size, sample in measured:
+                population = size * scale
+                n = len(sample)
+                residuals = [
+                    int((reduced.get("additions") or {}).get(language, 0))
+                    - ratio * sum(int(v) for v in (reduced.get("additions") or {}).values())
+                    for reduced in sample
+                ]
+                mean = sum(residuals) / n
+                spread = sum((value - mean) ** 2 for value in residuals) / (n - 1)
+                correction = max(0.0, 1 - n / population) if population > 0 else 0.0
+                variance += population**2 * correction * spread / n
+            margins[language] = round(_Z_95 * math.sqrt(variance) / expanded * 100, 2)
+
+    def rounded(values: Dict[str, float]) -> Dict[str, int]:
+        return {language: round(value) for language, value in values.items() if round(value) > 0}
+
+    return rounded(additions), rounded(deletions), rounded(files), margins
+
+
+async def _sample_history(
+    client: httpx.AsyncClient,
+    owner: str,
+    repo: str,
+    username: str,
+    token: str,
+    newest: List[str],
+    parents: Dict[str, List[str]],
+    total: int,
+    budget: AttributionBudget,
+    semaphore: asyncio.Semaphore,
+    deadline: "Deadline",
+    guard: Optional["RateLimitGuard"] = None,
+) -> Optional[Tuple[Dict[str, int], Dict[str, int], Dict[str, int], Dict[str, float]]]:
+    """Estimate a long history's language mix from commits spread across it.
+
+    Measuring only the newest ``max_commits_per_repo`` commits described what
+    the user works on lately, not what they wrote here, and said nothing of
+    how far off it might be. This lists a few pages spread across the whole
+    history instead, then measures a few commits from each per round until
+    every language's margin is within ``sample_margin`` points, the commit
+    cap is reached, or the budget or deadline runs out. Returns what
+    :func:`_stratified_estimate` does, or ``None`` if nothing was measured.
+    """
+    chosen = _stratum_pages(total, settings.sample_strata)
+    sizes = _stratum_sizes(chosen, total)
+    # Pages the newest-first listing already holds in full are not listed again.
+    known_pages = {
+        page: newest[(page - 1) * 100 : page * 100]
+        for page in chosen
+        if page * 100 <= len(newest)
+    }
+    missing = [page for page in chosen if page not in known_pages]
+    listed = await asyncio.gather(
+        *(
+            _list_commit_shas(
+                client, owner, repo, username, token, 100, deadline,
+                start_page=page, parents=parents,
+            )
+            for page in missing
+        )
+    )
+    known_pages.update(zip(missing, listed))
+    orders = [_spread(known_pages[page]) for page in chosen]
+
+    samples: List[List[Dict[str, Any]]] = [[] for _ in chosen]
+    taken = 0
+    while taken < len(max(orders, key=len)) and not deadline.expired:
+        picks = [order[taken : taken + _SAMPLE_ROUND] for order in orders]
+        taken += _SAMPLE_ROUND
+        results = await asyncio.gather(
+            *(
+                _measure_shas(
+                    client, owner, repo, pick, parents, token, budget, semaphore, deadline, guard
+                )
+                for pick in picks
+            )
+        )
+        for sample, got in zip(samples, results):
+            sample.extend(item for item in got if item is not None)
+        if any(len(got) < len(pick) for pick, got in zip(picks, results)):
+            break  # The budget ran out.
+        if sum(len(sample) for sample in samples) >= settings.max_commits_per_repo:
+            break
+        estimate = _stratified_estimate(list(zip(sizes, samples)))
+        if estimate and estimate[3] and max(estimate[3].values()) <= settings.sample_margin:
+            break
+
+    return _stratified_estimate(list(zip(sizes, samples)))
+
+
 def _scale(totals: Dict[str, int], target_total: int) -> Dict[str, int]:
     """Rescale a language distribution so it sums to ``target_total``."""
     current = sum(totals.values())
@@ -485,6 +1404,437 @@ def _cache_key(full_name: str, username: str, version_token: str) -> str:
     return f"gh:attr:{CACHE_VERSION}:{full_name}:{username.lower()}:{version_token}"
 
 
+def _version_token(repo: Dict[str, Any]) -> str:
+    return str(repo.get("pushed_at") or repo.get("updated_at") or "head")
+
+
+def _repo_cache_key(repo: Dict[str, Any], username: str) -> Optional[str]:
+    """The attribution cache key for a repo listing entry, if it names a repo."""
+    name = repo.get("name")
+    owner_payload = repo.get("owner")
+    owner = owner_payload.get("login") if isinstance(owner_payload, dict) else None
+    if not name or not owner:
+        return None
+    full_name = repo.get("full_name") or f"{owner}/{name}"
+    return _cache_key(full_name, username, _version_token(repo))
+
+
+async def prefetch_cached(
+    repos: List[Dict[str, Any]], username: str
+) -> Optional[Dict[str, Any]]:
+    """Every cached measurement for ``repos``, read in one round trip.
+
+    Reading them one ``analyze_repo_contribution`` at a time cost a GET per
+    repo -- sixty HTTPS round trips on Upstash for a fully warm account. Pass
+    the result as ``prefetched``; ``None`` means the batch read failed and each
+    repo should look itself up as before.
+    """
+    keys = [key for repo in repos if (key := _repo_cache_key(repo, username))]
+    return await cache.get_many_json(keys)
+
+
+# What the repo listing keeps of each repo, enough to replay it from the
+# manifest when GitHub says the listing has not changed.
+_LISTING_FIELDS = (
+    "name",
+    "full_name",
+    "fork",
+    "archived",
+    "pushed_at",
+    "updated_at",
+    "html_url",
+    "size",
+    "stargazers_count",
+)
+
+
+def _manifest_key(username: str) -> str:
+    return f"gh:attr:{CACHE_VERSION}:manifest:{username.lower()}"
+
+
+def _slim_repo(repo: Dict[str, Any]) -> Dict[str, Any]:
+    slim = {field: repo.get(field) for field in _LISTING_FIELDS}
+    owner = repo.get("owner")
+    slim["owner"] = {"login": owner.get("login")} if isinstance(owner, dict) else None
+    return slim
+
+
+async def read_manifest(username: str) -> Dict[str, Any]:
+    """The user's attribution manifest, or an empty one.
+
+    ``etag`` and ``listing`` hold the last repo listing, so a conditional
+    request answered 304 (which GitHub does not bill against the rate limit)
+    can be replayed without re-downloading it. ``repos`` maps each settled
+    repo's full name to the ``pushed_at`` it was measured at and its
+    contribution -- ``None`` for repos the user has no commits in, which the
+    per-repo cache never recorded and every walk used to ask about again.
+    """
+    manifest = await cache.get_json(_manifest_key(username))
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("repos"), dict):
+        return {"etag": None, "listing": [], "repos": {}}
+    return manifest
+
+
+def settled_from_manifest(
+    manifest: Dict[str, Any], repos: List[Dict[str, Any]]
+) -> Tuple[Dict[str, Optional[RepoContribution]], List[Dict[str, Any]]]:
+    """Split ``repos`` into those the manifest settles and those it cannot.
+
+    A manifest entry only counts while the repo's ``pushed_at`` is the one it
+    was measured at; anything pushed since goes back to the normal lookup.
+    """
+    settled: Dict[str, Optional[RepoContribution]] = {}
+    rest: List[Dict[str, Any]] = []
+    for repo in repos:
+        full_name = repo.get("full_name")
+        entry = manifest["repos"].get(full_name) if full_name else None
+        if not isinstance(entry, dict) or entry.get("pushed_at") != _version_token(repo):
+            rest.append(repo)
+            continue
+        try:
+            payload = entry.get("contribution")
+            settled[full_name] = (
+                RepoContribution.model_validate(payload) if payload else None
+            )
+        except Exception:
+            rest.append(repo)
+    return settled, rest
+
+
+def previous_from_manifest(manifest: Dict[str, Any]) -> Dict[str, RepoContribution]:
+    """Every contribution the manifest holds, current or not, by full name.
+
+    Stale entries are what :func:`analyze_repo_contribution` extends after a
+    push instead of measuring the repo again from scratch.
+    """
+    previous: Dict[str, RepoContribution] = {}
+    for full_name, entry in manifest["repos"].items():
+        payload = entry.get("contribution") if isinstance(entry, dict) else None
+        if not payload:
+            continue
+        try:
+            previous[full_name] = RepoContribution.model_validate(payload)
+        except Exception:
+            continue
+    return previous
+
+
+async def _write_manifest(
+    username: str,
+    manifest: Dict[str, Any],
+    etag: Optional[str],
+    listing: List[Dict[str, Any]],
+    settled: Dict[str, Optional[RepoContribution]],
+) -> None:
+    """Record the listing and every repo settled this walk, if anything changed.
+
+    Entries for repos this walk skipped (forks left out, or past the repo cap)
+    are kept while still current, so a narrower request does not erase what a
+    wider one learned.
+    """
+    tokens = {
+        repo.get("full_name"): _version_token(repo)
+        for repo in listing
+        if isinstance(repo, dict) and repo.get("full_name")
+    }
+    repos = {
+        full_name: entry
+        for full_name, entry in manifest["repos"].items()
+        if isinstance(entry, dict) and entry.get("pushed_at") == tokens.get(full_name)
+    }
+    for full_name, contribution in settled.items():
+        if full_name in tokens:
+            repos[full_name] = {
+                "pushed_at": tokens[full_name],
+                "contribution": contribution.model_dump() if contribution else None,
+            }
+    updated = {
+        "etag": etag,
+        "listing": [_slim_repo(repo) for repo in listing if isinstance(repo, dict)],
+        "repos": repos,
+    }
+    if updated == manifest:
+        return
+
+    key = _manifest_key(username)
+    await cache.set_json(key, updated, settings.cache_ttl_seconds)
+    await cache.tag_keys([key], [cache.user_tag(username)], settings.cache_ttl_seconds)
+
+
+async def list_repos(
+    client: httpx.AsyncClient, username: str, token: str, manifest: Dict[str, Any]
+) -> Tuple[httpx.Response, List[Any], Optional[str]]:
+    """The user's repo listing, replayed from the manifest when unchanged."""
+    headers = github_headers(token)
+    if manifest.get("etag") and manifest.get("listing"):
+        headers["If-None-Match"] = manifest["etag"]
+    response = await client.get(
+        f"{GITHUB_API}/users/{username}/repos",
+        params={"per_page": "100", "sort": "pushed", "type": "all"},
+        headers=headers,
+    )
+    if response.status_code == 304:
+        return response, list(manifest["listing"]), manifest["etag"]
+
+    raise_for_github_status(response, username)
+    return response, response.json(), response.headers.get("ETag")
+
+
+def _source_key(full_name: str) -> str:
+    return f"gh:source:{CACHE_VERSION}:{full_name}"
+
+
+async def resolve_fork_sources(
+    client: httpx.AsyncClient,
+    repos: List[Dict[str, Any]],
+    token: str,
+    semaphore: asyncio.Semaphore,
+    deadline: Deadline,
+    guard: Optional[RateLimitGuard] = None,
+    cache_only: bool = False,
+) -> Dict[str, str]:
+    """The network root of every fork among ``repos`` that could be resolved.
+
+    The repo listing says only *that* a repo is a fork; ``/repos/{o}/{r}``
+    says of what. A fork's source does not change, so each is asked once and
+    kept. Forks left unresolved are measured on their own, as before.
+    """
+    forks = [repo["full_name"] for repo in repos if repo.get("fork") and repo.get("full_name")]
+    if not forks:
+        return {}
+
+    cached = await cache.get_many_json([_source_key(name) for name in forks]) or {}
+    sources: Dict[str, str] = {}
+    for name in forks:
+        entry = cached.get(_source_key(name))
+        if isinstance(entry, dict) and entry.get("source"):
+            sources[name] = entry["source"]
+    if cache_only:
+        return sources
+
+    async def resolve(full_name: str) -> Optional[str]:
+        async with semaphore:
+            if deadline.expired:
+                return None
+            try:
+                response = await client.get(
+                    f"{GITHUB_API}/repos/{full_name}", headers=github_headers(token)
+                )
+            except Exception:
+                return None
+
+        if guard is not None:
+            guard.observe(response)
+        if response.status_code != 200:
+            return None
+        try:
+            payload = response.json()
+        except ValueError:
+            return None
+        if not isinstance(payload, dict):
+            return None
+
+        # ``source`` is the root of the network; ``parent`` only the repo it was
+        # forked from, which for a fork of a fork is another fork.
+        upstream = payload.get("source") or payload.get("parent")
+        source = upstream.get("full_name") if isinstance(upstream, dict) else None
+        if source:
+            await cache.set_json(
+                _source_key(full_name), {"source": source}, settings.cache_ttl_seconds
+            )
+            await cache.tag_keys(
+                [_source_key(full_name)], [cache.repo_tag(full_name)], settings.cache_ttl_seconds
+            )
+        return source
+
+    missing = [name for name in forks if name not in sources]
+    resolved = await asyncio.gather(*(resolve(name) for name in missing))
+    sources.update({name: source for name, source in zip(missing, resolved) if source})
+    return sources
+
+
+def fork_networks(repos: List[Dict[str, Any]], sources: Dict[str, str]) -> Dict[str, str]:
+    """Map each repo that shares history with another of ``repos`` to its network.
+
+    A repo's network is its fork source, or the repo itself when it is not a
+    fork, so an upstream and the user's forks of it land together.
+    """
+    network_of = {
+        repo["full_name"]: sources.get(repo["full_name"], repo["full_name"])
+        for repo in repos
+        if repo.get("full_name")
+    }
+    sizes: Dict[str, int] = {}
+    for network in network_of.values():
+        sizes[network] = sizes.get(network, 0) + 1
+    return {name: network for name, network in network_of.items() if sizes[network] > 1}
+
+
+# Rough conversions for estimating a repo's worth before measuring it. The
+# listing's ``size`` is the repository's disk usage in KB, history included.
+_LINES_PER_KB = 25
+# A fork is mostly upstream code; the user's share of it is typically small.
+_FORK_SHARE = 0.05
+_RECENCY_HALF_LIFE_DAYS = 180.0
+
+
+def _age_days(repo: Dict[str, Any]) -> Optional[float]:
+    pushed_at = repo.get("pushed_at")
+    if not isinstance(pushed_at, str):
+        return None
+    try:
+        moment = datetime.fromisoformat(pushed_at.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return max(0.0, (datetime.now(timezone.utc) - moment).total_seconds() / 86400)
+
+
+def _expected_volume(repo: Dict[str, Any], previous: Optional[RepoContribution]) -> float:
+    """Lines the user is expected to have added to ``repo``.
+
+    An earlier measurement, from before the latest push, is the best guess;
+    otherwise the repo's size stands in, discounted heavily for forks.
+    """
+    if previous is not None:
+        return float(previous.additions)
+    size_kb = repo.get("size")
+    lines = float(size_kb) * _LINES_PER_KB if isinstance(size_kb, (int, float)) else 0.0
+    return lines * _FORK_SHARE if repo.get("fork") else lines
+
+
+def _expected_commits(repo: Dict[str, Any], previous: Optional[RepoContribution]) -> float:
+    """Commit diffs measuring ``repo`` is expected to fetch.
+
+    Assumed proportional to size, and few for a fork or for an extension of an
+    earlier measurement, which only walks the newest commits.
+    """
+    if previous is not None:
+        return 1.0
+    size_kb = repo.get("size") if isinstance(repo.get("size"), (int, float)) else 0
+    commits = min(settings.max_commits_per_repo, max(1.0, size_kb / 50))
+    if repo.get("fork"):
+        commits = min(commits, 10.0)
+    return commits
+
+
+def _expected_cost(repo: Dict[str, Any], previous: Optional[RepoContribution]) -> float:
+    """API calls measuring ``repo`` is expected to spend: a listing page and
+    the contributor stats on top of its commits."""
+    return 2.0 + _expected_commits(repo, previous)
+
+
+def _priority(repo: Dict[str, Any], previous: Optional[RepoContribution]) -> float:
+    """Expected lines covered per API call, favouring active and starred repos."""
+    value = _expected_volume(repo, previous)
+    age = _age_days(repo)
+    if age is not None:
+        value *= 0.5 ** (age / _RECENCY_HALF_LIFE_DAYS)
+    stars = repo.get("stargazers_count")
+    if isinstance(stars, int) and stars > 0:
+        value *= 1 + math.log10(1 + stars) / 4
+    return value / _expected_cost(repo, previous)
+
+
+def schedule_repos(
+    repos: List[Dict[str, Any]],
+    previous: Dict[str, RepoContribution],
+    calls: int,
+) -> List[Dict[str, Any]]:
+    """Order ``repos`` so a walk cut short has covered the most code it could.
+
+    Walking in ``sort=pushed`` order spent the deadline on whatever was touched
+    last, so a fresh one-file repo cost as much as the user's main project.
+    Repos are ranked by expected lines per call and then packed greedily into
+    ``calls``, the walk's commit budget: a repo whose estimate no longer fits
+    goes after all those that do, rather than blocking them.
+    """
+    ranked = sorted(
+        repos,
+        key=lambda repo: _priority(repo, previous.get(repo.get("full_name"))),
+        reverse=True,
+    )
+    fits: List[Dict[str, Any]] = []
+    later: List[Dict[str, Any]] = []
+    remaining = float(calls)
+    for repo in ranked:
+        cost = _expected_cost(repo, previous.get(repo.get("full_name")))
+        if cost <= remaining:
+            fits.append(repo)
+            remaining -= cost
+        else:
+            later.append(repo)
+    return fits + later
+
+
+def _volume_coverage(
+    repos: List[Dict[str, Any]],
+    settled: Dict[str, Optional[RepoContribution]],
+    previous: Dict[str, RepoContribution],
+) -> float:
+    """Share of the user's expected lines, rather than repos, that is measured.
+
+    Settled repos weigh what they measured; the rest weigh their estimate.
+    """
+    covered = total = 0.0
+    for repo in repos:
+        full_name = repo.get("full_name")
+        if full_name in settled:
+            contribution = settled[full_name]
+            weight = float(contribution.additions) if contribution else 0.0
+            covered += weight
+        else:
+            weight = _expected_volume(repo, previous.get(full_name))
+        total += weight
+    if total <= 0:
+        return 1.0 if repos and all(repo.get("full_name") in settled for repo in repos) else 0.0
+    return round(covered / total, 4)
+
+
+async def estimate_walk(
+    username: str,
+    repos: List[Any],
+    manifest: Dict[str, Any],
+    include_forks: bool = True,
+) -> Tuple[int, int, int]:
+    """What walking ``repos`` to completion would cost, from the cache as it stands.
+
+    Returns the repos the walk would consider, how many of those it would
+    have to measure, and the GitHub calls that takes beyond the listing. It
+    reads the same manifest, source and result entries the walk does and
+    charges each uncached repo :func:`_expected_cost`, with the commit diffs
+    capped by the walk's budget as :class:`AttributionBudget` caps them.
+    """
+    candidates = [
+        repo
+        for repo in repos
+        if isinstance(repo, dict)
+        and not repo.get("archived")
+        and (include_forks or not repo.get("fork"))
+    ][: settings.max_repos]
+
+    forks = [repo["full_name"] for repo in candidates if repo.get("fork") and repo.get("full_name")]
+    sources = await cache.get_many_json([_source_key(name) for name in forks]) if forks else {}
+    unresolved = sum(1 for name in forks if _source_key(name) not in (sources or {}))
+
+    _, unsettled = settled_from_manifest(manifest, candidates)
+    prefetched = await prefetch_cached(unsettled, username) if unsettled else {}
+    previous = previous_from_manifest(manifest)
+    uncached = [
+        repo
+        for repo in unsettled
+        if repo.get("full_name")
+        and (prefetched is None or _repo_cache_key(repo, username) not in prefetched)
+    ]
+    commits = sum(_expected_commits(repo, previous.get(repo["full_name"])) for repo in uncached)
+    overhead = sum(
+        _expected_cost(repo, previous.get(repo["full_name"]))
+        - _expected_commits(repo, previous.get(repo["full_name"]))
+        for repo in uncached
+    )
+    calls = unresolved + overhead + min(commits, settings.max_commit_details)
+    return len(candidates), len(uncached), math.ceil(calls)
+
+
 async def analyze_repo_contribution(
     client: httpx.AsyncClient,
     repo: Dict[str, Any],
@@ -496,12 +1846,22 @@ async def analyze_repo_contribution(
     cache_only: bool = False,
     progress: Optional[WalkProgress] = None,
     guard: Optional[RateLimitGuard] = None,
+    prefetched: Optional[Dict[str, Any]] = None,
+    previous: Optional[RepoContribution] = None,
+    ledger: Optional[CommitLedger] = None,
+    stats: Optional[ContributorStats] = None,
 ) -> Optional[RepoContribution]:
     """Measure what ``username`` personally contributed to a single repository.
 
     Returns the cached measurement when there is one. Otherwise measures the
     repo, unless ``cache_only`` is set or ``deadline`` has expired -- in which
     case it returns ``None`` and the caller treats the repo as unmeasured.
+    ``prefetched`` is :func:`prefetch_cached`'s result; a repo missing from it
+    is known to be uncached, so the cache is not asked again. ``previous`` is
+    the measurement from before the repo's latest push, which is extended with
+    the new commits rather than re-walked when possible. ``ledger`` leaves out
+    commits another of the user's repos already counts, and ``stats`` holds
+    contributor stats the walk requested up front.
     """
     deadline = deadline or Deadline(None)
     progress = progress or WalkProgress()
@@ -510,19 +1870,27 @@ async def analyze_repo_contribution(
     owner_payload = repo.get("owner")
     owner = owner_payload.get("login") if isinstance(owner_payload, dict) else None
     if not name or not owner:
-        progress.resolved += 1
+        progress.resolve()
         return None
 
     full_name = repo.get("full_name") or f"{owner}/{name}"
+    version = repo_cache.version_token(repo)
     is_fork = bool(repo.get("fork"))
-    version_token = str(repo.get("pushed_at") or repo.get("updated_at") or "head")
-    cache_key = _cache_key(full_name, username, version_token)
-
-    cached = await cache.get_json(cache_key)
+    cache_key = _repo_cache_key(repo, username)
+    # A cached result from before the repo shared a network with another of
+    # the user's repos may count their common commits twice; list it again.
+    reclaim = ledger is not None and not cache_only and ledger.unrecorded(full_name)
+
+    if reclaim:
+        cached = None
+    elif prefetched is not None:
+        cached = prefetched.get(cache_key)
+    else:
+        cached = await cache.get_json(cache_key)
     if cached:
         try:
             restored = RepoContribution.model_validate(cached)
-            progress.resolved += 1
+            progress.resolve(full_name, restored)
             return restored
         except Exception:
             pass
@@ -533,22 +1901,59 @@ async def analyze_repo_contribution(
         progress.deferred += 1
         return None
 
+    if previous is not None and not reclaim:
+        extended = await _extend_measurement(
+            client, owner, name, username, token, previous, budget, semaphore, deadline, guard,
+            claim=(lambda shas: ledger.claim(full_name, shas)) if ledger is not None else None,
+            stats=stats,
+            version=version,
+            branch=repo.get("default_branch"),
+        )
+        if extended is not None:
+            contribution, complete = extended
+            contribution = contribution.model_copy(update={"is_fork": is_fork})
+            return await _settle(contribution, cache_key, username, progress, complete)
+
     # List first, then reserve budget for exactly the commits that exist. Sizing
     # the reservation from the listing keeps a repo with five commits from
-    # holding 200 slots that another repo needs.
-    shas = await _list_commit_shas(
-        client, owner, name, username, token, settings.max_commits_per_repo, deadline
-    )
+    # holding 200 slots that another repo needs. A listing an earlier call got
+    # part of the way through carries on from where it stopped.
+    checkpoint_key = _checkpoint_key(cache_key)
+    checkpoint = await cache.get_json(checkpoint_key) or {}
+    shas = [sha for sha in checkpoint.get("shas") or [] if isinstance(sha, str)]
+    dates: Dict[str, str] = dict(checkpoint.get("dates") or {})
+    parents: Dict[str, List[str]] = dict(checkpoint.get("parents") or {})
+    listed = bool(checkpoint.get("listed"))
+    if not listed:
+        outcome: Dict[str, bool] = {}
+        more = await _list_commit_shas(
+            client, owner, name, username, token,
+            settings.max_commits_per_repo - len(shas), deadline,
+            dates=dates, start_page=len(shas) // 100 + 1, parents=parents,
+            outcome=outcome,
+        )
+        listed = outcome.get("finished", False)
+        # Pages shift when commits land between calls, so a resumed listing
+        # can hand back SHAs the checkpoint already holds.
+        seen = set(shas)
+        shas += [sha for sha in more if sha not in seen and not seen.add(sha)]
+
+    # Commits another of the user's repos already counts are not counted here.
+    owned = ledger.claim(full_name, shas) if ledger is not None else shas
+    inherited = len(shas) - len(owned)
 
     # A listing that stopped short of the cap has already enumerated every
     # commit, so the separate count request is only needed when it filled up.
     if len(shas) < settings.max_commits_per_repo:
-        total_user_commits = len(shas)
+        total_user_commits = len(owned)
     else:
-        total_user_commits = await _count_user_commits(
-            client, owner, name, username, token
+        total_user_commits = max(
+            len(owned),
+            await _count_user_commits(client, owner, name, username, token) - inherited,
         )
 
+    budget.declare(min(total_user_commits, settings.max_commits_per_repo))
+
     if total_user_commits == 0:
         # A repo the user never committed to is settled, not deferred -- but an
         # empty listing also happens when the deadline cut the paging short, and
@@ -556,45 +1961,59 @@ async def analyze_repo_contribution(
         if deadline.expired:
             progress.deferred += 1
         else:
-            progress.resolved += 1
+            progress.resolve(full_name)
         return None
 
-    granted = await budget.take(len(shas))
-    shas = shas[:granted]
-    truncated = granted < total_user_commits
-
     additions_by_language: Dict[str, int] = {}
     deletions_by_language: Dict[str, int] = {}
     files_by_language: Dict[str, int] = {}
     measured_additions = measured_deletions = measured_files = 0
+    margins: Optional[Dict[str, float]] = None
+
+    # More commits than one listing holds: sample across the whole history
+    # rather than measure only the newest.
+    sampled = None
+    net = False
+    if total_user_commits > len(owned) and not inherited and settings.sample_strata > 1:
+        sampled = await _sample_history(
+            client, owner, name, username, token, shas, parents, total_user_commits,
+            budget, semaphore, deadline, guard,
+        )
 
-    if shas:
-        file_lists = await asyncio.gather(
-            *(
-                _fetch_commit_files(
-                    client, owner, name, sha, token, semaphore, deadline, guard
-                )
-                for sha in shas
-            )
+    if sampled is not None:
+        additions_by_language, deletions_by_language, files_by_language, margins = sampled
+        measured_additions = sum(additions_by_language.values())
+        measured_deletions = sum(deletions_by_language.values())
+        measured_files = sum(files_by_language.values())
+        truncated = True
+    else:
+        # Commits measured before -- by an earlier walk of this repo, another
+        # user's walk, or a fork sharing the history -- are free; the budget
+        # only pays for the ones never seen.
+        measured = await _measure_shas(
+            client, owner, name, owned, parents, token, budget, semaphore, deadline, guard
         )
-        for files in file_lists:
-            if not files:
+        truncated = len(measured) < total_user_commits
+        net = any(reduced is not None and reduced.get("net") for reduced in measured)
+
+        for reduced in measured:
+            if reduced is None:
                 continue
-            commit_additions, commit_deletions, commit_files = _accumulate_files(
-                files, additions_by_language, deletions_by_language, files_by_language
+            commit_additions, commit_deletions, commit_files = _fold_commit(
+                reduced, additions_by_language, deletions_by_language, files_by_language
             )
             measured_additions += commit_additions
             measured_deletions += commit_deletions
             measured_files += commit_files
 
-    stats = await _fetch_contributor_totals(
-        client, owner, name, username, token, deadline
+    totals = await _fetch_contributor_totals(
+        client, owner, name, username, token, deadline, stats, version
     )
 
     contribution_percentage: Optional[float] = None
-    if stats and stats["repo_additions"] > 0:
+    if totals and totals["repo_additions"] > 0:
         contribution_percentage = round(
-            (stats["user_additions"] / stats["repo_additions"]) * 100, 2
+            (totals["user_additions"] / totals["repo_additions"]) * 100, 2
         )
 
     method = "commits"
@@ -605,34 +2024,58 @@ async def analyze_repo_contribution(
     if not additions_by_language:
         # No usable diffs: spread the user's known additions over the repo's
         # language byte breakdown, which at least keeps forks proportional.
-        if not stats or stats["user_additions"] <= 0:
+        # Not when some commits belong to a sibling: the stats count those too.
+        if inherited or not totals or totals["user_additions"] <= 0:
             # Missing stats can mean the deadline cut them off rather than the
             # user genuinely having nothing here, so only claim this repo as
             # settled when there was budget left to ask properly.
             if deadline.expired:
+                await _save_checkpoint(
+                    checkpoint_key, shas, listed, dates, parents, username, full_name
+                )
                 progress.deferred += 1
             else:
-                progress.resolved += 1
+                progress.resolve(full_name)
             return None
 
-        language_bytes = await _fetch_repo_language_bytes(client, owner, name, token)
+        language_bytes = await _fetch_repo_language_bytes(client, repo, token)
         if not language_bytes:
-            progress.resolved += 1
+            progress.resolve(full_name)
             return None
 
-        additions_by_language = _scale(language_bytes, stats["user_additions"])
+        additions_by_language = _scale(language_bytes, totals["user_additions"])
         files_by_language = {}
-        additions = stats["user_additions"]
-        deletions = stats["user_deletions"]
+        additions = totals["user_additions"]
+        deletions = totals["user_deletions"]
         method = "estimated"
 
-    elif truncated and stats and stats["user_additions"] > measured_additions:
+    elif sampled is not None:
+        # Already expanded to the whole history; the stats, when there are
+        # any, pin the volume exactly.
+        if totals and totals["user_additions"] > 0:
+            additions_by_language = _scale(additions_by_language, totals["user_additions"])
+            additions = totals["user_additions"]
+            deletions = totals["user_deletions"]
+        method = "estimated"
+
+    elif truncated and not inherited and totals and totals["user_additions"] > measured_additions:
         # The sample gives the language mix; the stats give the true volume.
-        additions_by_language = _scale(additions_by_language, stats["user_additions"])
-        additions = stats["user_additions"]
-        deletions = stats["user_deletions"]
+        additions_by_language = _scale(additions_by_language, totals["user_additions"])
+        additions = totals["user_additions"]
+        deletions = totals["user_deletions"]
+        method = "estimated"
+
+    elif net and not inherited and totals and totals["user_additions"] > 0:
+        # Compared runs are net diffs, which per-commit tallies cannot be
+        # added to. They give the language mix; the stats give the volume.
+        additions_by_language = _scale(additions_by_language, totals["user_additions"])
+        additions = totals["user_additions"]
+        deletions = totals["user_deletions"]
         method = "estimated"
 
+    elif net:
+        method = "net"
+
     contribution = RepoContribution(
         repo=name,
         owner=owner,
@@ -647,9 +2090,65 @@ async def analyze_repo_contribution(
         contribution_percentage=contribution_percentage,
         method=method,
         truncated=truncated,
+        language_margins=margins or None,
+        head_sha=shas[0] if shas else None,
+        head_date=dates.get(shas[0]) if shas else None,
     )
-
     if deadline.expired:
+        await _save_checkpoint(
+            checkpoint_key, shas, listed, dates, parents, username, full_name
+        )
+    return await _settle(contribution, cache_key, username, progress, not deadline.expired)
+
+
+def _checkpoint_key(cache_key: str) -> str:
+    return f"{cache_key}:partial"
+
+
+async def _save_checkpoint(
+    key: str,
+    shas: List[str],
+    listed: bool,
+    dates: Dict[str, str],
+    parents: Dict[str, List[str]],
+    username: str,
+    full_name: str,
+) -> None:
+    """Remember how far a walk the deadline cut short got.
+
+    Big repos used to be unable to warm through the HTTP endpoints at all:
+    each call re-listed from page one, ran out of time, and threw everything
+    away. The SHAs listed so far and whether the listing finished are kept
+    here, and every commit already measured is in the per-SHA cache, so the
+    next call resumes where this one stopped and coverage only ever grows.
+    The key embeds the repo's ``pushed_at``, so a push starts afresh.
+    """
+    head = {shas[0]: dates[shas[0]]} if shas and shas[0] in dates else {}
+    await cache.set_json(
+        key,
+        {"shas": shas, "listed": listed, "dates": head, "parents": parents},
+        settings.cache_ttl_seconds,
+    )
+    await cache.tag_keys(
+        [key],
+        [cache.user_tag(username), cache.repo_tag(full_name)],
+        settings.cache_ttl_seconds,
+    )
+
+
+async def _settle(
+    contribution: RepoContribution,
+    cache_key: str,
+    username: str,
+    progress: WalkProgress,
+    complete: bool,
+) -> RepoContribution:
+    """Cache a finished measurement, or hand back an unfinished one uncached.
+
+    A finished measurement also drops the repo's walk checkpoint, which would
+    otherwise outlive it and have a walk resume from it once this expired.
+    """
+    if not complete:
         # The deadline cut this measurement short, so it undercounts. Hand it
         # back for this response but leave the cache empty, otherwise a
         # truncated figure would be served for the whole TTL.
@@ -659,10 +2158,423 @@ async def analyze_repo_contribution(
     await cache.set_json(
         cache_key, contribution.model_dump(), settings.cache_ttl_seconds
     )
-    progress.resolved += 1
+    await cache.tag_keys(
+        [cache_key],
+        [cache.user_tag(username), cache.repo_tag(contribution.full_name)],
+        settings.cache_ttl_seconds,
+    )
+    await cache.delete(_checkpoint_key(cache_key))
+    progress.resolve(contribution.full_name, contribution)
     return contribution
 
 
+def _since(head_date: str) -> Optional[str]:
+    """A ``since`` one second before ``head_date``, so the head itself is listed."""
+    try:
+        moment = datetime.fromisoformat(head_date.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    earlier = (moment - timedelta(seconds=1)).astimezone(timezone.utc)
+    return earlier.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+async def _user_commits_since(
+    client: httpx.AsyncClient,
+    owner: str,
+    repo: str,
+    username: str,
+    base: str,
+    head: str,
+    token: str,
+    semaphore: asyncio.Semaphore,
+    deadline: Deadline,
+    guard: Optional[RateLimitGuard] = None,
+) -> Optional[Set[str]]:
+    """The user's commits reachable from ``head`` but not ``base``.
+
+    Unlike a dated listing this sees commits merged since ``base`` whatever
+    their dates say. ``None`` when it cannot say: ``base`` is no longer an
+    ancestor, or more commits landed than one compare lists.
+    """
+    url = f"{GITHUB_API}/repos/{owner}/{repo}/compare/{base}...{head}"
+    async with semaphore:
+        if deadline.expired:
+            return None
+        try:
+            response = await client.get(url, headers=github_headers(token))
+        except Exception:
+            return None
+
+    if guard is not None:
+        guard.observe(response)
+    if response.status_code != 200:
+        return None
+    try:
+        payload = response.json()
+    except ValueError:
+        return None
+    if not isinstance(payload, dict) or payload.get("status") not in ("ahead", "identical"):
+        return None
+    commits = payload.get("commits")
+    if not isinstance(commits, list) or payload.get("total_commits") != len(commits):
+        return None
+
+    login = username.lower()
+    return {
+        str(commit.get("sha"))
+        for commit in commits
+        if isinstance(commit, dict)
+        and isinstance(commit.get("author"), dict)
+        and str(commit["author"].get("login") or "").lower() == login
+    }
+
+
+async def _extend_measurement(
+    client: httpx.AsyncClient,
+    owner: str,
+    name: str,
+    username: str,
+    token: str,
+    previous: RepoContribution,
+    budget: AttributionBudget,
+    semaphore: asyncio.Semaphore,
+    deadline: Deadline,
+    guard: Optional[RateLimitGuard] = None,
+    claim: Optional[Callable[[List[str]], List[str]]] = None,
+    stats: Optional[ContributorStats] = None,
+    version: Optional[str] = None,
+    branch: Optional[str] = None,
+) -> Optional[Tuple[RepoContribution, bool]]:
+    """Fold the commits made since ``previous`` into it.
+
+    A push used to throw the whole measurement away and re-walk up to
+    ``max_commits_per_repo`` commits; this lists only commits dated since the
+    last measured head and measures the ones above it. Returns the updated
+    contribution and whether every new commit was measured, or ``None`` when
+    an incremental update cannot be trusted: ``previous`` was sampled or
+    estimated rather than exact, or its head is no longer in the history
+    (a force-push), or more commits landed than one listing holds. ``claim``
+    filters the new commits down to the ones this repo counts.
+
+    A branch merged since may bring commits dated before the old head, which
+    the listing drops or sorts below it. So the listing is checked against a
+    compare of the old head with ``branch`` (the default branch), and any
+    disagreement is also ``None``, for a full walk to count them.
+    """
+    if previous.method != "commits" or previous.truncated:
+        return None
+    if not previous.head_sha or not previous.head_date:
+        return None
+    since = _since(previous.head_date)
+    if since is None:
+        return None
+
+    dates: Dict[str, str] = {}
+    parents: Dict[str, List[str]] = {}
+    listed = await _list_commit_shas(
+        client, owner, name, username, token, settings.max_commits_per_repo, deadline,
+        since=since, dates=dates, parents=parents,
+    )
+    if previous.head_sha not in listed:
+        return None
+    new = listed[: listed.index(previous.head_sha)]
+    reachable = await _user_commits_since(
+        client, owner, name, username, previous.head_sha, branch or "HEAD",
+        token, semaphore, deadline, guard,
+    )
+    if reachable is None or reachable != set(new):
+        return None
+    if claim is not None:
+        new = claim(new)
+    if not new:
+        # Someone else pushed, or only commits a sibling repo counts landed;
+        # either way this repo's share is unchanged.
+        return previous, True
+
+    measured = await _measure_shas(
+        client, owner, name, new, parents, token, budget, semaphore, deadline, guard
+    )
+    complete = len(measured) == len(new) and all(item is not None for item in measured)
+
+    additions_by_language = {item.name: item.lines for item in previous.languages}
+    files_by_language = {item.name: item.files for item in previous.languages}
+    deletions_by_language: Dict[str, int] = {}
+    additions = deletions = files_changed = 0
+    for reduced in measured:
+        if reduced is None:
+            continue
+        commit_additions, commit_deletions, commit_files = _fold_commit(
+            reduced, additions_by_language, deletions_by_language, files_by_language
+        )
+        additions += commit_additions
+        deletions += commit_deletions
+        files_changed += commit_files
+
+    totals = await _fetch_contributor_totals(
+        client, owner, name, username, token, deadline, stats, version
+    )
+    contribution_percentage = previous.contribution_percentage
+    if totals and totals["repo_additions"] > 0:
+        contribution_percentage = round(
+            (totals["user_additions"] / totals["repo_additions"]) * 100, 2
+        )
+
+    updated = previous.model_copy(
+        update={
+            "commits": previous.commits + len(new),
+            "additions": previous.additions + additions,
+            "deletions": previous.deletions + deletions,
+            "files_changed": previous.files_changed + files_changed,
+            "languages": _build_language_list(additions_by_language, files_by_language, None),
+            "contribution_percentage": contribution_percentage,
+            "head_sha": listed[0],
+            "head_date": dates.get(listed[0]) or previous.head_date,
+            # A compared run's net diff cannot pass for a sum of commits.
+            "method": "net" if any(item and item.get("net") for item in measured) else "commits",
+        }
+    )
+    return updated, complete and not deadline.expired
+
+
+# Field and record separators, so author names and paths need no escaping.
+_NUMSTAT_FORMAT = "%x1e%H%x1f%an%x1f%ae%x1f%cd"
+
+
+def _clone_url(repo: Dict[str, Any]) -> Optional[str]:
+    if repo.get("clone_url"):
+        return str(repo["clone_url"])
+    full_name = repo.get("full_name")
+    return f"{BASE_GITHUB_URL}/{full_name}.git" if full_name else None
+
+
+def _authored_by(name: str, email: str, username: str, authors: Set[str]) -> bool:
+    """Whether a commit's author is the user, as far as the clone can tell.
+
+    GitHub ties commits to accounts by verified email, which a clone cannot
+    see. It recognises the user's noreply address (``login@`` or
+    ``id+login@users.noreply.github.com``) and the names or emails in
+    ``authors``. A name equal to the login is not enough: anyone can commit
+    under any name, and common logins are common names.
+    """
+    login = username.lower()
+    name, email = name.strip().lower(), email.strip().lower()
+    local, _, domain = email.partition("@")
+    if domain == "users.noreply.github.com" and (local == login or local.endswith(f"+{login}")):
+        return True
+    return name in authors or email in authors
+
+
+def _author_filters(username: str, authors: Set[str]) -> List[str]:
+    """``git log`` arguments that keep only commits :func:`_authored_by` may accept.
+
+    Git matches them as case-insensitive substrings of ``Name <email>``, so
+    they can let a stranger through but never drop the user; the exact check
+    still runs on every commit they pass.
+    """
+    login = username.lower()
+    patterns = [f"<{login}@users.noreply.github.com>", f"+{login}@users.noreply.github.com>"]
+    for author in sorted(authors):
+        patterns.append(f"<{author}>" if "@" in author else f"{author} <")
+    return ["--fixed-strings", "--regexp-ignore-case", *(f"--author={p}" for p in patterns)]
+
+
+def _git_environment() -> Dict[str, str]:
+    # Never stop to ask for credentials, and print every date in UTC.
+    return {**os.environ, "GIT_TERMINAL_PROMPT": "0", "TZ": "UTC"}
+
+
+async def _clone(url: str, directory: str, blobless: bool) -> bool:
+    process = await asyncio.create_subprocess_exec(
+        "git", "clone", "--bare", "--quiet",
+        *(["--filter=blob:none"] if blobless else []), url, directory,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+        env=_git_environment(),
+    )
+    try:
+        return await asyncio.wait_for(process.wait(), settings.clone_timeout_seconds) == 0
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        return False
+
+
+async def _read_numstat(
+    directory: str, username: str, authors: Set[str], everyone: bool
+) -> Optional[Tuple[List[Tuple[str, str, Dict[str, Any], int]], Optional[int]]]:
+    """The user's commits, newest first, and the repo's total additions.
+
+    Each commit comes back as ``(sha, committer date, reduced diff, additions)``,
+    the last counting every file as the contributor stats do. With
+    ``everyone`` every author's commits are diffed, since the repo-wide
+    additions are what ``contribution_percentage`` is measured against, but
+    only the user's are kept, one at a time as ``git log`` streams them.
+
+    Without it ``git log`` skips other authors before diffing anything and
+    the total is ``None``. That is what a blobless clone needs: each diff
+    fetches its missing blobs from the remote, and every author's history
+    would be the whole repo again, a batch at a time.
+    """
+    process = await asyncio.create_subprocess_exec(
+        "git", "-c", "core.quotePath=false", "log", "HEAD",
+        *([] if everyone else _author_filters(username, authors)),
+        "--no-merges", "--no-renames", "--numstat",
+        f"--format={_NUMSTAT_FORMAT}", "--date=format-local:%Y-%m-%dT%H:%M:%SZ",
+        cwd=directory,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+        env=_git_environment(),
+    )
+    commits: List[Tuple[str, str, Dict[str, Any], int]] = []
+    repo_additions = 0
+    current: Optional[Tuple[str, str]] = None
+    files: List[Dict[str, Any]] = []
+
+    def close_commit() -> None:
+        if current is not None:
+            raw_additions = sum(entry["additions"] for entry in files)
+            commits.append((current[0], current[1], _reduce_commit(files), raw_additions))
+
+    async def read() -> None:
+        nonlocal current, files, repo_additions
+        async for raw in process.stdout:
+            line = raw.decode("utf-8", errors="replace").rstrip("\n")
+            if line.startswith("\x1e"):
+                close_commit()
+                sha, name, email, date = (line[1:].split("\x1f") + ["", "", "", ""])[:4]
+                current = (sha, date) if _authored_by(name, email, username, authors) else None
+                files = []
+                continue
+            added, _, rest = line.partition("\t")
+            deleted, _, path = rest.partition("\t")
+            if not path:
+                continue
+            # Binary files report "-" for both counts.
+            additions = int(added) if added.isdigit() else 0
+            if everyone:
+                repo_additions += additions
+            if current is not None:
+                files.append(
+                    {
+                        "filename": path,
+                        "additions": additions,
+                        "deletions": int(deleted) if deleted.isdigit() else 0,
+                    }
+                )
+        close_commit()
+
+    try:
+        await asyncio.wait_for(read(), settings.clone_timeout_seconds)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        return None
+    if await process.wait() != 0:
+        return None
+    return commits, repo_additions if everyone else None
+
+
+async def analyze_repo_from_clone(
+    repo: Dict[str, Any],
+    username: str,
+    progress: Optional[WalkProgress] = None,
+    ledger: Optional[CommitLedger] = None,
+    authors: Optional[List[str]] = None,
+    deadline: Optional[Deadline] = None,
+) -> Tuple[bool, Optional[RepoContribution]]:
+    """Measure a repo's whole history for one user from a local clone.
+
+    The API walk costs a request per commit and is capped by
+    ``max_commit_details``, so long histories come back sampled or
+    ``estimated``. This clones the repo, reads every commit's line counts from
+    one ``git log --numstat`` and produces the same :class:`RepoContribution`,
+    exact however long the history. Repos over ``clone_full_max_size_mb`` are
+    cloned without file contents and only the user's commits are diffed, so
+    git fetches just their blobs; those come back without a
+    ``contribution_percentage``, which would need everyone's. It is cached
+    under the same key, so the API serves it like any other measurement.
+
+    Meant for offline warming: a clone takes seconds to minutes. Returns
+    whether the repo could be measured this way at all -- ``False`` for one
+    too large, unreachable or out of time, which the caller should hand to the
+    API walk instead -- and the contribution, ``None`` when the user has no
+    commits of their own in it.
+
+    A clone knows the user only by the emails it is told. With no ``authors``
+    it has just the noreply address, so a repo where nothing matches is
+    handed to the API walk too, which GitHub attributes by verified email,
+    rather than settled as one the user never touched.
+    """
+    progress = progress if progress is not None else WalkProgress()
+    url = _clone_url(repo)
+    name = repo.get("name")
+    owner_payload = repo.get("owner")
+    owner = owner_payload.get("login") if isinstance(owner_payload, dict) else None
+    if not url or not name or not owner:
+        return False, None
+    if int(repo.get("size") or 0) > settings.clone_max_size_mb * 1024:
+        return False, None
+    if deadline is not None and deadline.expired:
+        return False, None
+    full_name = repo.get("full_name") or f"{owner}/{name}"
+
+    root = settings.clone_dir or os.path.join(tempfile.gettempdir(), "attribution-clones")
+    os.makedirs(root, exist_ok=True)
+    whole = int(repo.get("size") or 0) <= settings.clone_full_max_size_mb * 1024
+    with tempfile.TemporaryDirectory(dir=root) as scratch:
+        directory = os.path.join(scratch, "repo.git")
+        if not await _clone(url, directory, blobless=not whole):
+            return False, None
+        log = await _read_numstat(
+            directory, username, {author.lower() for author in authors or []}, everyone=whole
+        )
+    if log is None:
+        return False, None
+    commits, repo_additions = log
+    if not commits and not authors:
+        return False, None
+
+    shas = [commit[0] for commit in commits]
+    owned = set(ledger.claim(full_name, shas) if ledger is not None else shas)
+    commits = [commit for commit in commits if commit[0] in owned]
+    if not commits:
+        progress.resolve(full_name)
+        return True, None
+
+    additions_by_language: Dict[str, int] = {}
+    deletions_by_language: Dict[str, int] = {}
+    files_by_language: Dict[str, int] = {}
+    additions = deletions = files_changed = 0
+    for _, _, reduced, _ in commits:
+        commit_additions, commit_deletions, commit_files = _fold_commit(
+            reduced, additions_by_language, deletions_by_language, files_by_language
+        )
+        additions += commit_additions
+        deletions += commit_deletions
+        files_changed += commit_files
+
+    user_additions = sum(commit[3] for commit in commits)
+    contribution = RepoContribution(
+        repo=name,
+        owner=owner,
+        full_name=full_name,
+        is_fork=bool(repo.get("fork")),
+        url=repo.get("html_url"),
+        commits=len(commits),
+        additions=additions,
+        deletions=deletions,
+        files_changed=files_changed,
+        languages=_build_language_list(additions_by_language, files_by_language, None),
+        contribution_percentage=(
+            round(user_additions / repo_additions * 100, 2) if repo_additions else None
+        ),
+        head_sha=commits[0][0],
+        head_date=commits[0][1] or None,
+    )
+    cache_key = _cache_key(full_name, username, _version_token(repo))
+    return True, await _settle(contribution, cache_key, username, progress, True)
+
+
 async def get_user_contributions(
     username: str,
     token: str,
@@ -671,6 +2583,9 @@ async def get_user_contributions(
     include_repositories: bool = True,
     deadline_seconds: Optional[float] = None,
     cache_only: bool = False,
+    backend: str = "api",
+    authors: Optional[List[str]] = None,
+    on_response: Optional[Callable[[httpx.Response], Awaitable[None]]] = None,
 ) -> ContributionLanguageStats:
     """Aggregate every repository's per-user attribution into one breakdown.
 
@@ -678,17 +2593,23 @@ async def get_user_contributions(
     repos; ``cache_only`` measures nothing and reports only what is already
     cached. Either way the result says how many repos it covered, so callers
     can decide whether the language mix is representative enough to serve.
-    """
-    async with httpx.AsyncClient(timeout=settings.request_timeout_seconds) as client:
-        repos_url = f"{GITHUB_API}/users/{username}/repos"
-        params = {"per_page": "100", "sort": "pushed", "type": "all"}
-        response = await client.get(
-            repos_url, params=params, headers=github_headers(token)
-        )
 
-        raise_for_github_status(response, username)
+    ``backend="clone"`` measures uncached repos from local clones (see
+    :func:`analyze_repo_from_clone`, which ``authors`` is passed to) and
+    walks through the API only those it cannot clone. It is far too slow
+    for a request and meant for offline warming.
 
-        repos = response.json()
+    ``on_response`` is awaited with every GitHub response the walk receives,
+    so a caller sharing its token with other traffic can count its own calls.
+    """
+    hooks = {"response": [on_response]} if on_response else None
+    async with httpx.AsyncClient(
+        timeout=settings.request_timeout_seconds, event_hooks=hooks
+    ) as client:
+        # One cache read and, for an unchanged account, one free 304 settle
+        # every repo; only repos pushed since the last walk cost anything.
+        manifest = await read_manifest(username)
+        response, repos, etag = await list_repos(client, username, token, manifest)
         if not isinstance(repos, list) or not repos:
             return ContributionLanguageStats(username=username)
 
@@ -702,39 +2623,119 @@ async def get_user_contributions(
         skipped = max(0, len(candidates) - settings.max_repos)
         candidates = candidates[: settings.max_repos]
 
-        budget = AttributionBudget(settings.max_commit_details)
+        budget = AttributionBudget(settings.max_commit_details, settings.min_commits_per_repo)
         semaphore = asyncio.Semaphore(settings.concurrency)
         guard = RateLimitGuard(settings.rate_limit_floor)
         guard.observe(response)
         deadline = Deadline(deadline_seconds, guard)
         repo_slots = asyncio.Semaphore(settings.repo_concurrency)
         progress = WalkProgress()
+        sources = await resolve_fork_sources(
+            client, candidates, token, semaphore, deadline, guard, cache_only
+        )
+        ledger = CommitLedger(
+            username,
+            fork_networks(candidates, sources),
+            {repo.get("full_name") for repo in repos if isinstance(repo, dict)},
+        )
+        await ledger.load()
+        known, unsettled = settled_from_manifest(manifest, candidates)
+        if not cache_only:
+            reclaimed = {name for name in known if ledger.unrecorded(name)}
+            if reclaimed:
+                known = {name: item for name, item in known.items() if name not in reclaimed}
+                unsettled = [repo for repo in candidates if repo.get("full_name") not in known]
+        for full_name, contribution in known.items():
+            progress.resolve(full_name, contribution)
+        prefetched = await prefetch_cached(unsettled, username) if unsettled else {}
+        previous = previous_from_manifest(manifest)
+        unsettled = schedule_repos(unsettled, previous, settings.max_commit_details)
+        # Repos already cached cost nothing, are owed nothing and need no stats.
+        uncached = [
+            repo
+            for repo in unsettled
+            if repo.get("full_name")
+            and (prefetched is None or _repo_cache_key(repo, username) not in prefetched)
+        ]
+        budget.plan(
+            {
+                repo["full_name"]: _expected_commits(repo, previous.get(repo["full_name"]))
+                for repo in uncached
+            }
+        )
+        cloning = backend == "clone" and not cache_only
+        stats = ContributorStats(client, token, semaphore, deadline, guard)
+        if not cache_only and not cloning:
+            await stats.start(uncached)
+        clonable = {repo["full_name"] for repo in uncached} if cloning else set()
+        clone_slots = asyncio.Semaphore(settings.clone_concurrency)
 
         async def measure(repo: Dict[str, Any]) -> Optional[RepoContribution]:
-            async with repo_slots:
-                return await analyze_repo_contribution(
-                    client,
-                    repo,
-                    username,
-                    token,
-                    budget,
-                    semaphore,
-                    deadline=deadline,
-                    cache_only=cache_only,
-                    progress=progress,
-                    guard=guard,
-                )
-
-        # Candidates are newest-pushed first, so when the deadline cuts the walk
-        # short the repos that were measured are the ones the user works in now.
-        results = await asyncio.gather(
-            *(measure(repo) for repo in candidates),
+            share = budget.share(repo.get("full_name"))
+            try:
+                if repo.get("full_name") in clonable:
+                    async with clone_slots:
+                        cloned, contribution = await analyze_repo_from_clone(
+                            repo, username, progress, ledger, authors, deadline
+                        )
+                    if cloned:
+                        return contribution
+                async with repo_slots:
+                    return await analyze_repo_contribution(
+                        client,
+                        repo,
+                        username,
+                        token,
+                        share,
+                        semaphore,
+                        deadline=deadline,
+                        cache_only=cache_only,
+                        progress=progress,
+                        guard=guard,
+                        prefetched=prefetched,
+                        previous=previous.get(repo.get("full_name")),
+                        ledger=ledger,
+                        stats=stats,
+                    )
+            finally:
+                share.finish()
+
+        # Repos sharing history are measured one after another, upstream
+        # first, so each sees the commits the ones before it claimed.
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for position, repo in enumerate(unsettled):
+            network = ledger.network(repo.get("full_name")) or f"#{position}"
+            groups.setdefault(network, []).append(repo)
+
+        async def measure_network(group: List[Dict[str, Any]]) -> List[Any]:
+            outcomes: List[Any] = []
+            for repo in sorted(group, key=lambda item: bool(item.get("fork"))):
+                try:
+                    outcomes.append(await measure(repo))
+                except Exception as exc:
+                    outcomes.append(exc)
+            return outcomes
+
+        # Most code per call first, so when the deadline cuts the walk short
+        # what was measured is as much of the user's work as it could be.
+        grouped = await asyncio.gather(
+            *(measure_network(group) for group in groups.values()),
             return_exceptions=True,
         )
+        results = [
+            outcome
+            for outcomes in grouped
+            if isinstance(outcomes, list)
+            for outcome in outcomes
+        ]
+        await stats.close()
+
+    await ledger.save()
+    await _write_manifest(username, manifest, etag, repos, progress.settled)
 
     contributions = [
         result
-        for result in results
+        for result in [*known.values(), *results]
         if isinstance(result, RepoContribution) and result.additions > 0
     ]
 
@@ -770,6 +2771,7 @@ async def get_user_contributions(
         truncated=any(item.truncated for item in contributions),
         repos_considered=considered,
         coverage=round(progress.resolved / considered, 4) if considered else 0.0,
+        volume_coverage=_volume_coverage(candidates, progress.settled, previous),
         partial=progress.deferred > 0,
         status=status,
         message=message,
@@ -6,9 +6,9 @@ otherwise dominate a diff-based count: vendored dependencies, build output,
 lockfiles and minified bundles.
 """
 
-import posixpath
 import re
-from typing import Dict, List, Optional, Set
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set
 
 # Extension -> language. Keys are lowercase and include the leading dot.
 EXTENSION_LANGUAGES: Dict[str, str] = {
@@ -327,19 +327,27 @@ NON_CODE_LANGUAGES: Set[str] = {
 }
 
 
+# Every file of every walked commit is classified. The generated-file patterns
+# all anchor on the filename, so they are joined into one regex run over just
+# that rather than tried one by one against the whole path.
+_GENERATED_FILE = re.compile("|".join(f"(?:{pattern.pattern})" for pattern in GENERATED_PATTERNS))
+
+# Names that keep their language under any suffix: "Dockerfile.dev" and friends.
+_SUFFIXED_FILENAMES = {"dockerfile", "makefile", "jenkinsfile"}
+
+# Distinct paths remembered by classify_path. A walk sees the same few
+# hundred files over and over, commit after commit.
+CLASSIFY_CACHE_SIZE = 16384
+
+
 def is_vendored(path: str) -> bool:
     """True when the path lives in vendored, generated or build-output territory."""
-    normalized = path.replace("\\", "/").lower()
-    parts = normalized.split("/")
-
-    if any(part in VENDORED_SEGMENTS for part in parts[:-1]):
+    directory, _, filename = path.replace("\\", "/").lower().rpartition("/")
+    if directory and not VENDORED_SEGMENTS.isdisjoint(directory.split("/")):
         return True
-
-    filename = parts[-1]
     if filename in GENERATED_FILENAMES:
         return True
-
-    return any(pattern.search(normalized) for pattern in GENERATED_PATTERNS)
+    return _GENERATED_FILE.search(filename) is not None
 
 
 def detect_language(path: str) -> Optional[str]:
@@ -347,24 +355,42 @@ def detect_language(path: str) -> Optional[str]:
     if not path:
         return None
 
-    normalized = path.replace("\\", "/")
-    filename = posixpath.basename(normalized).lower()
+    filename = path.replace("\\", "/").rpartition("/")[2].lower()
     if not filename:
         return None
 
-    if filename in FILENAME_LANGUAGES:
-        return FILENAME_LANGUAGES[filename]
+    language = FILENAME_LANGUAGES.get(filename)
+    if language is not None:
+        return language
 
     # "Dockerfile.dev", "makefile.common", "readme.old" and friends.
-    stem = filename.split(".", 1)[0]
-    if stem in FILENAME_LANGUAGES and stem in {"dockerfile", "makefile", "jenkinsfile"}:
+    stem = filename.partition(".")[0]
+    if stem in _SUFFIXED_FILENAMES:
         return FILENAME_LANGUAGES[stem]
 
-    _, extension = posixpath.splitext(filename)
-    if not extension:
+    # Leading dots mark hidden files, not extensions: ".bashrc" has none.
+    dot = filename.rfind(".")
+    if dot <= 0 or not filename[:dot].lstrip("."):
+        return None
+    return EXTENSION_LANGUAGES.get(filename[dot:])
+
+
+@lru_cache(maxsize=CLASSIFY_CACHE_SIZE)
+def classify_path(path: str) -> Optional[str]:
+    """The language a changed file counts towards, or ``None`` if it does not.
+
+    :func:`is_vendored` and :func:`detect_language` in one call, remembered
+    per path.
+    """
+    if not path or is_vendored(path):
         return None
+    return detect_language(path)
+
 
-    return EXTENSION_LANGUAGES.get(extension.lower())
+def classify_paths(paths: Iterable[str]) -> List[Optional[str]]:
+    """:func:`classify_path` for a whole commit's file list, in order."""
+    classify = classify_path
+    return [classify(path) for path in paths]
 
 
 def filter_languages(
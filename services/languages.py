@@ -9,6 +9,7 @@ from bs4 import BeautifulSoup
 from fastapi import HTTPException
 
 from models.analytics import LanguageData
+from models.attribution import ContributionLanguageStats
 from models.commits import CommitDetail
 from models.profile import PinnedRepo
 from models.pull_requests import OrganizationContribution, PullRequestDetail
@@ -16,6 +17,7 @@ from models.repositories import Contributor, ReleaseAsset, RepoDetail, RepoRelea
 from models.stars import StarredList, StarsData
 from core.config import attribution_settings
 from services.attribution import get_user_contributions
+from services import repo_cache
 from services.client import raise_for_github_status
 
 BASE_GITHUB_URL = "https://github.com"
@@ -50,27 +52,14 @@ async def get_language_stats(
 
         excluded_set = set(excluded_languages)
         language_totals: Dict[str, int] = {}
-        language_urls = [
-            repo.get("languages_url")
-            for repo in repos
-            if isinstance(repo, dict) and repo.get("languages_url")
-        ]
 
-        semaphore = asyncio.Semaphore(8)
-
-        async def fetch_languages(url: str) -> Dict[str, int]:
-            async with semaphore:
-                lang_response = await client.get(
-                    url,
-                    headers={"Authorization": f"Bearer {token}"},
-                )
-                if lang_response.status_code != 200:
-                    return {}
-                data = lang_response.json()
-                return data if isinstance(data, dict) else {}
-
-        language_payloads = await asyncio.gather(
-            *(fetch_languages(url) for url in language_urls)
+        # Language bytes describe the repo, not the user, so they come from
+        # the per-repo cache that attribution and /repos read as well.
+        language_payloads = await repo_cache.languages_for(
+            client,
+            [repo for repo in repos if isinstance(repo, dict)],
+            token,
+            asyncio.Semaphore(8),
         )
 
         for langs in language_payloads:
@@ -90,6 +79,13 @@ async def get_language_stats(
         return sorted(language_stats, key=lambda x: x.percentage, reverse=True)
 
 
+def _coverage(stats: ContributionLanguageStats) -> float:
+    """The coverage the attributed split is held to, by repos or by lines."""
+    if attribution_settings.coverage_by_volume:
+        return stats.volume_coverage
+    return stats.coverage
+
+
 async def get_attributed_language_stats(
     username: str,
     token: str,
@@ -133,7 +129,7 @@ async def get_attributed_language_stats(
         and bool(stats.languages)
         # Too thin a sample: a handful of repos would misrepresent the user
         # worse than the unattributed split does.
-        and stats.coverage >= attribution_settings.min_coverage
+        and _coverage(stats) >= attribution_settings.min_coverage
     )
 
     if usable:
@@ -0,0 +1,188 @@
+"""Predict what the heavy endpoints will cost before anything runs them.
+
+Before a walk nobody could say whether a user would cost fifty GitHub calls
+or five thousand; ``coverage`` only told afterwards. :func:`plan_user` reads
+the repo listing once -- the attribution walk's own conditional request, which
+GitHub does not bill when nothing changed -- plus the cache entries each
+endpoint would read, and predicts from those the calls and wall time of
+``get_user_contributions``, ``get_repo_details`` and ``get_all_commits``.
+
+These are estimates for scheduling, not accounting. Commit counts come from
+the walk's own size-based guesses (or the last measurement), and every round
+trip is taken to cost ``planner_call_seconds``. None of the three endpoints
+touches the search API, so its separate quota does not figure here.
+"""
+
+import math
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from core.config import attribution_settings as settings
+from models.planner import CostPlan, EndpointCost
+from services import repo_cache
+from services.attribution import (
+    estimate_walk,
+    list_repos,
+    previous_from_manifest,
+    read_manifest,
+)
+from services.client import rate_limit_remaining
+
+# get_all_commits pages through each repo this many commits at a time.
+COMMITS_PER_PAGE = 100
+# fetch_repo_details makes three uncached calls per repo whatever the cache
+# holds (readme, releases, commit count); languages and contributors are free
+# when repo_cache has them.
+_DETAIL_CALLS = 3
+_DETAIL_KINDS = ("languages", "contributors")
+
+
+def _owned(repos: List[Dict[str, Any]], username: str) -> List[Dict[str, Any]]:
+    """The repos ``username`` owns, which is all /repos and /commits list.
+
+    The attribution listing also holds repos the user is a member of, and a
+    listing replayed from the manifest keeps ``full_name`` but not ``owner``.
+    """
+    login = username.lower()
+    return [
+        repo
+        for repo in repos
+        if str(repo.get("full_name") or "").split("/", 1)[0].lower() == login
+    ]
+
+
+def _plan_contributions(
+    considered: int,
+    measured: int,
+    calls: int,
+    listing_calls: int,
+    remaining: Optional[int],
+    deadline_seconds: Optional[float],
+) -> EndpointCost:
+    """One walk's cost, given what :func:`estimate_walk` says finishing takes.
+
+    The walk keeps ``concurrency`` requests in flight and stops starting more
+    at its deadline or at the rate limit floor. One call therefore stops at
+    whichever comes first -- those two or the work itself -- and is complete
+    only when the work does.
+    """
+    call_seconds = settings.planner_call_seconds
+    per_second = settings.concurrency / call_seconds
+    total = listing_calls + calls
+    spent = total
+    if deadline_seconds is not None:
+        spent = min(spent, listing_calls + math.floor(deadline_seconds * per_second))
+    if remaining is not None:
+        spent = min(spent, max(0, remaining - settings.rate_limit_floor))
+    return EndpointCost(
+        endpoint="contributions",
+        repos=considered,
+        cached_repos=considered - measured,
+        github_calls=spent,
+        # The listing is a round trip even when GitHub answers 304 for free.
+        seconds=round(call_seconds + max(0, spent - listing_calls) / per_second, 2),
+        complete=spent >= total,
+        calls_to_complete=total,
+    )
+
+
+def _fits(calls: int, remaining: Optional[int]) -> bool:
+    return remaining is None or calls <= remaining
+
+
+async def _plan_repo_details(
+    owned: List[Dict[str, Any]], remaining: Optional[int]
+) -> EndpointCost:
+    """``get_repo_details``: a listing, then up to five calls per repo.
+
+    Attribution is read from the cache only there, so it costs nothing.
+    """
+    prefetched = await repo_cache.prefetch(list(_DETAIL_KINDS), owned) if owned else {}
+    missing = [
+        sum(1 for kind in _DETAIL_KINDS if not repo_cache.is_cached(kind, repo, prefetched))
+        for repo in owned
+    ]
+    calls = 1 + _DETAIL_CALLS * len(owned) + sum(missing)
+    # Each repo's calls go out together, repo_detail_concurrency repos at once.
+    rounds = math.ceil(len(owned) / max(1, settings.repo_detail_concurrency))
+    return EndpointCost(
+        endpoint="repos",
+        repos=len(owned),
+        cached_repos=sum(1 for count in missing if count == 0),
+        github_calls=calls,
+        seconds=round((1 + rounds) * settings.planner_call_seconds, 2),
+        complete=_fits(calls, remaining),
+        calls_to_complete=calls,
+    )
+
+
+def _plan_commits(
+    owned: List[Dict[str, Any]], manifest: Dict[str, Any], remaining: Optional[int]
+) -> EndpointCost:
+    """``get_all_commits``: a listing, then every page of each repo's commits.
+
+    A repo's pages are read one after another, every repo at once. The user's
+    commit count is known for repos the attribution walk has measured; the
+    rest are assumed to fit one page, as most repos do for one author.
+    """
+    previous = previous_from_manifest(manifest)
+    pages = []
+    for repo in owned:
+        contribution = previous.get(repo.get("full_name"))
+        commits = contribution.commits if contribution is not None else 0
+        # The walk stops on the first short page, so a full last page costs
+        # one more, empty, request.
+        pages.append(commits // COMMITS_PER_PAGE + 1)
+    calls = 1 + sum(pages)
+    return EndpointCost(
+        endpoint="commits",
+        repos=len(owned),
+        github_calls=calls,
+        seconds=round((1 + max(pages, default=0)) * settings.planner_call_seconds, 2),
+        complete=_fits(calls, remaining),
+        calls_to_complete=calls,
+    )
+
+
+async def plan_user(
+    username: str,
+    token: str,
+    include_forks: bool = True,
+    deadline_seconds: Optional[float] = None,
+    on_response: Optional[Callable[[httpx.Response], Awaitable[None]]] = None,
+) -> CostPlan:
+    """Every heavy endpoint's expected cost for ``username``, from one listing.
+
+    ``include_forks`` and ``deadline_seconds`` are the attribution walk's, so
+    the plan describes the walk the caller is about to run; a ``None``
+    deadline plans one walk with no time limit. ``on_response`` is awaited
+    with the listing's response, as in ``get_user_contributions``.
+    """
+    hooks = {"response": [on_response]} if on_response else None
+    async with httpx.AsyncClient(
+        timeout=settings.request_timeout_seconds, event_hooks=hooks
+    ) as client:
+        manifest = await read_manifest(username)
+        response, listing, _ = await list_repos(client, username, token, manifest)
+
+    repos = (
+        [repo for repo in listing if isinstance(repo, dict)] if isinstance(listing, list) else []
+    )
+    remaining = rate_limit_remaining(response)
+    # A listing GitHub just answered 304 will be answered 304 again.
+    listing_calls = 0 if response.status_code == 304 else 1
+
+    considered, measured, calls = await estimate_walk(username, repos, manifest, include_forks)
+    owned = _owned(repos, username)
+    return CostPlan(
+        username=username,
+        rate_limit_remaining=remaining,
+        endpoints=[
+            _plan_contributions(
+                considered, measured, calls, listing_calls, remaining, deadline_seconds
+            ),
+            await _plan_repo_details(owned, remaining),
+            _plan_commits(owned, manifest, remaining),
+        ],
+    )
@@ -0,0 +1,180 @@
+"""Cache for data that belongs to a repo rather than to whoever asked about it.
+
+A repo's language bytes, contributor list and contributor stats read the same
+for every user, yet they were fetched again by every endpoint and every
+user's walk that touched the repo -- and attribution's own cache keys include
+the username, so a popular upstream that fifty of our users contribute to was
+asked about fifty times. Entries here are keyed by ``full_name`` and the
+repo's ``pushed_at`` instead, so each is fetched once per push and then shared
+by attribution, ``/languages``, ``/repos`` and anything else that asks.
+
+Only successful answers are stored. A repo listing with no timestamp gives no
+way to tell when an entry went stale, so it is fetched without caching.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import httpx
+
+from core import cache
+from core.config import attribution_settings as settings
+from services.client import GITHUB_API, github_headers
+
+CACHE_VERSION = "v1"
+
+# How many contributors /repos shows per repo.
+CONTRIBUTOR_LIMIT = 10
+_CONTRIBUTOR_FIELDS = ("login", "avatar_url", "html_url", "contributions")
+
+
+def version_token(repo: Dict[str, Any]) -> Optional[str]:
+    """What changes whenever the repo's data can, or ``None`` if unknown."""
+    version = repo.get("pushed_at") or repo.get("updated_at")
+    return str(version) if version else None
+
+
+def _full_name(repo: Dict[str, Any]) -> Optional[str]:
+    if repo.get("full_name"):
+        return str(repo["full_name"])
+    owner = repo.get("owner")
+    login = owner.get("login") if isinstance(owner, dict) else None
+    if login and repo.get("name"):
+        return f"{login}/{repo['name']}"
+    return None
+
+
+def repo_key(kind: str, full_name: str, version: str) -> str:
+    return f"gh:repo:{CACHE_VERSION}:{kind}:{full_name}:{version}"
+
+
+def _key_for(kind: str, repo: Dict[str, Any]) -> Optional[str]:
+    full_name = _full_name(repo)
+    version = version_token(repo)
+    if full_name is None or version is None:
+        return None
+    return repo_key(kind, full_name, version)
+
+
+async def prefetch(kinds: Iterable[str], repos: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Every cached entry of ``kinds`` for ``repos``, read in one MGET.
+
+    Hand the result to the per-repo helpers as ``prefetched`` so a batch of
+    repos costs one cache round trip rather than one per repo and kind.
+    """
+    keys = [
+        key
+        for repo in repos
+        for kind in kinds
+        if (key := _key_for(kind, repo)) is not None
+    ]
+    return await cache.get_many_json(keys) or {}
+
+
+def is_cached(kind: str, repo: Dict[str, Any], prefetched: Dict[str, Any]) -> bool:
+    """Whether :func:`prefetch` found ``kind`` for ``repo``, so reading it is free."""
+    key = _key_for(kind, repo)
+    return key is not None and key in prefetched
+
+
+async def _cached(
+    kind: str,
+    repo: Dict[str, Any],
+    fetch: Callable[[], Awaitable[Optional[Any]]],
+    prefetched: Optional[Dict[str, Any]] = None,
+) -> Optional[Any]:
+    key = _key_for(kind, repo)
+    if key is None:
+        return await fetch()
+
+    # A prefetch that missed is final: it was one read of the same store.
+    entry = prefetched.get(key) if prefetched is not None else await cache.get_json(key)
+    if isinstance(entry, dict) and "value" in entry:
+        return entry["value"]
+
+    value = await fetch()
+    if value is not None:
+        await cache.set_json(key, {"value": value}, settings.cache_ttl_seconds)
+        # _key_for only hands out a key when the repo has a full name.
+        await cache.tag_keys(
+            [key], [cache.repo_tag(str(_full_name(repo)))], settings.cache_ttl_seconds
+        )
+    return value
+
+
+async def _get_json(client: httpx.AsyncClient, url: str, token: str) -> Optional[Any]:
+    try:
+        response = await client.get(url, headers=github_headers(token))
+    except Exception:
+        return None
+    if response.status_code != 200:
+        return None
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+
+async def languages(
+    client: httpx.AsyncClient,
+    repo: Dict[str, Any],
+    token: str,
+    prefetched: Optional[Dict[str, Any]] = None,
+) -> Dict[str, int]:
+    """The repo's language byte counts; empty when GitHub would not say."""
+    full_name = _full_name(repo)
+    if full_name is None:
+        return {}
+
+    async def fetch() -> Optional[Dict[str, int]]:
+        payload = await _get_json(client, f"{GITHUB_API}/repos/{full_name}/languages", token)
+        return payload if isinstance(payload, dict) else None
+
+    return await _cached("languages", repo, fetch, prefetched) or {}
+
+
+async def contributors(
+    client: httpx.AsyncClient,
+    repo: Dict[str, Any],
+    token: str,
+    prefetched: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """The repo's top contributors, reduced to the fields /repos shows."""
+    full_name = _full_name(repo)
+    if full_name is None:
+        return []
+
+    async def fetch() -> Optional[List[Dict[str, Any]]]:
+        payload = await _get_json(
+            client,
+            f"{GITHUB_API}/repos/{full_name}/contributors?per_page={CONTRIBUTOR_LIMIT}",
+            token,
+        )
+        if not isinstance(payload, list):
+            return None
+        return [
+            {field: entry[field] for field in _CONTRIBUTOR_FIELDS}
+            for entry in payload
+            if isinstance(entry, dict) and all(field in entry for field in _CONTRIBUTOR_FIELDS)
+        ]
+
+    return await _cached("contributors", repo, fetch, prefetched) or []
+
+
+async def languages_for(
+    client: httpx.AsyncClient,
+    repos: List[Dict[str, Any]],
+    token: str,
+    semaphore: asyncio.Semaphore,
+) -> List[Dict[str, int]]:
+    """:func:`languages` for each of ``repos``, in order, from one cache read."""
+    prefetched = await prefetch(["languages"], repos)
+
+    async def one(repo: Dict[str, Any]) -> Dict[str, int]:
+        key = _key_for("languages", repo)
+        if key is not None and key in prefetched:
+            return await languages(client, repo, token, prefetched)
+        async with semaphore:
+            return await languages(client, repo, token, prefetched)
+
+    return list(await asyncio.gather(*(one(repo) for repo in repos)))
@@ -16,7 +16,14 @@ from models.profile import PinnedRepo
 from models.pull_requests import OrganizationContribution, PullRequestDetail
 from models.repositories import Contributor, ReleaseAsset, RepoDetail, RepoRelease
 from models.stars import StarredList, StarsData
-from services.attribution import AttributionBudget, analyze_repo_contribution
+from services.attribution import (
+    AttributionBudget,
+    analyze_repo_contribution,
+    prefetch_cached,
+    read_manifest,
+    settled_from_manifest,
+)
+from services import repo_cache
 from services.client import raise_for_github_status
 
 BASE_GITHUB_URL = "https://github.com"
@@ -152,26 +159,16 @@ async def _get_commit_count(
 
 
 async def _fetch_contributors(
-    client: httpx.AsyncClient, owner: str, repo_name: str, token: str
+    client: httpx.AsyncClient,
+    repo: Dict,
+    token: str,
+    prefetched: Optional[Dict] = None,
 ) -> List[Contributor]:
-    contributors_url = (
-        f"{GITHUB_API}/repos/{owner}/{repo_name}/contributors?per_page=10"
-    )
     try:
-        response = await client.get(contributors_url, headers=github_headers(token))
-        if response.status_code == 200:
-            contributors_data = response.json()
-            return [
-                Contributor(
-                    login=c["login"],
-                    avatar_url=c["avatar_url"],
-                    html_url=c["html_url"],
-                    contributions=c["contributions"],
-                )
-                for c in contributors_data
-                if isinstance(c, dict)
-            ]
-        return []
+        return [
+            Contributor(**entry)
+            for entry in await repo_cache.contributors(client, repo, token, prefetched)
+        ]
     except Exception:
         return []
 
@@ -190,6 +187,11 @@ async def _attribute_repos(
     # the arguments the signature wants.
     budget = AttributionBudget(0)
     semaphore = asyncio.Semaphore(1)
+    candidates = [repo for repo in repos[: attribution_settings.max_repos] if isinstance(repo, dict)]
+    # The manifest answers every repo unchanged since the last walk in one
+    # read; only the rest need their per-repo entries.
+    known, candidates = settled_from_manifest(await read_manifest(username), candidates)
+    prefetched = await prefetch_cached(candidates, username) if candidates else {}
 
     results = await asyncio.gather(
         *(
@@ -201,15 +203,15 @@ async def _attribute_repos(
                 budget,
                 semaphore,
                 cache_only=True,
+                prefetched=prefetched,
             )
-            for repo in repos[: attribution_settings.max_repos]
-            if isinstance(repo, dict)
+            for repo in candidates
         ),
         return_exceptions=True,
     )
 
     attributed: Dict[str, RepoContribution] = {}
-    for result in results:
+    for result in [*known.values(), *results]:
         if isinstance(result, RepoContribution):
             attributed[result.full_name] = result
             attributed.setdefault(result.repo, result)
@@ -221,6 +223,7 @@ async def fetch_repo_details(
     repo: Dict,
     token: str,
     contribution: Optional[RepoContribution] = None,
+    prefetched: Optional[Dict] = None,
 ) -> Optional[RepoDetail]:
     repo_name = repo["name"]
     owner = repo["owner"]["login"]
@@ -244,19 +247,13 @@ async def fetch_repo_details(
 
     async def get_languages():
         nonlocal languages_list
-        languages_url = f"{GITHUB_API}/repos/{owner}/{repo_name}/languages"
-        try:
-            languages_resp = await client.get(
-                languages_url, headers=github_headers(token)
-            )
-            if languages_resp.status_code == 200:
-                languages_list = list(languages_resp.json().keys())
-        except Exception:
-            pass
+        languages_list = list(
+            (await repo_cache.languages(client, repo, token, prefetched)).keys()
+        )
 
     async def get_contributors():
         nonlocal contributors_list
-        contributors_list = await _fetch_contributors(client, owner, repo_name, token)
+        contributors_list = await _fetch_contributors(client, repo, token, prefetched)
 
     async def get_releases():
         nonlocal releases_list
@@ -354,6 +351,10 @@ async def get_repo_details(
             if attributed:
                 contributions = await _attribute_repos(client, repos, username, token)
 
+            # Languages and contributors are the same for every user, so they
+            # are cached per repo and push; one read finds whatever is warm.
+            prefetched = await repo_cache.prefetch(["languages", "contributors"], repos)
+
             # Fetch details for each repository concurrently, but capped: every
             # repo costs five requests, and firing hundreds at once draws
             # GitHub's secondary rate limiter, which slows the whole batch down.
@@ -368,6 +369,7 @@ async def get_repo_details(
                         contributions.get(
                             repo.get("full_name") or repo.get("name", "")
                         ),
+                        prefetched,
                     )
 
             repo_details = await asyncio.gather(
@@ -1,9 +1,20 @@
 import asyncio
+import contextlib
+import json
+import os
+import shutil
+import subprocess
 
 import pytest
 
 from services import attribution
-from services.language_map import detect_language, filter_languages, is_vendored
+from services.language_map import (
+    classify_path,
+    classify_paths,
+    detect_language,
+    filter_languages,
+    is_vendored,
+)
 
 
 class TestDetectLanguage:
@@ -66,6 +77,36 @@ class TestIsVendored:
         assert is_vendored("src/dist.py") is False
 
 
+class TestClassifyPaths:
+    @pytest.mark.parametrize(
+        "path",
+        [
+            "src/app.py",
+            "node_modules/react/index.js",
+            "static/js/app.min.js",
+            "Dockerfile.dev",
+            "deploy\\CMakeLists.txt",
+            ".bashrc",
+            "...",
+            "notes.",
+            "noext",
+            "proto/thing_pb2.py",
+            "docs/SWAGGER.yaml",
+            "",
+        ],
+    )
+    def test_agrees_with_the_separate_checks(self, path):
+        expected = None if not path or is_vendored(path) else detect_language(path)
+        assert classify_path(path) == expected
+
+    def test_batch_keeps_order_and_remembers_paths(self):
+        classify_path.cache_clear()
+        paths = ["a/x.go", "dist/x.js", "a/x.go", "README.md"]
+
+        assert classify_paths(paths) == ["Go", None, "Go", "Markdown"]
+        assert classify_path.cache_info().hits == 1
+
+
 class TestFilterLanguages:
     def test_excludes_case_insensitively(self):
         totals = {"Python": 100, "Markdown": 50, "JSON": 25}
@@ -145,6 +186,45 @@ class TestAttributionBudget:
 
         assert asyncio.run(run()) == (6, 4, 0, 0)
 
+    def test_first_repo_cannot_take_what_others_are_owed(self):
+        async def run():
+            budget = attribution.AttributionBudget(100)
+            budget.plan({"a": 100, "b": 100})
+            return await budget.share("a").take(100), await budget.share("b").take(100)
+
+        assert asyncio.run(run()) == (50, 50)
+
+    def test_quotas_follow_remaining_commits_above_a_minimum(self):
+        async def run():
+            budget = attribution.AttributionBudget(100, minimum_share=10)
+            budget.plan({"big": 1000, "small": 10, "tiny": 2})
+            return [
+                await budget.share(key).take(1000) for key in ("big", "small", "tiny")
+            ]
+
+        assert asyncio.run(run()) == [88, 10, 2]
+
+    def test_declared_demand_replaces_the_estimate(self):
+        async def run():
+            budget = attribution.AttributionBudget(100)
+            budget.plan({"a": 100, "b": 100})
+            budget.share("b").declare(10)
+            return await budget.share("a").take(100)
+
+        assert asyncio.run(run()) == 90
+
+    def test_finished_repos_hand_back_unused_quota(self):
+        async def run():
+            budget = attribution.AttributionBudget(100)
+            budget.plan({"a": 100, "b": 100})
+            a, b = budget.share("a"), budget.share("b")
+            first = await a.take(100)
+            await b.take(5)
+            b.finish()
+            return first, await a.take(100)
+
+        assert asyncio.run(run()) == (50, 45)
+
 
 class FakeResponse:
     def __init__(self, status_code=200, payload=None, headers=None):
@@ -155,6 +235,17 @@ class FakeResponse:
     def json(self):
         return self._payload
 
+    async def aiter_bytes(self):
+        # Small, uneven chunks, so entries and characters straddle boundaries.
+        body = json.dumps(self._payload).encode()
+        for start in range(0, len(body), 7):
+            yield body[start : start + 7]
+
+
+@contextlib.asynccontextmanager
+async def streamed(response):
+    yield await response
+
 
 class FakeClient:
     """Minimal stand-in for httpx.AsyncClient keyed on URL substrings."""
@@ -170,6 +261,9 @@ class FakeClient:
                 return response
         return FakeResponse(status_code=404)
 
+    def stream(self, method, url, headers=None):
+        return streamed(self.get(url, headers=headers))
+
 
 class TestCountUserCommits:
     def test_reads_last_page_from_link_header(self):
@@ -282,6 +376,179 @@ class TestFetchContributorTotals:
         )
 
 
+class TestStreamedContributorStats:
+    """The stats body is folded entry by entry as it streams in."""
+
+    @staticmethod
+    def _decode(body, size):
+        items = attribution._ArrayItems()
+        decoded = []
+        for start in range(0, len(body), size):
+            decoded.extend(items.feed(body[start : start + size]))
+        return decoded + items.finish()
+
+    @pytest.mark.parametrize("size", [1, 3, 64, 4096])
+    def test_any_chunking_decodes_the_same(self, size):
+        payload = [{"author": {"login": "zoë"}, "total": 12, "weeks": []}, 1234, "x", [], None]
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        assert self._decode(body, size) == payload
+
+    def test_empty_array(self):
+        assert self._decode(b" [ ] ", 1) == []
+
+    @pytest.mark.parametrize("body", [b"{}", b"[1, 2", b"[1 2]", b"[1,]", b"[] []"])
+    def test_malformed_bodies_are_rejected(self, body):
+        with pytest.raises(ValueError):
+            self._decode(body, 2)
+
+    def test_matches_the_parsed_summary(self):
+        payload = [
+            {
+                "author": {"login": f"Dev{i}"},
+                "total": i,
+                "weeks": [{"w": week, "a": i * week, "d": week, "c": 1} for week in range(60)],
+            }
+            for i in range(40)
+        ] + [{"author": None, "total": 1, "weeks": [{"a": 5, "d": 1}]}]
+
+        summary = asyncio.run(
+            attribution._read_contributor_summary(FakeResponse(payload=payload))
+        )
+
+        assert summary == attribution._summarize_contributors(payload)
+        assert summary["repo_additions"] == sum(i * 1770 for i in range(40)) + 5
+        assert summary["authors"]["dev3"] == [3 * 1770, 1770, 3]
+
+
+class TestContributorStats:
+    """Stats are requested when the walk starts and collected without sleeping."""
+
+    PAYLOAD = [{"author": {"login": "Me"}, "total": 2, "weeks": [{"a": 30, "d": 3}]}]
+
+    class SequenceClient:
+        def __init__(self, responses):
+            self.responses = responses
+            self.calls = []
+
+        async def get(self, url, params=None, headers=None):
+            self.calls.append(url)
+            return self.responses[url].pop(0)
+
+        def stream(self, method, url, headers=None):
+            return streamed(self.get(url, headers=headers))
+
+    def _repo(self, name):
+        return {"full_name": f"o/{name}", "pushed_at": "2026-03-01T00:00:00Z"}
+
+    @pytest.fixture
+    def store(self, monkeypatch):
+        data = {}
+
+        async def fake_many(keys):
+            return {key: data[key] for key in keys if key in data}
+
+        async def fake_set(key, value, ttl):
+            data[key] = value
+
+        async def no_sleep(_delay):
+            raise AssertionError("stats must not be slept on")
+
+        monkeypatch.setattr(attribution.cache, "get_many_json", fake_many)
+        monkeypatch.setattr(attribution.cache, "set_json", fake_set)
+        monkeypatch.setattr(attribution.asyncio, "sleep", no_sleep)
+        return data
+
+    def _stats(self, client):
+        return attribution.ContributorStats(
+            client, "t", asyncio.Semaphore(4), attribution.Deadline(None)
+        )
+
+    def test_computing_stats_are_polled_once_more(self, store):
+        url = f"{attribution.GITHUB_API}/repos/o/r/stats/contributors"
+        client = self.SequenceClient(
+            {url: [FakeResponse(202), FakeResponse(payload=self.PAYLOAD)]}
+        )
+
+        async def run():
+            stats = self._stats(client)
+            await stats.start([self._repo("r")])
+            totals = await attribution._fetch_contributor_totals(
+                client, "o", "r", "me", "t", attribution.Deadline(None), stats
+            )
+            await stats.close()
+            return totals
+
+        assert asyncio.run(run()) == {
+            "user_additions": 30,
+            "user_deletions": 3,
+            "user_commits": 2,
+            "repo_additions": 30,
+        }
+        assert len(client.calls) == 2
+
+    def test_still_computing_gives_up_without_waiting(self, store):
+        url = f"{attribution.GITHUB_API}/repos/o/r/stats/contributors"
+        client = self.SequenceClient({url: [FakeResponse(202), FakeResponse(202)]})
+
+        async def run():
+            stats = self._stats(client)
+            await stats.start([self._repo("r")])
+            return await stats.collect("o/r")
+
+        assert asyncio.run(run()) is None
+
+    def test_stats_are_cached_per_repo_for_every_user(self, store):
+        url = f"{attribution.GITHUB_API}/repos/o/r/stats/contributors"
+        client = self.SequenceClient({url: [FakeResponse(payload=self.PAYLOAD)]})
+
+        async def run():
+            first = self._stats(client)
+            await first.start([self._repo("r")])
+            await first.collect("o/r")
+            second = self._stats(client)
+            await second.start([self._repo("r")])
+            return await second.collect("o/r")
+
+        summary = asyncio.run(run())
+
+        assert summary == {"repo_additions": 30, "authors": {"me": [30, 3, 2]}}
+        assert len(client.calls) == 1
+        assert attribution._stats_key("o/r", "2026-03-01T00:00:00Z") in store
+
+    def test_stats_without_a_push_time_are_not_cached(self, store):
+        url = f"{attribution.GITHUB_API}/repos/o/r/stats/contributors"
+        client = self.SequenceClient(
+            {url: [FakeResponse(payload=self.PAYLOAD), FakeResponse(payload=self.PAYLOAD)]}
+        )
+
+        async def run():
+            for _ in range(2):
+                stats = self._stats(client)
+                await stats.start([{"full_name": "o/r"}])
+                assert await stats.collect("o/r") is not None
+
+        asyncio.run(run())
+
+        assert len(client.calls) == 2
+        assert store == {}
+
+    def test_unreached_requests_are_cancelled(self, store):
+        class SlowClient:
+            async def get(self, url, params=None, headers=None):
+                await asyncio.Event().wait()
+
+            def stream(self, method, url, headers=None):
+                return streamed(self.get(url, headers=headers))
+
+        async def run():
+            stats = self._stats(SlowClient())
+            await stats.start([self._repo("r")])
+            await stats.close()
+            return stats._requests
+
+        assert asyncio.run(run()) == {}
+
+
 class TestAnalyzeRepoContribution:
     """End-to-end over a fork where the user wrote a small slice of the code."""
 
@@ -365,7 +632,7 @@ class TestAnalyzeRepoContribution:
         async def fake_count(*_args, **_kwargs):
             return 500
 
-        async def fake_shas(_client, _o, _r, _u, _t, limit, _deadline):
+        async def fake_shas(_client, _o, _r, _u, _t, limit, _deadline, **_kwargs):
             return [f"sha{i}" for i in range(limit)]
 
         async def fake_files(*_args, **_kwargs):
@@ -573,7 +840,11 @@ class TestAnalyzeRepoContributionLimits:
         result, progress = self._run(deadline=ExpiringDeadline())
 
         assert result is not None, "partial numbers are still worth returning"
-        assert not stored, "a truncated measurement must not poison the cache"
+        # Each fetched commit is complete and still cached on its own.
+        repo_entries = [
+            key for key in stored if key.startswith("gh:attr:") and not key.endswith(":partial")
+        ]
+        assert not repo_entries, "a truncated measurement must not poison the cache"
         assert (progress.resolved, progress.deferred) == (0, 1)
 
     def test_empty_listing_under_expired_deadline_defers(self, monkeypatch):
@@ -600,52 +871,1374 @@ class TestAnalyzeRepoContributionLimits:
         assert (progress.resolved, progress.deferred) == (0, 1)
 
 
-class TestExplain:
-    """An empty breakdown must say why, or prod failures look identical."""
+class TestPrefetch:
+    """A warm account must cost one cache read, not one per repo."""
 
-    def _progress(self, resolved, deferred):
-        p = attribution.WalkProgress()
-        p.resolved, p.deferred = resolved, deferred
-        return p
+    def _repo(self, name="proj"):
+        return {
+            "name": name,
+            "full_name": f"me/{name}",
+            "owner": {"login": "me"},
+            "pushed_at": "2026-01-01T00:00:00Z",
+        }
 
-    def _guard(self, tripped):
-        g = attribution.RateLimitGuard(floor=500)
-        if tripped:
-            g.observe(FakeResponse(headers={"x-ratelimit-remaining": "1"}))
-        return g
+    @pytest.fixture
+    def no_single_reads(self, monkeypatch):
+        async def fail(key):
+            raise AssertionError("prefetched repos must not be read one by one")
 
-    def test_rate_limit_wins_over_every_other_cause(self):
-        # A tripped guard is what caused the thin coverage, so it is the
-        # useful thing to report even though the others are also true.
-        status, message = attribution._explain(
-            self._progress(0, 60), self._guard(True), cache_enabled=False, cache_only=True
+        monkeypatch.setattr(attribution.cache, "get_json", fail)
+
+    def _run(self, prefetched):
+        progress = attribution.WalkProgress()
+        result = asyncio.run(
+            attribution.analyze_repo_contribution(
+                FakeClient({}),
+                self._repo(),
+                "me",
+                "t",
+                attribution.AttributionBudget(0),
+                asyncio.Semaphore(1),
+                cache_only=True,
+                progress=progress,
+                prefetched=prefetched,
+            )
         )
-        assert status == "rate_limited"
-        assert "quota" in message.lower()
+        return result, progress
 
-    def test_complete_walk(self):
-        status, message = attribution._explain(
-            self._progress(60, 0), self._guard(False), cache_enabled=True, cache_only=False
+    def test_prefetched_measurement_is_used(self, no_single_reads):
+        key = attribution._repo_cache_key(self._repo(), "Me")
+        cached = attribution.RepoContribution(
+            repo="proj", owner="me", full_name="me/proj", additions=5
+        ).model_dump()
+
+        result, progress = self._run({key: cached})
+
+        assert result.additions == 5
+        assert progress.resolved == 1
+
+    def test_absent_from_the_prefetch_is_a_known_miss(self, no_single_reads):
+        result, progress = self._run({})
+
+        assert result is None
+        assert progress.deferred == 1
+
+    def test_one_batch_read_covers_every_nameable_repo(self, monkeypatch):
+        batches = []
+
+        async def fake_many(keys):
+            batches.append(keys)
+            return {}
+
+        monkeypatch.setattr(attribution.cache, "get_many_json", fake_many)
+        repos = [self._repo("a"), self._repo("b"), {"name": "orphan"}]
+
+        asyncio.run(attribution.prefetch_cached(repos, "me"))
+
+        assert len(batches) == 1
+        assert batches[0] == [
+            attribution._repo_cache_key(self._repo("a"), "me"),
+            attribution._repo_cache_key(self._repo("b"), "me"),
+        ]
+
+
+class TestManifest:
+    """A warm account must be answered without probing every repo again."""
+
+    def _repo(self, name, pushed_at="2026-01-01T00:00:00Z"):
+        return {
+            "name": name,
+            "full_name": f"me/{name}",
+            "owner": {"login": "me"},
+            "pushed_at": pushed_at,
+        }
+
+    def _contribution(self, name):
+        return attribution.RepoContribution(
+            repo=name,
+            owner="me",
+            full_name=f"me/{name}",
+            commits=1,
+            additions=10,
+            languages=[attribution.LanguageContribution(name="Python", percentage=100, lines=10)],
         )
-        assert status == "complete"
 
-    def test_missing_redis_is_called_out(self):
-        status, message = attribution._explain(
-            self._progress(5, 55), self._guard(False), cache_enabled=False, cache_only=False
+    @pytest.fixture
+    def store(self, monkeypatch):
+        data = {}
+
+        async def fake_get(key):
+            return data.get(key)
+
+        async def fake_set(key, value, ttl):
+            data[key] = value
+
+        async def fake_tag(keys, tags, ttl):
+            return None
+
+        async def fake_many(keys):
+            return {}
+
+        monkeypatch.setattr(attribution.cache, "get_json", fake_get)
+        monkeypatch.setattr(attribution.cache, "set_json", fake_set)
+        monkeypatch.setattr(attribution.cache, "tag_keys", fake_tag)
+        monkeypatch.setattr(attribution.cache, "get_many_json", fake_many)
+        return data
+
+    @pytest.fixture
+    def github(self, monkeypatch):
+        """The repo listing, answering 304 to a matching If-None-Match."""
+        state = {"repos": [self._repo("a"), self._repo("b")], "etag": '"e1"', "seen": []}
+
+        class Client:
+            def __init__(self, *args, **kwargs):
+                pass
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def get(self, url, params=None, headers=None):
+                if "/users/" not in url:
+                    return FakeResponse(404)
+                state["seen"].append((headers or {}).get("If-None-Match"))
+                if (headers or {}).get("If-None-Match") == state["etag"]:
+                    return FakeResponse(304)
+                return FakeResponse(200, state["repos"], {"ETag": state["etag"]})
+
+        measured = []
+
+        async def fake_analyze(client, repo, username, *args, progress=None, **kwargs):
+            measured.append(repo["name"])
+            contribution = self._contribution(repo["name"]) if repo["name"] == "a" else None
+            progress.resolve(repo["full_name"], contribution)
+            return contribution
+
+        monkeypatch.setattr(attribution.httpx, "AsyncClient", Client)
+        monkeypatch.setattr(attribution, "analyze_repo_contribution", fake_analyze)
+        state["measured"] = measured
+        return state
+
+    def _walk(self):
+        return asyncio.run(attribution.get_user_contributions("me", "t"))
+
+    def test_unchanged_listing_settles_every_repo_from_the_manifest(self, store, github):
+        first = self._walk()
+        github["measured"].clear()
+
+        second = self._walk()
+
+        assert github["seen"] == [None, '"e1"']
+        assert github["measured"] == []
+        assert second.languages == first.languages
+        assert second.coverage == 1.0
+
+    def test_pushed_repo_alone_is_looked_up_again(self, store, github):
+        self._walk()
+        github["measured"].clear()
+        github["repos"] = [self._repo("a"), self._repo("b", "2026-02-01T00:00:00Z")]
+        github["etag"] = '"e2"'
+
+        self._walk()
+
+        assert github["measured"] == ["b"]
+
+    def test_entries_outside_this_walk_survive_while_current(self, store):
+        manifest = {
+            "etag": None,
+            "listing": [],
+            "repos": {"me/fork": {"pushed_at": "2026-01-01T00:00:00Z", "contribution": None}},
+        }
+        listing = [self._repo("fork"), self._repo("a")]
+
+        asyncio.run(
+            attribution._write_manifest(
+                "me", manifest, '"e"', listing, {"me/a": self._contribution("a")}
+            )
         )
-        assert status == "cache_disabled"
-        assert "REDIS_URL" in message
 
-    def test_deadline_when_cache_is_working(self):
-        status, message = attribution._explain(
-            self._progress(5, 55), self._guard(False), cache_enabled=True, cache_only=False
+        assert set(store[attribution._manifest_key("me")]["repos"]) == {"me/fork", "me/a"}
+
+    def test_stale_entry_is_not_trusted(self):
+        manifest = {
+            "repos": {"me/a": {"pushed_at": "old", "contribution": None}},
+        }
+
+        settled, rest = attribution.settled_from_manifest(manifest, [self._repo("a")])
+
+        assert settled == {}
+        assert [repo["name"] for repo in rest] == ["a"]
+
+
+class TestCommitCache:
+    """A push must cost its new commits, not a re-walk of the whole repo."""
+
+    def _repo(self):
+        return {
+            "name": "proj",
+            "full_name": "me/proj",
+            "owner": {"login": "me"},
+            "pushed_at": "2026-03-01T00:00:00Z",
+        }
+
+    @pytest.fixture
+    def walk(self, monkeypatch):
+        store = {}
+        fetched = []
+
+        async def fake_many(keys):
+            return {key: store[key] for key in keys if key in store}
+
+        async def fake_get(key):
+            return store.get(key)
+
+        async def fake_set(key, value, ttl):
+            store[key] = value
+
+        async def fake_tag(keys, tags, ttl):
+            return None
+
+        async def fake_shas(*_args, **_kwargs):
+            return ["new", "old", "merge"]
+
+        async def fake_files(client, owner, repo, sha, *_args):
+            fetched.append(sha)
+            if sha == "merge":
+                return []
+            return [{"filename": f"src/{sha}.py", "additions": 5, "deletions": 1}]
+
+        async def fake_stats(*_args, **_kwargs):
+            return None
+
+        monkeypatch.setattr(attribution.cache, "get_many_json", fake_many)
+        monkeypatch.setattr(attribution.cache, "get_json", fake_get)
+        monkeypatch.setattr(attribution.cache, "set_json", fake_set)
+        monkeypatch.setattr(attribution.cache, "tag_keys", fake_tag)
+        monkeypatch.setattr(attribution, "_list_commit_shas", fake_shas)
+        monkeypatch.setattr(attribution, "_fetch_commit_files", fake_files)
+        monkeypatch.setattr(attribution, "_fetch_contributor_totals", fake_stats)
+        return store, fetched
+
+    def _run(self, budget=100):
+        return asyncio.run(
+            attribution.analyze_repo_contribution(
+                FakeClient({}),
+                self._repo(),
+                "me",
+                "t",
+                attribution.AttributionBudget(budget),
+                asyncio.Semaphore(2),
+            )
         )
-        assert status == "deadline"
-        assert "again" in message.lower()
 
-    def test_cache_only_mode_points_at_the_warm_script(self):
-        status, message = attribution._explain(
-            self._progress(5, 55), self._guard(False), cache_enabled=True, cache_only=True
+    def test_only_unseen_commits_are_fetched(self, walk):
+        store, fetched = walk
+        store[attribution._commit_key("old")] = attribution._reduce_commit(
+            [{"filename": "lib/old.go", "additions": 7, "deletions": 0}]
         )
-        assert status == "deadline"
-        assert "warm_attribution" in message
+
+        result = self._run()
+
+        assert fetched == ["new", "merge"]
+        assert {language.name: language.lines for language in result.languages} == {
+            "Python": 5,
+            "Go": 7,
+        }
+
+    def test_cached_commits_do_not_spend_budget(self, walk):
+        store, fetched = walk
+        for sha in ("old", "merge"):
+            store[attribution._commit_key(sha)] = attribution._reduce_commit([])
+
+        result = self._run(budget=1)
+
+        assert fetched == ["new"]
+        assert result.truncated is False
+
+    def test_merge_commits_are_remembered(self, walk):
+        store, _ = walk
+
+        self._run()
+
+        assert store[attribution._commit_key("merge")]["merge"] is True
+
+
+class TestContiguousRuns:
+    def test_groups_commits_chained_by_their_only_parent(self):
+        parents = {"c": ["b"], "b": ["a"], "a": ["root"], "x": ["other"]}
+
+        assert attribution._contiguous_runs(["c", "b", "a", "x"], parents) == [
+            ["c", "b", "a"],
+            ["x"],
+        ]
+
+    def test_a_gap_in_the_chain_starts_a_new_run(self):
+        # Someone else's commit sits between b and a.
+        parents = {"b": ["theirs"], "a": ["root"]}
+
+        assert attribution._contiguous_runs(["b", "a"], parents) == [["b"], ["a"]]
+
+    def test_oldest_commit_needs_a_single_parent_as_the_base(self):
+        parents = {"c": ["b"], "b": ["merge"], "merge": ["p1", "p2"]}
+
+        assert attribution._contiguous_runs(["c", "b", "merge"], parents) == [
+            ["c", "b"],
+            ["merge"],
+        ]
+
+    def test_runs_are_capped(self, monkeypatch):
+        monkeypatch.setattr(attribution, "COMPARE_MAX_COMMITS", 2)
+        parents = {"c": ["b"], "b": ["a"], "a": ["root"]}
+
+        # Counted up from the oldest commit, so the newest is the one left over.
+        assert attribution._contiguous_runs(["c", "b", "a"], parents) == [
+            ["c"],
+            ["b", "a"],
+        ]
+
+    def test_older_ranges_survive_a_push(self):
+        shas = [f"{n:040x}" for n in range(200, 0, -1)]
+        parents = {sha: [older] for sha, older in zip(shas, shas[1:])}
+        parents[shas[-1]] = ["root"]
+
+        def keys(listing):
+            runs = attribution._contiguous_runs(listing, parents)
+            return {attribution._range_key(run, parents) for run in runs} - {None}
+
+        before = keys(shas[30:])
+        after = keys(shas)
+
+        # Thirty new commits on top: only the range holding the old head
+        # grows, and every one below it is the same key, so already cached.
+        assert len(before - after) == 1
+        assert len(before & after) == len(before) - 1
+
+
+class TestCompareRuns:
+    """A run of the user's own consecutive commits costs one compare call."""
+
+    def _repo(self):
+        return {
+            "name": "proj",
+            "full_name": "me/proj",
+            "owner": {"login": "me"},
+            "pushed_at": "2026-03-01T00:00:00Z",
+        }
+
+    @pytest.fixture
+    def walk(self, monkeypatch):
+        store = {}
+        fetched = []
+
+        async def fake_many(keys):
+            return {key: store[key] for key in keys if key in store}
+
+        async def fake_get(key):
+            return store.get(key)
+
+        async def fake_set(key, value, ttl):
+            store[key] = value
+
+        async def fake_tag(keys, tags, ttl):
+            return None
+
+        async def fake_shas(*_args, parents=None, **_kwargs):
+            parents.update({"c": ["b"], "b": ["a"], "a": ["root"]})
+            return ["c", "b", "a"]
+
+        async def fake_files(client, owner, repo, sha, *_args):
+            fetched.append(sha)
+            return [{"filename": f"src/{sha}.py", "additions": 1, "deletions": 0}]
+
+        async def fake_stats(*_args, **_kwargs):
+            return None
+
+        monkeypatch.setattr(attribution.cache, "get_many_json", fake_many)
+        monkeypatch.setattr(attribution.cache, "get_json", fake_get)
+        monkeypatch.setattr(attribution.cache, "set_json", fake_set)
+        monkeypatch.setattr(attribution.cache, "tag_keys", fake_tag)
+        monkeypatch.setattr(attribution, "_list_commit_shas", fake_shas)
+        monkeypatch.setattr(attribution, "_fetch_commit_files", fake_files)
+        monkeypatch.setattr(attribution, "_fetch_contributor_totals", fake_stats)
+        return store, fetched
+
+    def _run(self, client, budget=100):
+        return asyncio.run(
+            attribution.analyze_repo_contribution(
+                client,
+                self._repo(),
+                "me",
+                "t",
+                attribution.AttributionBudget(budget),
+                asyncio.Semaphore(2),
+            )
+        )
+
+    def _compare(self, total_commits=3, files=None):
+        if files is None:
+            files = [{"filename": "src/app.py", "additions": 9, "deletions": 2}]
+        return FakeResponse(payload={"total_commits": total_commits, "files": files})
+
+    def test_one_compare_measures_the_whole_run(self, walk):
+        store, fetched = walk
+        client = FakeClient({"/compare/root...c": self._compare()})
+
+        result = self._run(client, budget=1)
+
+        assert fetched == []
+        assert len(client.calls) == 1
+        assert result.additions == 9
+        assert result.deletions == 2
+        assert result.truncated is False
+        assert result.method == "net"
+        assert store["gh:range:v1:root...c"]["additions"] == {"Python": 9}
+
+    def test_contributor_stats_set_the_volume_of_a_compared_run(self, walk, monkeypatch):
+        async def stats(*_args, **_kwargs):
+            return {
+                "user_additions": 12,
+                "user_deletions": 5,
+                "user_commits": 3,
+                "repo_additions": 24,
+            }
+
+        monkeypatch.setattr(attribution, "_fetch_contributor_totals", stats)
+        client = FakeClient({"/compare/root...c": self._compare()})
+
+        result = self._run(client)
+
+        # The compare's 9 net lines give the mix, not the total.
+        assert (result.additions, result.deletions) == (12, 5)
+        assert result.method == "estimated"
+        assert {item.name: item.lines for item in result.languages} == {"Python": 12}
+
+    def test_measured_ranges_and_commits_are_indexed_under_the_repo(self, walk, monkeypatch):
+        tagged = []
+
+        async def fake_tag(keys, tags, ttl):
+            tagged.append((keys, tags))
+
+        monkeypatch.setattr(attribution.cache, "tag_keys", fake_tag)
+        client = FakeClient({"/compare/root...c": self._compare()})
+
+        self._run(client)
+
+        assert (["gh:range:v1:root...c"], ["repo:me/proj"]) in tagged
+
+    def test_cached_range_costs_nothing(self, walk):
+        store, fetched = walk
+        store["gh:range:v1:root...c"] = attribution._reduce_commit(
+            [{"filename": "lib/a.go", "additions": 4, "deletions": 0}]
+        )
+        client = FakeClient({})
+
+        result = self._run(client, budget=0)
+
+        assert client.calls == []
+        assert fetched == []
+        assert result.additions == 4
+
+    def test_foreign_commits_in_range_fall_back_to_per_commit(self, walk):
+        _, fetched = walk
+        client = FakeClient({"/compare/": self._compare(total_commits=4)})
+
+        result = self._run(client)
+
+        assert sorted(fetched) == ["a", "b", "c"]
+        assert result.additions == 3
+        assert result.method == "commits"
+
+    def test_file_list_at_the_cap_falls_back(self, walk):
+        _, fetched = walk
+        files = [
+            {"filename": f"src/f{i}.py", "additions": 1, "deletions": 0}
+            for i in range(attribution.COMPARE_FILE_LIMIT)
+        ]
+        client = FakeClient({"/compare/": self._compare(files=files)})
+
+        self._run(client)
+
+        assert sorted(fetched) == ["a", "b", "c"]
+
+    def test_fallback_stops_at_the_budget(self, walk):
+        _, fetched = walk
+        client = FakeClient({"/compare/": FakeResponse(status_code=404)})
+
+        result = self._run(client, budget=2)
+
+        assert fetched == ["c", "b"]
+        assert result.truncated is True
+
+
+class TestForkNetworks:
+    def test_upstream_and_its_forks_share_a_network(self):
+        repos = [
+            {"full_name": "me/app"},
+            {"full_name": "me/app-fork", "fork": True},
+            {"full_name": "me/lib-fork", "fork": True},
+            {"full_name": "me/solo"},
+        ]
+        sources = {"me/app-fork": "me/app", "me/lib-fork": "them/lib"}
+
+        assert attribution.fork_networks(repos, sources) == {
+            "me/app": "me/app",
+            "me/app-fork": "me/app",
+        }
+
+    def test_resolves_sources_once_and_caches_them(self, monkeypatch):
+        store = {attribution._source_key("me/cached"): {"source": "them/cached"}}
+
+        async def fake_many(keys):
+            return {key: store[key] for key in keys if key in store}
+
+        async def fake_set(key, value, ttl):
+            store[key] = value
+
+        monkeypatch.setattr(attribution.cache, "get_many_json", fake_many)
+        monkeypatch.setattr(attribution.cache, "set_json", fake_set)
+        client = FakeClient(
+            {
+                "/repos/me/nested": FakeResponse(
+                    payload={
+                        "parent": {"full_name": "other/fork"},
+                        "source": {"full_name": "them/root"},
+                    }
+                ),
+            }
+        )
+        repos = [
+            {"full_name": "me/cached", "fork": True},
+            {"full_name": "me/nested", "fork": True},
+            {"full_name": "me/gone", "fork": True},
+            {"full_name": "me/own"},
+        ]
+
+        sources = asyncio.run(
+            attribution.resolve_fork_sources(
+                client, repos, "t", asyncio.Semaphore(2), attribution.Deadline(None)
+            )
+        )
+
+        assert sources == {"me/cached": "them/cached", "me/nested": "them/root"}
+        assert len(client.calls) == 2
+        assert store[attribution._source_key("me/nested")] == {"source": "them/root"}
+
+
+class TestCommitLedger:
+    def _ledger(self, live=None):
+        networks = {"me/app": "me/app", "me/app-fork": "me/app"}
+        return attribution.CommitLedger("me", networks, set(live or networks))
+
+    def test_first_repo_to_list_a_commit_owns_it(self):
+        ledger = self._ledger()
+
+        assert ledger.claim("me/app", ["a", "b"]) == ["a", "b"]
+        assert ledger.claim("me/app-fork", ["c", "b", "a"]) == ["c"]
+        assert ledger.claim("me/app", ["a", "b"]) == ["a", "b"]
+
+    def test_repos_outside_a_shared_network_keep_everything(self):
+        ledger = self._ledger()
+
+        assert ledger.claim("me/solo", ["a"]) == ["a"]
+
+    def test_claims_of_deleted_repos_are_released(self, monkeypatch):
+        store = {}
+
+        async def fake_many(keys):
+            return {key: store[key] for key in keys if key in store}
+
+        async def fake_set(key, value, ttl):
+            store[key] = value
+
+        async def fake_tag(keys, tags, ttl):
+            return None
+
+        monkeypatch.setattr(attribution.cache, "get_many_json", fake_many)
+        monkeypatch.setattr(attribution.cache, "set_json", fake_set)
+        monkeypatch.setattr(attribution.cache, "tag_keys", fake_tag)
+
+        async def run():
+            first = self._ledger()
+            await first.load()
+            first.claim("me/app-fork", ["a"])
+            await first.save()
+
+            # me/app-fork has since been deleted.
+            second = self._ledger(live={"me/app"})
+            await second.load()
+            return second.claim("me/app", ["a"])
+
+        assert asyncio.run(run()) == ["a"]
+
+    def test_unrecorded_repos_need_listing_again(self):
+        ledger = self._ledger()
+        ledger.claim("me/app", ["a"])
+
+        assert ledger.unrecorded("me/app") is False
+        assert ledger.unrecorded("me/app-fork") is True
+        assert ledger.unrecorded("me/solo") is False
+
+
+class TestForkAwareMeasurement:
+    """Commits inherited from an upstream are counted against one repo only."""
+
+    @pytest.fixture
+    def walk(self, monkeypatch):
+        store = {}
+        fetched = []
+
+        async def fake_many(keys):
+            return {key: store[key] for key in keys if key in store}
+
+        async def fake_get(key):
+            return store.get(key)
+
+        async def fake_set(key, value, ttl):
+            store[key] = value
+
+        async def fake_tag(keys, tags, ttl):
+            return None
+
+        async def fake_shas(client, owner, repo, *_args, **_kwargs):
+            return {"app": ["a", "b"], "app-fork": ["c", "a", "b"]}[repo]
+
+        async def fake_files(client, owner, repo, sha, *_args):
+            fetched.append(sha)
+            return [{"filename": f"src/{sha}.py", "additions": 10, "deletions": 0}]
+
+        async def fake_stats(*_args, **_kwargs):
+            return {"user_additions": 500, "user_deletions": 0, "repo_additions": 1000}
+
+        monkeypatch.setattr(attribution.cache, "get_many_json", fake_many)
+        monkeypatch.setattr(attribution.cache, "get_json", fake_get)
+        monkeypatch.setattr(attribution.cache, "set_json", fake_set)
+        monkeypatch.setattr(attribution.cache, "tag_keys", fake_tag)
+        monkeypatch.setattr(attribution, "_list_commit_shas", fake_shas)
+        monkeypatch.setattr(attribution, "_fetch_commit_files", fake_files)
+        monkeypatch.setattr(attribution, "_fetch_contributor_totals", fake_stats)
+        return store, fetched
+
+    def _repo(self, name, fork=False):
+        return {
+            "name": name,
+            "full_name": f"me/{name}",
+            "owner": {"login": "me"},
+            "fork": fork,
+            "pushed_at": "2026-03-01T00:00:00Z",
+        }
+
+    def test_fork_counts_only_its_own_commits(self, walk):
+        _, fetched = walk
+        networks = {"me/app": "me/app", "me/app-fork": "me/app"}
+        ledger = attribution.CommitLedger("me", networks, set(networks))
+
+        async def run():
+            results = []
+            for repo in (self._repo("app"), self._repo("app-fork", fork=True)):
+                results.append(
+                    await attribution.analyze_repo_contribution(
+                        FakeClient({}),
+                        repo,
+                        "me",
+                        "t",
+                        attribution.AttributionBudget(100),
+                        asyncio.Semaphore(2),
+                        ledger=ledger,
+                    )
+                )
+            return results
+
+        upstream, fork = asyncio.run(run())
+
+        assert sorted(fetched) == ["a", "b", "c"]
+        assert (upstream.commits, upstream.additions) == (2, 20)
+        # Not scaled up to the stats, which include the inherited commits.
+        assert (fork.commits, fork.additions, fork.method) == (1, 10, "commits")
+        assert fork.head_sha == "c"
+
+
+class TestScheduleRepos:
+    def _repo(self, name, size, fork=False, pushed_at="2026-01-01T00:00:00Z", stars=0):
+        return {
+            "full_name": f"me/{name}",
+            "size": size,
+            "fork": fork,
+            "pushed_at": pushed_at,
+            "stargazers_count": stars,
+        }
+
+    def _names(self, repos):
+        return [repo["full_name"] for repo in repos]
+
+    def test_most_code_per_call_goes_first(self):
+        tiny = self._repo("tiny", 2, pushed_at="2026-03-01T00:00:00Z")
+        main = self._repo("main", 8000)
+        fork = self._repo("fork", 8000, fork=True)
+
+        ordered = attribution.schedule_repos([tiny, fork, main], {}, 1000)
+
+        assert self._names(ordered) == ["me/main", "me/fork", "me/tiny"]
+
+    def test_earlier_measurements_beat_size_estimates(self):
+        big = self._repo("big", 50000)
+        known = self._repo("known", 10)
+        previous = {
+            "me/known": attribution.RepoContribution(
+                repo="known", owner="me", full_name="me/known", additions=10**6
+            )
+        }
+
+        ordered = attribution.schedule_repos([big, known], previous, 1000)
+
+        assert self._names(ordered)[0] == "me/known"
+
+    def test_repos_that_do_not_fit_the_budget_go_last(self):
+        # 10000 KB costs the full 200-commit listing; the smaller ones fit.
+        huge = self._repo("huge", 10000)
+        small = [self._repo(f"small{i}", 500) for i in range(3)]
+
+        ordered = attribution.schedule_repos([huge, *small], {}, 50)
+
+        assert self._names(ordered)[-1] == "me/huge"
+
+
+class TestVolumeCoverage:
+    def test_weighs_settled_repos_by_what_they_measured(self):
+        repos = [{"full_name": "me/main", "size": 4}, {"full_name": "me/tiny", "size": 4}]
+        settled = {
+            "me/main": attribution.RepoContribution(
+                repo="main", owner="me", full_name="me/main", additions=900
+            )
+        }
+
+        # me/tiny is estimated at 4 KB * 25 lines.
+        assert attribution._volume_coverage(repos, settled, {}) == 0.9
+
+    def test_everything_settled_with_nothing_written_is_complete(self):
+        repos = [{"full_name": "me/empty"}]
+
+        assert attribution._volume_coverage(repos, {"me/empty": None}, {}) == 1.0
+
+
+class TestStratifiedSampling:
+    def test_pages_spread_across_the_history(self):
+        assert attribution._stratum_pages(1000, 5) == [1, 3, 6, 8, 10]
+        assert attribution._stratum_pages(250, 5) == [1, 2, 3]
+
+    def test_strata_sizes_cover_the_whole_history(self):
+        sizes = attribution._stratum_sizes([1, 3, 6, 8, 10], 1000)
+
+        assert sum(sizes) == pytest.approx(1000)
+        assert sizes[0] == pytest.approx(150)
+
+    def test_every_prefix_of_the_order_is_spread_out(self):
+        assert attribution._spread(list("abcdefgh")) == list("aecgbfdh")
+
+    def test_expands_each_stratum_to_its_share_of_history(self):
+        python = attribution._reduce_commit([{"filename": "a.py", "additions": 10, "deletions": 0}])
+        go = attribution._reduce_commit([{"filename": "a.go", "additions": 10, "deletions": 0}])
+
+        additions, _, _, margins = attribution._stratified_estimate(
+            [(100.0, [python, python]), (300.0, [go, go])]
+        )
+
+        assert additions == {"Python": 1000, "Go": 3000}
+        # Every commit within a stratum agrees, so there is nothing to doubt.
+        assert margins == {"Python": 0.0, "Go": 0.0}
+
+    def test_mixed_strata_report_a_margin(self):
+        python = attribution._reduce_commit([{"filename": "a.py", "additions": 10, "deletions": 0}])
+        go = attribution._reduce_commit([{"filename": "a.go", "additions": 10, "deletions": 0}])
+
+        _, _, _, margins = attribution._stratified_estimate([(1000.0, [python, go, go, python])])
+
+        assert margins["Python"] > 0
+        assert margins["Python"] == margins["Go"]
+
+    def test_one_commit_per_stratum_gives_no_margin(self):
+        python = attribution._reduce_commit([{"filename": "a.py", "additions": 10, "deletions": 0}])
+
+        _, _, _, margins = attribution._stratified_estimate([(100.0, [python])])
+
+        assert margins == {}
+
+    def test_commits_carried_by_a_compared_run_are_not_observations(self):
+        python = attribution._reduce_commit([{"filename": "a.py", "additions": 10, "deletions": 0}])
+        carried = attribution._EMPTY_TALLY
+
+        _, _, _, margins = attribution._stratified_estimate([(100.0, [python, carried, carried])])
+
+        # One real observation: no spread to estimate, rather than a spread
+        # of zero-line commits that never existed.
+        assert margins == {}
+
+    def test_long_history_is_sampled_beyond_the_newest_commits(self, monkeypatch):
+        fetched = []
+
+        async def fake_count(*_args, **_kwargs):
+            return 1000
+
+        async def fake_shas(_client, _o, _r, _u, _t, limit, _deadline, start_page=1, **_kwargs):
+            return [f"p{start_page + i // 100}-{i % 100}" for i in range(limit)]
+
+        async def fake_files(client, owner, repo, sha, *_args):
+            fetched.append(sha)
+            # The user wrote Go early on and Python lately.
+            page = int(sha[1:].split("-")[0])
+            extension = "py" if page <= 5 else "go"
+            return [{"filename": f"src/x.{extension}", "additions": 10, "deletions": 0}]
+
+        async def fake_stats(*_args, **_kwargs):
+            return None
+
+        async def fake_many(keys):
+            return {}
+
+        monkeypatch.setattr(attribution, "_count_user_commits", fake_count)
+        monkeypatch.setattr(attribution, "_list_commit_shas", fake_shas)
+        monkeypatch.setattr(attribution, "_fetch_commit_files", fake_files)
+        monkeypatch.setattr(attribution, "_fetch_contributor_totals", fake_stats)
+        monkeypatch.setattr(attribution.cache, "get_many_json", fake_many)
+
+        result = asyncio.run(
+            attribution.analyze_repo_contribution(
+                FakeClient({}),
+                {"name": "big", "full_name": "me/big", "owner": {"login": "me"}},
+                "me",
+                "t",
+                attribution.AttributionBudget(600),
+                asyncio.Semaphore(4),
+            )
+        )
+
+        # One round from each of five strata was enough to pin the mix.
+        assert len(fetched) == 20
+        assert result.method == "estimated"
+        assert result.truncated is True
+        assert {language.name for language in result.languages} == {"Python", "Go"}
+        assert result.language_margins == {"Python": 0.0, "Go": 0.0}
+        assert result.additions == 10000
+
+
+class TestIncrementalMeasurement:
+    """A push must cost the commits it added, not a re-walk of the repo."""
+
+    def _repo(self):
+        return {
+            "name": "proj",
+            "full_name": "me/proj",
+            "owner": {"login": "me"},
+            "pushed_at": "2026-04-01T00:00:00Z",
+        }
+
+    def _previous(self, **overrides):
+        fields = dict(
+            repo="proj",
+            owner="me",
+            full_name="me/proj",
+            commits=3,
+            additions=30,
+            deletions=3,
+            files_changed=3,
+            languages=[attribution.LanguageContribution(name="Go", percentage=100, lines=30, files=3)],
+            head_sha="head",
+            head_date="2026-03-01T12:00:00Z",
+        )
+        fields.update(overrides)
+        return attribution.RepoContribution(**fields)
+
+    @pytest.fixture
+    def github(self, monkeypatch):
+        state = {
+            "listing": ["n2", "n1", "head", "older"],
+            "merged": [],
+            "fetched": [],
+            "since": [],
+        }
+
+        async def fake_shas(*_args, since=None, dates=None, **_kwargs):
+            state["since"].append(since)
+            if dates is not None:
+                dates.update({sha: f"2026-03-0{i + 2}T00:00:00Z" for i, sha in enumerate(state["listing"])})
+            return state["listing"]
+
+        async def fake_files(client, owner, repo, sha, *_args):
+            state["fetched"].append(sha)
+            return [{"filename": f"src/{sha}.py", "additions": 5, "deletions": 1}]
+
+        async def no_stats(*_args, **_kwargs):
+            return None
+
+        async def fake_count(*_args, **_kwargs):
+            return len(state["listing"])
+
+        async def nothing_cached(keys):
+            return {}
+
+        async def fake_set(key, value, ttl):
+            return None
+
+        async def fake_tag(keys, tags, ttl):
+            return None
+
+        monkeypatch.setattr(attribution, "_list_commit_shas", fake_shas)
+        monkeypatch.setattr(attribution, "_fetch_commit_files", fake_files)
+        monkeypatch.setattr(attribution, "_fetch_contributor_totals", no_stats)
+        monkeypatch.setattr(attribution, "_count_user_commits", fake_count)
+        monkeypatch.setattr(attribution.cache, "get_many_json", nothing_cached)
+        monkeypatch.setattr(attribution.cache, "set_json", fake_set)
+        monkeypatch.setattr(attribution.cache, "tag_keys", fake_tag)
+        return state
+
+    def _compare(self, github):
+        """The old head against the branch: the user's new commits and someone else's."""
+        listing = github["listing"]
+        new = listing[: listing.index("head")] if "head" in listing else []
+        commits = [{"sha": sha, "author": {"login": "Me"}} for sha in new + github["merged"]]
+        commits.append({"sha": "theirs", "author": {"login": "other"}})
+        payload = {"status": "ahead", "total_commits": len(commits), "commits": commits}
+        return FakeClient({"/compare/head...main": FakeResponse(payload=payload)})
+
+    def _run(self, previous, client=None):
+        return asyncio.run(
+            attribution.analyze_repo_contribution(
+                client or FakeClient({}),
+                {**self._repo(), "default_branch": "main"},
+                "me",
+                "t",
+                attribution.AttributionBudget(100),
+                asyncio.Semaphore(2),
+                prefetched={},
+                previous=previous,
+            )
+        )
+
+    def test_only_commits_above_the_old_head_are_measured(self, github):
+        result = self._run(self._previous(), self._compare(github))
+
+        assert github["since"] == ["2026-03-01T11:59:59Z"]
+        assert github["fetched"] == ["n2", "n1"]
+        assert (result.commits, result.additions, result.deletions) == (5, 40, 5)
+        assert {language.name: language.lines for language in result.languages} == {
+            "Go": 30,
+            "Python": 10,
+        }
+        assert result.head_sha == "n2"
+
+    def test_push_without_new_user_commits_costs_no_diffs(self, github):
+        github["listing"] = ["head", "older"]
+
+        result = self._run(self._previous(), self._compare(github))
+
+        assert github["fetched"] == []
+        assert result.commits == 3
+
+    def test_rewritten_history_falls_back_to_a_full_walk(self, github):
+        github["listing"] = ["x2", "x1"]
+
+        result = self._run(self._previous())
+
+        assert github["since"] == ["2026-03-01T11:59:59Z", None]
+        assert result.commits == 2
+        assert result.head_sha == "x2"
+
+    def test_back_dated_merged_commits_fall_back_to_a_full_walk(self, github):
+        # A branch merged since the last measurement brings a commit dated
+        # before the old head, so the dated listing never shows it above it.
+        github["merged"] = ["branch1"]
+
+        result = self._run(self._previous(), self._compare(github))
+
+        assert github["since"] == ["2026-03-01T11:59:59Z", None]
+        assert result.commits == 4
+
+    def test_estimated_measurement_is_never_extended(self, github):
+        result = self._run(self._previous(method="estimated"))
+
+        assert github["since"] == [None]
+        assert result.commits == 4
+
+
+class TestResumableWalk:
+    """A repo bigger than any one deadline must still warm, call by call."""
+
+    real_listing = staticmethod(attribution._list_commit_shas)
+
+    def _repo(self):
+        return {
+            "name": "big",
+            "full_name": "me/big",
+            "owner": {"login": "me"},
+            "pushed_at": "2026-05-01T00:00:00Z",
+        }
+
+    @pytest.fixture
+    def walk(self, monkeypatch):
+        store = {}
+        state = {"pages": [], "fetches": 0, "allowed": 2, "store": store}
+
+        class CountingDeadline(attribution.Deadline):
+            """Expires once a set number of commit fetches have started."""
+
+            def __init__(self):
+                super().__init__(None)
+
+            @property
+            def expired(self):
+                return state["fetches"] >= state["allowed"]
+
+        async def fake_get(key):
+            return store.get(key)
+
+        async def fake_many(keys):
+            return {key: store[key] for key in keys if key in store}
+
+        async def fake_set(key, value, ttl):
+            store[key] = value
+
+        async def fake_tag(keys, tags, ttl):
+            return None
+
+        async def fake_delete(*keys):
+            for key in keys:
+                store.pop(key, None)
+
+        async def fake_shas(*_args, start_page=1, dates=None, outcome=None, **_kwargs):
+            state["pages"].append(start_page)
+            if outcome is not None:
+                outcome["finished"] = True
+            return ["c3", "c2", "c1"]
+
+        async def fake_files(client, owner, repo, sha, token, semaphore, deadline, *_args):
+            if deadline.expired:
+                return None
+            state["fetches"] += 1
+            return [{"filename": f"{sha}.py", "additions": 1, "deletions": 0}]
+
+        async def fake_stats(*_args, **_kwargs):
+            return None
+
+        monkeypatch.setattr(attribution.cache, "get_json", fake_get)
+        monkeypatch.setattr(attribution.cache, "get_many_json", fake_many)
+        monkeypatch.setattr(attribution.cache, "set_json", fake_set)
+        monkeypatch.setattr(attribution.cache, "tag_keys", fake_tag)
+        monkeypatch.setattr(attribution.cache, "delete", fake_delete)
+        monkeypatch.setattr(attribution, "_list_commit_shas", fake_shas)
+        monkeypatch.setattr(attribution, "_fetch_commit_files", fake_files)
+        monkeypatch.setattr(attribution, "_fetch_contributor_totals", fake_stats)
+        state["deadline"] = CountingDeadline
+        return state
+
+    def _run(self, walk, client=None):
+        progress = attribution.WalkProgress()
+        result = asyncio.run(
+            attribution.analyze_repo_contribution(
+                client or FakeClient({}),
+                self._repo(),
+                "me",
+                "t",
+                attribution.AttributionBudget(100),
+                asyncio.Semaphore(1),
+                deadline=walk["deadline"](),
+                progress=progress,
+            )
+        )
+        return result, progress
+
+    def test_cut_short_walk_leaves_a_checkpoint(self, walk):
+        _, progress = self._run(walk)
+
+        checkpoints = [key for key in walk["store"] if key.endswith(":partial")]
+        assert progress.deferred == 1
+        assert len(checkpoints) == 1
+        assert walk["store"][checkpoints[0]]["shas"] == ["c3", "c2", "c1"]
+
+    def test_next_call_resumes_without_redoing_work(self, walk):
+        self._run(walk)
+        walk["allowed"] = 10
+
+        result, progress = self._run(walk)
+
+        # The listing finished inside the first call, so it is not repeated,
+        # and only the one commit left over is fetched.
+        assert walk["pages"] == [1]
+        assert walk["fetches"] == 3
+        assert progress.resolved == 1
+        assert result.commits == 3
+        assert result.additions == 3
+
+    def test_finished_walk_drops_its_checkpoint(self, walk):
+        self._run(walk)
+        walk["allowed"] = 10
+
+        self._run(walk)
+
+        # Left behind, it would outlive the result and be resumed from once
+        # the result expired.
+        assert not any(key.endswith(":partial") for key in walk["store"])
+        assert attribution._repo_cache_key(self._repo(), "me") in walk["store"]
+
+    def test_last_page_landing_after_the_deadline_is_not_listed_again(
+        self, walk, monkeypatch
+    ):
+        monkeypatch.setattr(attribution, "_list_commit_shas", self.real_listing)
+
+        class LateClient(FakeClient):
+            async def get(self, url, params=None, headers=None):
+                # The only page is short, and the deadline passes while it
+                # is in flight.
+                walk["allowed"] = 0
+                return await super().get(url, params, headers)
+
+        client = LateClient(
+            {"/commits": FakeResponse(payload=[{"sha": "c3"}, {"sha": "c2"}, {"sha": "c1"}])}
+        )
+        self._run(walk, client)
+        (checkpoint,) = [value for key, value in walk["store"].items() if key.endswith(":partial")]
+        assert checkpoint["listed"] is True
+
+        walk["allowed"] = 10
+        client = FakeClient({"/commits": FakeResponse(payload=[{"sha": "c3"}])})
+        result, _ = self._run(walk, client)
+
+        assert client.calls == []
+        assert result.commits == 3
+        assert result.additions == 3
+
+
+class TestExplain:
+    """An empty breakdown must say why, or prod failures look identical."""
+
+    def _progress(self, resolved, deferred):
+        p = attribution.WalkProgress()
+        p.resolved, p.deferred = resolved, deferred
+        return p
+
+    def _guard(self, tripped):
+        g = attribution.RateLimitGuard(floor=500)
+        if tripped:
+            g.observe(FakeResponse(headers={"x-ratelimit-remaining": "1"}))
+        return g
+
+    def test_rate_limit_wins_over_every_other_cause(self):
+        # A tripped guard is what caused the thin coverage, so it is the
+        # useful thing to report even though the others are also true.
+        status, message = attribution._explain(
+            self._progress(0, 60), self._guard(True), cache_enabled=False, cache_only=True
+        )
+        assert status == "rate_limited"
+        assert "quota" in message.lower()
+
+    def test_complete_walk(self):
+        status, message = attribution._explain(
+            self._progress(60, 0), self._guard(False), cache_enabled=True, cache_only=False
+        )
+        assert status == "complete"
+
+    def test_missing_redis_is_called_out(self):
+        status, message = attribution._explain(
+            self._progress(5, 55), self._guard(False), cache_enabled=False, cache_only=False
+        )
+        assert status == "cache_disabled"
+        assert "REDIS_URL" in message
+
+    def test_deadline_when_cache_is_working(self):
+        status, message = attribution._explain(
+            self._progress(5, 55), self._guard(False), cache_enabled=True, cache_only=False
+        )
+        assert status == "deadline"
+        assert "again" in message.lower()
+
+    def test_cache_only_mode_points_at_the_warm_script(self):
+        status, message = attribution._explain(
+            self._progress(5, 55), self._guard(False), cache_enabled=True, cache_only=True
+        )
+        assert status == "deadline"
+        assert "warm_attribution" in message
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="needs git")
+class TestCloneBackend:
+    """The clone backend over a local bare repo, cached like an API walk."""
+
+    @staticmethod
+    def _git(cwd, *args, author="me <me@users.noreply.github.com>", date=None):
+        env = {
+            **os.environ,
+            "GIT_AUTHOR_NAME": author.split(" <")[0],
+            "GIT_AUTHOR_EMAIL": author.split(" <")[1].rstrip(">"),
+            "GIT_COMMITTER_NAME": "c",
+            "GIT_COMMITTER_EMAIL": "c@example.com",
+        }
+        if date:
+            env["GIT_AUTHOR_DATE"] = env["GIT_COMMITTER_DATE"] = date
+        subprocess.run(["git", *args], cwd=cwd, env=env, check=True, capture_output=True)
+
+    def _commit(self, work, files, author="me <me@users.noreply.github.com>", date=None):
+        for path, text in files.items():
+            target = work / path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(text)
+        self._git(work, "add", "-A")
+        self._git(work, "commit", "-q", "-m", "change", author=author, date=date)
+
+    @pytest.fixture
+    def origin(self, tmp_path):
+        work = tmp_path / "work"
+        work.mkdir()
+        self._git(work, "init", "-q")
+        self._commit(work, {"lib.go": "a\nb\nc\nd\n"}, author="Other <o@example.com>")
+        self._commit(work, {"app.py": "x\ny\n", "node_modules/dep.js": "v\n" * 50})
+        self._commit(
+            work,
+            {"app.py": "x\ny\nz\n", "web/index.ts": "t\n"},
+            author="Me Myself <12+Me@users.noreply.github.com>",
+            date="2026-02-01T10:00:00+00:00",
+        )
+        bare = tmp_path / "origin.git"
+        subprocess.run(["git", "clone", "-q", "--bare", str(work), str(bare)], check=True)
+        return bare
+
+    @pytest.fixture
+    def store(self, monkeypatch, tmp_path):
+        data = {}
+
+        async def fake_set(key, value, ttl):
+            data[key] = value
+
+        async def fake_tag(keys, tags, ttl):
+            return None
+
+        monkeypatch.setattr(attribution.cache, "set_json", fake_set)
+        monkeypatch.setattr(attribution.cache, "tag_keys", fake_tag)
+        monkeypatch.setattr(attribution.settings, "clone_dir", str(tmp_path / "scratch"))
+        return data
+
+    def _repo(self, origin, **overrides):
+        repo = {
+            "name": "r",
+            "full_name": "me/r",
+            "owner": {"login": "me"},
+            "pushed_at": "2026-02-01T10:00:00Z",
+            "clone_url": str(origin),
+            "size": 10,
+        }
+        repo.update(overrides)
+        return repo
+
+    def test_measures_the_whole_history_exactly(self, origin, store, tmp_path):
+        cloned, contribution = asyncio.run(
+            attribution.analyze_repo_from_clone(self._repo(origin), "me")
+        )
+
+        assert cloned is True
+        assert contribution.method == "commits" and not contribution.truncated
+        assert contribution.commits == 2
+        assert {item.name: item.lines for item in contribution.languages} == {
+            "Python": 3,
+            "TypeScript": 1,
+        }
+        # Vendored lines count towards the repo total but not the user's mix.
+        assert contribution.additions == 4
+        assert contribution.contribution_percentage == round(54 / 58 * 100, 2)
+        assert contribution.head_date == "2026-02-01T10:00:00Z"
+        key = attribution._cache_key("me/r", "me", "2026-02-01T10:00:00Z")
+        assert store[key]["commits"] == 2
+        assert os.listdir(tmp_path / "scratch") == []
+
+    def test_extra_authors_and_ledger_claims_apply(self, origin, store):
+        ledger = attribution.CommitLedger(
+            "me", {"me/r": "net", "me/up": "net"}, {"me/r", "me/up"}
+        )
+
+        async def run():
+            listed = await attribution.analyze_repo_from_clone(
+                self._repo(origin), "me", authors=["o@example.com"]
+            )
+            up = self._repo(origin, full_name="me/up", name="up")
+            await attribution.analyze_repo_from_clone(up, "me", ledger=ledger)
+            return listed, await attribution.analyze_repo_from_clone(
+                self._repo(origin), "me", ledger=ledger
+            )
+
+        (_, with_other), (cloned, claimed_by_sibling) = asyncio.run(run())
+
+        assert with_other.commits == 3
+        assert cloned is True and claimed_by_sibling is None
+
+    def test_a_name_equal_to_the_login_is_not_the_user(self, origin, store, tmp_path):
+        work = tmp_path / "work"
+        self._commit(work, {"impostor.py": "i\n"}, author="me <someone@example.com>")
+        subprocess.run(["git", "push", "-q", str(origin), "HEAD"], cwd=work, check=True)
+
+        _, contribution = asyncio.run(
+            attribution.analyze_repo_from_clone(self._repo(origin), "me")
+        )
+
+        assert contribution.commits == 2
+
+    def test_personal_emails_without_authors_are_left_to_the_api(
+        self, store, tmp_path
+    ):
+        work = tmp_path / "personal"
+        work.mkdir()
+        self._git(work, "init", "-q")
+        self._commit(work, {"app.py": "x\n"}, author="Me <me@personal.dev>")
+        bare = tmp_path / "personal.git"
+        subprocess.run(["git", "clone", "-q", "--bare", str(work), str(bare)], check=True)
+        progress = attribution.WalkProgress()
+
+        async def run():
+            return [
+                await attribution.analyze_repo_from_clone(
+                    self._repo(bare), "me", progress, authors=authors
+                )
+                for authors in (None, ["me@personal.dev"])
+            ]
+
+        unmatched, matched = asyncio.run(run())
+
+        assert unmatched == (False, None)
+        assert matched[0] is True and matched[1].commits == 1
+        assert list(progress.settled) == ["me/r"]
+        assert progress.settled["me/r"] is not None
+
+    def test_large_repos_diff_only_the_users_commits(
+        self, origin, store, monkeypatch
+    ):
+        monkeypatch.setattr(attribution.settings, "clone_full_max_size_mb", 0)
+        cloned_with = []
+        real_clone = attribution._clone
+
+        async def recording_clone(url, directory, blobless):
+            cloned_with.append(blobless)
+            return await real_clone(url, directory, blobless)
+
+        monkeypatch.setattr(attribution, "_clone", recording_clone)
+
+        _, contribution = asyncio.run(
+            attribution.analyze_repo_from_clone(
+                self._repo(origin), "me", authors=["other"]
+            )
+        )
+
+        assert cloned_with == [True]
+        assert contribution.commits == 3
+        assert contribution.additions == 8
+        # Nobody else's diffs were read, so there is no total to share.
+        assert contribution.contribution_percentage is None
+
+    def test_unclonable_repos_are_left_to_the_api(self, origin, store, tmp_path):
+        too_big = self._repo(origin, size=10**9)
+        missing = self._repo(origin, clone_url=str(tmp_path / "nope.git"))
+
+        async def run():
+            return [
+                await attribution.analyze_repo_from_clone(repo, "me")
+                for repo in (too_big, missing)
+            ]
+
+        assert asyncio.run(run()) == [(False, None), (False, None)]
+        assert store == {}
@@ -14,6 +14,7 @@ import time
 import httpx
 import pytest
 
+from core import cache
 from core.cache import UpstashRestRedis
 
 
@@ -66,10 +67,22 @@ class FakeUpstash:
             self.expiry[key] = time.time() + int(command[2])
             return httpx.Response(200, json={"result": 1})
         if name == "DEL":
-            existed = self._live(key)
-            self.store.pop(key, None)
-            self.expiry.pop(key, None)
-            return httpx.Response(200, json={"result": 1 if existed else 0})
+            removed = 0
+            for target in command[1:]:
+                removed += 1 if self._live(target) else 0
+                self.store.pop(target, None)
+                self.expiry.pop(target, None)
+            return httpx.Response(200, json={"result": removed})
+        if name == "SADD":
+            members = self.store.setdefault(key, set()) if self._live(key) else set()
+            self.store[key] = members | set(command[2:])
+            return httpx.Response(200, json={"result": len(command) - 2})
+        if name == "MGET":
+            values = [self.store.get(k) if self._live(k) else None for k in command[1:]]
+            return httpx.Response(200, json={"result": values})
+        if name == "SMEMBERS":
+            members = self.store.get(key) if self._live(key) else set()
+            return httpx.Response(200, json={"result": sorted(members or [])})
 
         return httpx.Response(400, json={"error": "unknown"})
 
@@ -157,6 +170,11 @@ class TestRedisSemantics:
 
         assert asyncio.run(run()) <= 30
 
+    def test_eval_is_one_command_with_its_keys_and_args(self):
+        fake = FakeUpstash()
+        asyncio.run(make(fake).eval("return 1", 1, "k", 5))
+        assert fake.requests == [["EVAL", "return 1", "1", "k", "5"]]
+
     def test_integers_are_stringified_for_the_wire(self):
         fake = FakeUpstash()
         asyncio.run(make(fake).setex("k", 60, "v"))
@@ -176,3 +194,158 @@ class TestFailureHandling:
 
     def test_incr_reports_zero(self):
         assert asyncio.run(make(FakeUpstash(fail=True)).incr("k")) == 0
+
+
+class TestTagPurge:
+    """Opaque keys must still be removable by user or repository."""
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        fake = FakeUpstash()
+        monkeypatch.setattr(cache, "_client", make(fake))
+        return fake
+
+    def test_purging_a_tag_drops_exactly_its_keys(self, client):
+        async def run():
+            for key in ("cache:a", "cache:b", "gh:attr:x", "cache:other"):
+                await cache._client.setex(key, 60, "v")
+            # No EVAL in the fake, so this also covers the command fallback.
+            await cache.tag_keys(["cache:a", "cache:b"], [cache.user_tag("Me")], 60)
+            await cache.tag_keys(
+                ["gh:attr:x"], [cache.user_tag("me"), cache.repo_tag("me/proj")], 60
+            )
+            purged = await cache.purge_tags([cache.user_tag("me")])
+            return purged, [await cache._client.get(k) for k in ("cache:a", "gh:attr:x", "cache:other")]
+
+        purged, remaining = asyncio.run(run())
+
+        assert purged == 3
+        assert remaining == [None, None, "v"]
+        assert "tag:user:me" not in client.store
+
+    def test_tag_outlives_its_longest_lived_key(self, client):
+        async def run():
+            await cache.tag_keys(["k1"], ["user:me"], 604800)
+            await cache.tag_keys(["k2"], ["user:me"], 300)
+            return await cache._client.ttl("tag:user:me")
+
+        assert asyncio.run(run()) > 300
+
+    def test_each_week_indexes_into_its_own_set(self, client, monkeypatch):
+        week = cache.TAG_GENERATION_SECONDS
+        clock = {"now": 1.5 * week}
+        monkeypatch.setattr(cache, "time", type("Clock", (), {"time": lambda: clock["now"]}))
+
+        async def run():
+            for key in ("old", "new"):
+                await cache._client.setex(key, 600, "v")
+            await cache.tag_keys(["old"], ["user:me"], 60)
+            clock["now"] += week
+            await cache.tag_keys(["new"], ["user:me"], 600)
+            ttls = [await cache._client.ttl(f"tag:user:me:{g}") for g in (1, 2)]
+            return ttls, await cache.purge_tags(["user:me"])
+
+        (old_ttl, new_ttl), purged = asyncio.run(run())
+
+        # Last week's set is not kept alive by this week's writes.
+        assert old_ttl <= 60 < new_ttl
+        assert purged == 2
+        assert not any(key.startswith("tag:") for key in client.store)
+
+    def test_already_expired_keys_are_not_counted(self, client):
+        async def run():
+            await cache.tag_keys(["gone"], ["user:me"], 60)
+            return await cache.purge_tags(["user:me"])
+
+        assert asyncio.run(run()) == 0
+
+
+class TestBatchRead:
+    @pytest.fixture
+    def fake(self, monkeypatch):
+        fake = FakeUpstash()
+        monkeypatch.setattr(cache, "_client", make(fake))
+        return fake
+
+    def test_one_command_returns_only_readable_hits(self, fake):
+        async def run():
+            await cache.set_json("a", {"n": 1}, 60)
+            await cache._client.setex("broken", 60, "{not json")
+            fake.requests.clear()
+            return await cache.get_many_json(["a", "missing", "broken"])
+
+        assert asyncio.run(run()) == {"a": {"n": 1}}
+        assert fake.requests == [["MGET", "a", "missing", "broken"]]
+
+    def test_failed_read_is_distinguished_from_all_misses(self, monkeypatch):
+        monkeypatch.setattr(cache, "_client", make(FakeUpstash(fail=True)))
+
+        assert asyncio.run(cache.get_many_json(["a"])) is None
+
+
+class TestScriptCache:
+    """Scripts are sent once and called by digest after that."""
+
+    SCRIPT = "return tonumber(ARGV[1]) + 1"
+
+    @pytest.fixture
+    def server(self, monkeypatch):
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")
+        server = fakeredis.FakeAsyncRedis(decode_responses=True)
+        sent = []
+        eval_ = server.eval
+
+        async def counting_eval(script, numkeys, *keys_and_args):
+            sent.append(script)
+            return await eval_(script, numkeys, *keys_and_args)
+
+        server.eval = counting_eval
+        monkeypatch.setattr(cache, "_client", server)
+        monkeypatch.setattr(cache, "_script_shas", {})
+        return server, sent
+
+    def test_body_is_not_resent_once_loaded(self, server):
+        _, sent = server
+
+        async def run():
+            return [await cache.run_script(self.SCRIPT, [], [n]) for n in (1, 2, 3)]
+
+        assert asyncio.run(run()) == [2, 3, 4]
+        assert sent == []
+
+    def test_flushed_script_falls_back_to_eval(self, server):
+        client, sent = server
+
+        async def run():
+            first = await cache.run_script(self.SCRIPT, [], [1])
+            await client.script_flush()
+            return first, await cache.run_script(self.SCRIPT, [], [2])
+
+        assert asyncio.run(run()) == (2, 3)
+        assert sent == [self.SCRIPT]
+
+    def test_upstash_noscript_is_resent_through_eval(self, monkeypatch):
+        fake = FakeUpstash()
+        handler = fake.handler
+
+        def scripted(request):
+            name = json.loads(request.content)[0].upper()
+            if name == "SCRIPT":
+                fake.requests.append(json.loads(request.content))
+                return httpx.Response(200, json={"result": "abc123"})
+            if name == "EVALSHA":
+                fake.requests.append(json.loads(request.content))
+                return httpx.Response(400, json={"error": "NOSCRIPT No matching script"})
+            if name == "EVAL":
+                fake.requests.append(json.loads(request.content))
+                return httpx.Response(200, json={"result": 7})
+            return handler(request)
+
+        fake.handler = scripted
+        monkeypatch.setattr(cache, "_client", make(fake))
+        monkeypatch.setattr(cache, "_script_shas", {})
+
+        assert asyncio.run(cache.run_script("return 7", ["k"], [])) == 7
+        assert [command[0] for command in fake.requests] == ["SCRIPT", "EVALSHA", "EVAL"]
+        assert fake.requests[1][:3] == ["EVALSHA", "abc123", "1"]
@@ -0,0 +1,78 @@
+"""Spellings of the same request must share one cache entry.
+
+Each equivalence class below used to be several entries, each paying for its
+own cold build -- and README cards get embedded with every spelling there is.
+"""
+
+from urllib.parse import parse_qsl
+
+import pytest
+
+from core.cache_keys import canonical_request
+
+
+def _key(url):
+    path, _, query = url.partition("?")
+    return canonical_request(path, parse_qsl(query, keep_blank_values=True))
+
+
+EQUIVALENT = [
+    ["/tashifkhan/stats", "/TashifKhan/stats", "/TASHIFKHAN/stats/"],
+    [
+        "/me/stats/svg",
+        "/me/stats/svg?theme=dark",
+        "/me/stats/svg?theme=DARK",
+        "/me/stats/svg?attributed=true",
+        "/me/stats/svg?attributed=1&theme=dark",
+        "/me/stats/svg?exclude=",
+    ],
+    [
+        "/me/stats/svg?exclude=Go,Rust",
+        "/me/stats/svg?exclude=Rust,Go",
+        "/me/stats/svg?exclude=Rust,%20Go,Rust",
+        "/me/stats/svg?excluded=Rust&excluded=Go",
+        "/me/stats/svg?exclude=Go&exclude=Rust,Go",
+    ],
+    [
+        "/me/languages",
+        "/me/languages?exclude=Markdown,JSON,YAML,XML",
+        "/me/languages?exclude=XML,YAML,JSON,Markdown",
+        "/me/languages?attributed=yes&include_forks=on",
+        # An empty ``exclude`` falls back to the default, as the route does.
+        "/me/languages?exclude=",
+    ],
+    ["/me/languages?attributed=false", "/me/languages?attributed=0", "/me/languages?attributed=OFF"],
+    ["/me/pinned", "/me/pinned?first=6", "/me/pinned?first=06"],
+    ["/me/heatmap", "/me/heatmap?view=all", "/me/heatmap?view=ALL"],
+    ["/me/star-lists", "/me/star-lists?include_repos=True"],
+]
+
+DISTINCT = [
+    ["/me/stats", "/someone/stats"],
+    ["/me/stats/svg", "/me/stats/svg?theme=light"],
+    ["/me/stats/svg?exclude=Go", "/me/stats/svg?exclude=go"],
+    ["/me/stats/svg", "/me/stats/svg?attributed=false"],
+    # The defaults differ per route: /languages drops prose formats unasked,
+    # and only an explicitly empty legacy list turns that off.
+    ["/me/languages", "/me/languages?excluded="],
+    # One legacy language called "A,B" is not two languages.
+    ["/me/stats?exclude=A,B", "/me/stats?excluded=A,B"],
+    ["/me/pinned?first=3", "/me/pinned"],
+    # Undeclared parameters are kept rather than guessed at.
+    ["/me/stats", "/me/stats?v=2"],
+    ["/me/unknown-route?a=1", "/me/unknown-route?a=2"],
+]
+
+
+@pytest.mark.parametrize("urls", EQUIVALENT, ids=lambda urls: urls[0])
+def test_equivalent_spellings_share_a_key(urls):
+    assert len({_key(url) for url in urls}) == 1
+
+
+@pytest.mark.parametrize("urls", DISTINCT, ids=lambda urls: " vs ".join(urls))
+def test_different_requests_keep_their_own_keys(urls):
+    assert len({_key(url) for url in urls}) == len(urls)
+
+
+def test_unknown_routes_still_sort_their_query():
+    assert _key("/me/new?b=2&a=1") == _key("/me/new?a=1&b=2")
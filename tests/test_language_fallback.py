@@ -77,6 +77,11 @@ class TestCoverageGate:
         stubbed["walk"] = _walk(1.0, langs=())
         assert [l.name for l in _run()] == ["Python"]
 
+    def test_gate_can_weigh_coverage_by_volume(self, stubbed, monkeypatch):
+        monkeypatch.setattr(attribution_settings, "coverage_by_volume", True)
+        stubbed["walk"] = _walk(0.2).model_copy(update={"volume_coverage": 0.95})
+        assert [l.name for l in _run()] == ["Rust"]
+
 
 class TestPartialFailures:
     def test_walk_failure_falls_back_to_legacy(self, stubbed):
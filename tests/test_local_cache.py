@@ -0,0 +1,162 @@
+"""The SQLite backend must behave like Redis for everything the app issues.
+
+Without Redis the app used to run uncached, so on a self-hosted box every
+restart -- and every request -- started cold and attribution never warmed.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from core import cache, popularity, rate_limit
+from core.local_cache import SqliteRedis
+
+
+@pytest.fixture
+def db(tmp_path):
+    return SqliteRedis(str(tmp_path / "cache" / "api.sqlite3"))
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class TestStrings:
+    def test_set_then_get_round_trips(self, db):
+        run(db.setex("k", 60, '{"a":1}'))
+        assert run(db.get("k")) == '{"a":1}'
+
+    def test_expired_key_reads_as_missing(self, db):
+        run(db.setex("k", 60, "v"))
+        db._conn.execute("UPDATE entries SET expires_at = ?", (time.time() - 1,))
+
+        assert run(db.get("k")) is None
+        assert run(db.ttl("k")) == -2
+
+    def test_mget_keeps_order_and_skips_expired(self, db):
+        run(db.setex("a", 60, "1"))
+        run(db.setex("b", 60, "2"))
+        db._conn.execute("UPDATE entries SET expires_at = ? WHERE key = 'b'", (time.time() - 1,))
+
+        assert run(db.mget(["b", "missing", "a"])) == [None, None, "1"]
+
+    def test_incr_counts_up_and_has_no_expiry(self, db):
+        assert [run(db.incr("c")), run(db.incr("c"))] == [1, 2]
+        assert run(db.ttl("c")) == -1
+
+    def test_expire_and_ttl(self, db):
+        run(db.setex("k", 600, "v"))
+        assert run(db.expire("k", 30)) == 1
+        assert 25 <= run(db.ttl("k")) <= 30
+        assert run(db.expire("absent", 30)) == 0
+
+    def test_delete_counts_only_live_keys(self, db):
+        run(db.setex("a", 60, "v"))
+        run(db.sadd("s", "x"))
+
+        assert run(db.delete("a", "s", "absent")) == 2
+        assert run(db.smembers("s")) == []
+
+
+class TestCollections:
+    def test_sadd_is_a_set(self, db):
+        assert run(db.sadd("s", "a", "b")) == 2
+        assert run(db.sadd("s", "b", "c")) == 1
+        assert sorted(run(db.smembers("s"))) == ["a", "b", "c"]
+
+    def test_expired_set_starts_again_empty(self, db):
+        run(db.sadd("s", "old"))
+        run(db.expire("s", 60))
+        db._conn.execute("UPDATE entries SET expires_at = ?", (time.time() - 1,))
+
+        run(db.sadd("s", "new"))
+
+        assert run(db.smembers("s")) == ["new"]
+
+    def test_sorted_set_ranks_by_score(self, db):
+        run(db.zincrby("z", 1, "a"))
+        run(db.zincrby("z", 5, "b"))
+        run(db.zincrby("z", 2, "a"))
+
+        assert run(db.zrevrange("z", 0, -1, withscores=True)) == [("b", 5.0), ("a", 3.0)]
+        assert run(db.zrevrange("z", 0, 0)) == ["b"]
+
+    def test_negative_range_ends_count_from_the_last_element(self, db):
+        for score, member in enumerate("abcd"):
+            run(db.zincrby("z", score, member))
+
+        assert run(db.zrevrange("z", 0, -2)) == ["d", "c", "b"]
+        assert run(db.zrevrange("z", 1, -3)) == ["c"]
+        assert run(db.zrevrange("z", -2, -1)) == ["b", "a"]
+        assert run(db.zrevrange("z", 0, -5)) == []
+
+
+class TestDurability:
+    def test_survives_a_restart(self, db, tmp_path):
+        run(db.setex("k", 60, "v"))
+
+        reopened = SqliteRedis(str(tmp_path / "cache" / "api.sqlite3"))
+
+        assert run(reopened.get("k")) == "v"
+
+    def test_compaction_removes_expired_rows(self, db):
+        run(db.setex("live", 60, "v"))
+        run(db.setex("dead", 60, "v"))
+        run(db.sadd("dead-set", "x"))
+        run(db.expire("dead-set", 60))
+        db._conn.execute(
+            "UPDATE entries SET expires_at = ? WHERE key LIKE 'dead%'", (time.time() - 1,)
+        )
+
+        assert db.compact() == 2
+        assert db._conn.execute("SELECT COUNT(*) FROM members").fetchone()[0] == 0
+        assert run(db.get("live")) == "v"
+
+
+class TestAsTheAppsCache:
+    @pytest.fixture
+    def client(self, monkeypatch, db):
+        monkeypatch.setattr(cache, "_client", db)
+        return db
+
+    def test_scripts_fail_soft_so_callers_fall_back(self, client):
+        assert run(cache.run_script("return 1", [], [])) is None
+
+    def test_json_helpers_and_tag_purge_work(self, client):
+        async def scenario():
+            await cache.set_json("cache:a", {"x": 1}, 60)
+            await cache.tag_keys(["cache:a"], [cache.user_tag("me")], 60)
+            first = await cache.get_json("cache:a")
+            purged = await cache.purge_tags([cache.user_tag("me")])
+            return first, purged, await cache.get_json("cache:a")
+
+        assert run(scenario()) == ({"x": 1}, 1, None)
+
+    def test_rate_limits_are_shared_between_workers(self, monkeypatch, db, tmp_path):
+        # Two connections to one file, as two uvicorn workers would hold.
+        workers = [db, SqliteRedis(str(tmp_path / "cache" / "api.sqlite3"))]
+        # Full headroom, so every check goes past the per-process bucket.
+        monkeypatch.setattr(rate_limit, "local_limiter", rate_limit.LocalRateLimiter(100, 1.0))
+        verdicts = []
+        for attempt in range(4):
+            monkeypatch.setattr(cache, "_client", workers[attempt % 2])
+            result = run(rate_limit.check_rate_limit("ip:github:1.2.3.4", 3, 60, "ip"))
+            verdicts.append(result.allowed)
+
+        assert verdicts == [True, True, True, False]
+
+    def test_popularity_counts_without_scripting(self, client):
+        run(popularity.record_hit("github", "me"))
+
+        assert run(popularity.hottest("github", 1)) == [("me", 1.0)]
+
+    def test_unwritable_path_leaves_the_app_uncached(self, monkeypatch, tmp_path):
+        blocker = tmp_path / "file"
+        blocker.write_text("")
+        monkeypatch.setattr(cache, "_client", None)
+        monkeypatch.setattr(cache.settings, "redis_url", None)
+        monkeypatch.setattr(cache.settings, "upstash_rest_url", None)
+        monkeypatch.setattr(cache.settings, "local_cache_path", str(blocker / "api.sqlite3"))
+
+        assert cache.get_redis() is None
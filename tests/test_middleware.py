@@ -0,0 +1,254 @@
+"""The response cache must answer revalidations without resending the body.
+
+README badges are polled constantly by GitHub's camo proxy and by browsers.
+Without validators every one of those polls downloaded the whole SVG again;
+with them the common case is a bodiless 304.
+"""
+
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import core.middleware as middleware
+from core import rate_limit
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """An in-memory stand-in for the JSON helpers the middleware caches through."""
+    data = {}
+    rate_limit.local_limiter._buckets.clear()
+
+    async def fake_get(key):
+        return data.get(key)
+
+    async def fake_set(key, value, ttl_seconds):
+        data[key] = value
+
+    monkeypatch.setattr(middleware, "get_json", fake_get)
+    monkeypatch.setattr(middleware, "set_json", fake_set)
+    return data
+
+
+@pytest.fixture
+def client(store):
+    app = FastAPI()
+    app.add_middleware(middleware.CacheRateLimitMiddleware, platform="github")
+    app.state.builds = 0
+
+    @app.get("/{username}/stats")
+    async def stats(username: str):
+        app.state.builds += 1
+        return {"username": username, "commits": 42}
+
+    return TestClient(app)
+
+
+class TestValidators:
+    def test_miss_carries_etag_and_last_modified(self, client):
+        response = client.get("/me/stats")
+
+        assert response.status_code == 200
+        assert response.headers["x-cache"] == "MISS"
+        assert response.headers["etag"].startswith('"')
+        assert response.headers["last-modified"].endswith("GMT")
+
+    def test_hit_repeats_the_same_etag(self, client):
+        first = client.get("/me/stats")
+        second = client.get("/me/stats")
+
+        assert second.headers["x-cache"] == "HIT"
+        assert second.headers["etag"] == first.headers["etag"]
+
+
+class TestConditionalRequests:
+    def test_matching_etag_is_a_bodiless_304(self, client):
+        etag = client.get("/me/stats").headers["etag"]
+
+        response = client.get("/me/stats", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+        assert client.app.state.builds == 1
+
+    def test_weakened_etag_still_matches(self, client):
+        # Proxies that re-encode a body pass the validator on as weak.
+        etag = client.get("/me/stats").headers["etag"]
+
+        response = client.get("/me/stats", headers={"If-None-Match": f"W/{etag}"})
+
+        assert response.status_code == 304
+
+    def test_stale_etag_gets_the_full_body(self, client):
+        client.get("/me/stats")
+
+        response = client.get("/me/stats", headers={"If-None-Match": '"stale"'})
+
+        assert response.status_code == 200
+        assert response.json()["commits"] == 42
+
+    def test_if_modified_since_alone_revalidates(self, client):
+        last_modified = client.get("/me/stats").headers["last-modified"]
+
+        response = client.get("/me/stats", headers={"If-Modified-Since": last_modified})
+
+        assert response.status_code == 304
+
+    def test_first_request_can_already_be_not_modified(self, client, store):
+        # The client kept the body from an entry that has since expired, and the
+        # rebuild produced identical bytes.
+        etag = client.get("/me/stats").headers["etag"]
+        store.clear()
+
+        response = client.get("/me/stats", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.headers["x-cache"] == "MISS"
+
+
+class TestSingleRoundTrip:
+    """With scripting available the lookup and both limits cost one call."""
+
+    class Calls(list):
+        reply = None
+
+    @pytest.fixture
+    def scripted(self, monkeypatch, store):
+        calls = self.Calls()
+
+        async def fake_run_script(script, keys, args):
+            calls.append((keys, args))
+            return calls.reply
+
+        async def no_sequential_reads(key):
+            raise AssertionError("the scripted path must not fall back")
+
+        calls.reply = ["miss", "", "handle", 1, 0, 30, 29, 0]
+        monkeypatch.setattr(middleware, "run_script", fake_run_script)
+        monkeypatch.setattr(middleware, "get_json", no_sequential_reads)
+        return calls
+
+    def test_miss_sends_every_key_in_one_script_call(self, client, scripted):
+        response = client.get("/me/stats")
+
+        assert response.status_code == 200
+        assert len(scripted) == 1
+        keys, args = scripted[0]
+        # Entry, validator record, negative marker, one key per rule and the
+        # popularity bucket.
+        assert len(keys) == 3 + 4 + 1
+        assert "rlw:handle:github:me" in keys
+        assert keys[-1].startswith("hot:github:")
+        assert "me" in args
+
+    def test_limited_reply_is_a_429(self, client, scripted):
+        scripted.reply = ["miss", "", "ip", 0, 20, 60, 0, 1234]
+
+        response = client.get("/me/stats")
+
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "20"
+        assert response.json()["limitedBy"] == "ip"
+        assert client.app.state.builds == 0
+
+    def test_negative_hit_reply_is_a_404(self, client, scripted):
+        scripted.reply = ["invalid", "", "invalid-handle", 1, 0, 5, 4, 0]
+
+        response = client.get("/ghost/stats")
+
+        assert response.status_code == 404
+        assert response.headers["x-cache"] == "NEGATIVE-HIT"
+
+    def test_etag_digests_are_passed_bare(self, client, scripted):
+        client.get("/me/stats", headers={"If-None-Match": 'W/"abc", "def"'})
+
+        _, args = scripted[0]
+        assert args[-3:] == [2, "abc", "def"]
+
+
+class TestScriptedValidators:
+    """The lookup script itself, run on a real Lua interpreter."""
+
+    @pytest.fixture
+    def redis_server(self, monkeypatch, store):
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")
+        server = fakeredis.FakeRedis(decode_responses=True)
+
+        async def run_script(script, keys, args):
+            return server.eval(script, len(keys), *keys, *args)
+
+        async def fake_set(key, value, ttl_seconds):
+            store[key] = value
+            server.set(key, json.dumps(value))
+
+        monkeypatch.setattr(middleware, "run_script", run_script)
+        monkeypatch.setattr(middleware, "set_json", fake_set)
+        return server
+
+    def test_only_the_whole_etag_matches(self, client, redis_server):
+        etag = client.get("/me/stats").headers["etag"]
+
+        assert client.get("/me/stats", headers={"If-None-Match": etag}).status_code == 304
+        assert client.get("/me/stats", headers={"If-None-Match": "*"}).status_code == 304
+        for stranger in (f'"{etag.strip(chr(34))[:1]}"', '"public"', 'W/"1"'):
+            response = client.get("/me/stats", headers={"If-None-Match": stranger})
+            assert response.status_code == 200, stranger
+
+
+class TestForcedRefresh:
+    @pytest.fixture
+    def token(self, monkeypatch):
+        monkeypatch.setattr(middleware.settings, "cache_purge_token", "sekrit")
+        return "sekrit"
+
+    def test_valid_token_rebuilds_a_cached_entry(self, client, token):
+        client.get("/me/stats")
+
+        response = client.get("/me/stats", headers={"X-Cache-Refresh": token})
+
+        assert response.headers["x-cache"] == "MISS"
+        assert client.app.state.builds == 2
+        assert client.get("/me/stats").headers["x-cache"] == "HIT"
+
+    def test_wrong_token_is_ignored(self, client, token):
+        client.get("/me/stats")
+
+        response = client.get("/me/stats", headers={"X-Cache-Refresh": "guess"})
+
+        assert response.headers["x-cache"] == "HIT"
+        assert client.app.state.builds == 1
+
+    def test_header_does_nothing_without_a_configured_token(self, client, monkeypatch):
+        monkeypatch.setattr(middleware.settings, "cache_purge_token", None)
+        client.get("/me/stats")
+
+        response = client.get("/me/stats", headers={"X-Cache-Refresh": ""})
+
+        assert response.headers["x-cache"] == "HIT"
+
+
+class TestCanonicalHandle:
+    def test_body_is_rendered_from_the_lowercased_handle(self, client):
+        first = client.get("/TashifKhan/stats")
+        second = client.get("/tashifkhan/stats")
+
+        assert first.json()["username"] == "tashifkhan"
+        assert second.headers["x-cache"] == "HIT"
+        assert second.content == first.content
+
+    def test_rest_of_the_path_keeps_its_case(self, store):
+        app = FastAPI()
+        app.add_middleware(middleware.CacheRateLimitMiddleware, platform="github")
+
+        @app.get("/{username}/Stats")
+        async def stats(username: str):
+            return {"username": username}
+
+        response = TestClient(app).get("/Me/Stats")
+
+        assert response.status_code == 200
+        assert response.json() == {"username": "me"}
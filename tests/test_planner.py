@@ -0,0 +1,192 @@
+import asyncio
+import json
+
+import pytest
+
+from models.attribution import RepoContribution
+from routes import analytics as analytics_routes
+from services import attribution, planner, repo_cache
+
+PUSHED = "2026-03-01T00:00:00Z"
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, payload=None, headers=None):
+        self.status_code = status_code
+        self._payload = payload
+        self.headers = headers or {}
+
+    def json(self):
+        return self._payload
+
+
+def _repo(full_name, size=100, fork=False):
+    owner, name = full_name.split("/")
+    return {
+        "name": name,
+        "full_name": full_name,
+        "owner": {"login": owner},
+        "fork": fork,
+        "size": size,
+        "pushed_at": PUSHED,
+    }
+
+
+@pytest.fixture
+def store(monkeypatch):
+    data = {}
+
+    async def fake_get(key):
+        return data.get(key)
+
+    async def fake_many(keys):
+        return {key: data[key] for key in keys if key in data}
+
+    monkeypatch.setattr(attribution.cache, "get_json", fake_get)
+    monkeypatch.setattr(attribution.cache, "get_many_json", fake_many)
+    return data
+
+
+@pytest.fixture
+def github(monkeypatch):
+    """The repo listing, 304 on a matching ETag; every other URL is a failure."""
+    state = {"repos": [], "etag": '"e1"', "remaining": "4000", "calls": []}
+
+    class Client:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def get(self, url, params=None, headers=None):
+            state["calls"].append(url)
+            if "/users/" not in url:
+                return FakeResponse(500)
+            rate = {"x-ratelimit-remaining": state["remaining"]}
+            if (headers or {}).get("If-None-Match") == state["etag"]:
+                return FakeResponse(304, headers=rate)
+            return FakeResponse(200, state["repos"], {"ETag": state["etag"], **rate})
+
+    monkeypatch.setattr(planner.httpx, "AsyncClient", Client)
+    return state
+
+
+def _plan(**kwargs):
+    plan = asyncio.run(planner.plan_user("me", "t", **kwargs))
+    return plan, {cost.endpoint: cost for cost in plan.endpoints}
+
+
+class TestColdAccount:
+    def test_predicts_every_endpoint_from_one_listing(self, store, github):
+        github["repos"] = [_repo("me/a", size=100), _repo("me/b", size=50), _repo("org/c")]
+
+        plan, costs = _plan()
+
+        assert len(github["calls"]) == 1
+        assert plan.rate_limit_remaining == 4000
+        # Listing, then per repo a listing page and the stats on top of the
+        # commits sized from the listing: 2, 1 and 2.
+        assert costs["contributions"].github_calls == 1 + 3 * 2 + 5
+        assert costs["contributions"].cached_repos == 0
+        assert costs["contributions"].complete
+        # /repos and /commits list only the repos the user owns.
+        assert costs["repos"].repos == 2
+        assert costs["repos"].github_calls == 1 + 2 * 5
+        assert costs["commits"].github_calls == 1 + 2
+
+    def test_forks_without_a_known_source_cost_a_lookup(self, store, github):
+        github["repos"] = [_repo("me/a", size=50, fork=True), _repo("me/b", size=50, fork=True)]
+        store[attribution._source_key("me/a")] = {"source": "up/a"}
+
+        _, costs = _plan()
+
+        assert costs["contributions"].calls_to_complete == 1 + 1 + 2 * (2 + 1)
+
+    def test_commit_diffs_are_capped_by_the_walk_budget(self, store, github, monkeypatch):
+        monkeypatch.setattr(attribution.settings, "max_commit_details", 3)
+        github["repos"] = [_repo("me/a", size=5000), _repo("me/b", size=5000)]
+
+        _, costs = _plan()
+
+        assert costs["contributions"].calls_to_complete == 1 + 2 * 2 + 3
+
+
+class TestWarmAccount:
+    def _warm(self, store, github, commits=250):
+        contribution = RepoContribution(
+            repo="a", owner="me", full_name="me/a", commits=commits, additions=10
+        )
+        github["repos"] = [_repo("me/a")]
+        store[attribution._manifest_key("me")] = {
+            "etag": github["etag"],
+            "listing": github["repos"],
+            "repos": {"me/a": {"pushed_at": PUSHED, "contribution": contribution.model_dump()}},
+        }
+        for kind in ("languages", "contributors"):
+            store[repo_cache.repo_key(kind, "me/a", PUSHED)] = {"value": {}}
+
+    def test_cached_work_costs_nothing(self, store, github):
+        self._warm(store, github)
+
+        _, costs = _plan()
+
+        assert costs["contributions"].github_calls == 0
+        assert costs["contributions"].cached_repos == 1
+        assert costs["repos"].cached_repos == 1
+        assert costs["repos"].github_calls == 1 + 3
+
+    def test_known_commit_counts_set_the_pages(self, store, github):
+        self._warm(store, github, commits=200)
+
+        _, costs = _plan()
+
+        # Two full pages, then the empty one that ends the walk.
+        assert costs["commits"].github_calls == 1 + 3
+
+
+class TestLimits:
+    def test_deadline_leaves_the_rest_for_later(self, store, github, monkeypatch):
+        monkeypatch.setattr(attribution.settings, "planner_call_seconds", 1.0)
+        monkeypatch.setattr(attribution.settings, "concurrency", 2)
+        github["repos"] = [_repo(f"me/r{i}", size=50) for i in range(10)]
+
+        _, costs = _plan(deadline_seconds=3)
+
+        contributions = costs["contributions"]
+        assert contributions.github_calls == 1 + 6
+        assert contributions.seconds == 4.0
+        assert not contributions.complete
+        assert contributions.calls_to_complete == 1 + 10 * 3
+
+    def test_rate_limit_floor_stops_the_walk_not_the_reads(self, store, github):
+        github["repos"] = [_repo(f"me/r{i}", size=50) for i in range(10)]
+        github["remaining"] = str(attribution.settings.rate_limit_floor + 5)
+
+        _, costs = _plan()
+
+        assert costs["contributions"].github_calls == 5
+        assert not costs["contributions"].complete
+        assert costs["repos"].complete
+
+
+class TestDryRunRoute:
+    def test_answers_with_the_plan_for_a_minute(self):
+        class FakeAnalyticsService:
+            async def get_user_cost_plan(self, username, include_forks=True):
+                return planner.CostPlan(username=username)
+
+            async def get_user_commits(self, username):
+                raise AssertionError("a dry run must not run the endpoint")
+
+        response = asyncio.run(
+            analytics_routes.get_user_commits(
+                "me", dry_run=True, analytics_service=FakeAnalyticsService()
+            )
+        )
+
+        assert json.loads(response.body)["username"] == "me"
+        assert response.headers["cache-control"] == "public, max-age=60"
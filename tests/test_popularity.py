@@ -0,0 +1,71 @@
+"""Request counts must rank users by recent interest, not all-time totals."""
+
+import asyncio
+
+import pytest
+
+from core import popularity
+
+
+class FakeSortedSets:
+    def __init__(self):
+        self.sets = {}
+
+    async def zincrby(self, key, amount, member):
+        scores = self.sets.setdefault(key, {})
+        scores[member] = scores.get(member, 0) + amount
+
+    async def expire(self, key, ttl_seconds):
+        return True
+
+    async def zrevrange(self, key, start, end, withscores=False):
+        rows = sorted(self.sets.get(key, {}).items(), key=lambda row: -row[1])
+        return rows[start : end + 1]
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeSortedSets()
+    monkeypatch.setattr(popularity, "get_redis", lambda: fake)
+    monkeypatch.setattr(popularity.settings, "hot_window_days", 7)
+    monkeypatch.setattr(popularity.settings, "hot_half_life_days", 1.0)
+    return fake
+
+
+def _count(redis, handle, hits, days_ago=0):
+    key = popularity.hot_key("github", popularity.day_index() - days_ago)
+    redis.sets.setdefault(key, {})[handle] = hits
+
+
+class TestHottest:
+    def test_recent_requests_outweigh_older_ones(self, redis):
+        _count(redis, "old-news", 30, days_ago=3)
+        _count(redis, "trending", 10)
+
+        ranked = asyncio.run(popularity.hottest("github", 2))
+
+        assert [handle for handle, _ in ranked] == ["trending", "old-news"]
+        # Three half-lives: 30 requests count as 3.75.
+        assert ranked[1][1] == pytest.approx(3.75)
+
+    def test_days_are_summed_per_user(self, redis):
+        _count(redis, "me", 4)
+        _count(redis, "me", 4, days_ago=1)
+
+        assert asyncio.run(popularity.hottest("github", 1)) == [("me", 6.0)]
+
+    def test_counts_outside_the_window_are_ignored(self, redis):
+        _count(redis, "gone", 1000, days_ago=7)
+
+        assert asyncio.run(popularity.hottest("github", 5)) == []
+
+    def test_record_hit_counts_today(self, redis):
+        asyncio.run(popularity.record_hit("github", "me"))
+        asyncio.run(popularity.record_hit("github", "me"))
+
+        assert asyncio.run(popularity.hottest("github", 1)) == [("me", 2.0)]
+
+    def test_no_redis_means_no_ranking(self, monkeypatch):
+        monkeypatch.setattr(popularity, "get_redis", lambda: None)
+
+        assert asyncio.run(popularity.hottest("github", 5)) == []
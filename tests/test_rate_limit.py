@@ -0,0 +1,193 @@
+"""The limiter must cost one round trip and never take a request down.
+
+It used to be a fixed-window counter built from half a dozen separate calls,
+which both raced (a lost EXPIRE left a counter that never reset) and let a
+client spend two windows' allowance across a window edge.
+"""
+
+import asyncio
+
+import pytest
+
+from core import rate_limit
+
+
+@pytest.fixture
+def script(monkeypatch):
+    calls = []
+    state = {"reply": [1, 0, 60, 59, 1000]}
+
+    async def fake_run_script(script, keys, args):
+        calls.append((script, keys, args))
+        return state["reply"]
+
+    monkeypatch.setattr(rate_limit, "run_script", fake_run_script)
+    # Full headroom: every check consults the shared limiter.
+    monkeypatch.setattr(rate_limit, "local_limiter", rate_limit.LocalRateLimiter(100, 1.0))
+    state["calls"] = calls
+    return state
+
+
+def _check():
+    return asyncio.run(rate_limit.check_rate_limit("ip:github:1.2.3.4", 60, 60, "ip"))
+
+
+class TestCheckRateLimit:
+    def test_one_script_call_on_one_key(self, script):
+        _check()
+
+        assert len(script["calls"]) == 1
+        _, keys, args = script["calls"][0]
+        assert keys == ["rlw:ip:github:1.2.3.4"]
+        assert args[:2] == [60, 60]
+
+    def test_reply_carries_limit_remaining_and_reset(self, script):
+        result = _check()
+
+        assert result.allowed is True
+        assert (result.limit, result.remaining, result.reset_at) == (60, 59, 1000)
+        assert result.limited_by == "ip"
+
+    def test_denial_reports_the_backoff(self, script):
+        script["reply"] = [0, 20, 60, 0, 1020]
+
+        result = _check()
+
+        assert result.allowed is False
+        assert result.retry_after == 20
+
+    def test_unavailable_redis_falls_back_to_the_local_bucket(self, script):
+        script["reply"] = None
+        assert _check().allowed is True
+
+
+class TestRateLimitRule:
+    def test_whole_state_lives_under_one_key(self):
+        # One key is what lets the script update counts, violation streak and
+        # backoff atomically, with a single EXPIRE covering all of them.
+        rule = rate_limit.RateLimitRule("handle:github:me", 30, 60, "handle")
+        assert rule.redis_keys == ["rlw:handle:github:me"]
+        assert rule.script_args == [30, 60, "handle"]
+
+
+def _rule(limit=4, window=60, key="ip:github:1.2.3.4"):
+    return rate_limit.RateLimitRule(key, limit, window, "ip")
+
+
+class TestLocalRateLimiter:
+    """Redis being down used to mean no limit at all."""
+
+    def test_refuses_once_the_bucket_is_empty(self):
+        limiter = rate_limit.LocalRateLimiter(100, 0.5)
+        verdicts = [limiter.take(_rule()).allowed for _ in range(5)]
+
+        assert verdicts == [True, True, True, True, False]
+
+    def test_refusal_says_when_a_token_returns(self):
+        limiter = rate_limit.LocalRateLimiter(100, 0.5)
+        for _ in range(4):
+            limiter.take(_rule())
+
+        refused = limiter.take(_rule())
+
+        # 4 per minute refills one token every 15 seconds.
+        assert 0 < refused.retry_after <= 15
+
+    def test_near_limit_only_once_headroom_is_spent(self):
+        limiter = rate_limit.LocalRateLimiter(100, 0.5)
+        flags = []
+        for _ in range(4):
+            flags.append(limiter.near_limit(_rule()))
+            limiter.take(_rule())
+
+        assert flags == [False, False, True, True]
+
+    def test_memory_is_bounded_by_evicting_the_oldest_key(self):
+        limiter = rate_limit.LocalRateLimiter(2, 0.5)
+        for key in ("a", "b", "c"):
+            limiter.take(_rule(key=key))
+
+        assert list(limiter._buckets) == ["b", "c"]
+
+
+class TestLocalPreFilter:
+    def test_roomy_bucket_skips_redis(self, script, monkeypatch):
+        monkeypatch.setattr(rate_limit, "local_limiter", rate_limit.LocalRateLimiter(100, 0.5))
+
+        assert _check().allowed is True
+        assert script["calls"] == []
+
+    def test_empty_local_bucket_refuses_without_asking_redis(self, script, monkeypatch):
+        monkeypatch.setattr(rate_limit, "local_limiter", rate_limit.LocalRateLimiter(100, 0.5))
+        rule = _rule(limit=60)
+        for _ in range(60):
+            rate_limit.local_limiter.take(rule)
+        script["calls"].clear()
+
+        assert _check().allowed is False
+        assert script["calls"] == []
+
+
+class TestSlidingWindowWithoutLua:
+    """The Python port must answer exactly as the script does."""
+
+    def test_matches_the_script_step_for_step(self):
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")
+        server = fakeredis.FakeRedis(decode_responses=True)
+        raw = None
+        # Within a window, across into the next, blocked, and long after.
+        for now in [100.0, 101.0, 102.0, 103.0, 104.0, 125.5, 130.0, 131.0, 400.0]:
+            args = [3, 20, now, 1, 8]
+            expected = server.eval(rate_limit.RATE_LIMIT_SCRIPT, 1, "rlw:k", *args)
+            raw, _, reply = rate_limit.sliding_window(raw, *args)
+            assert reply == expected, now
+
+    def test_requests_served_locally_match_the_script(self):
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")
+        server = fakeredis.FakeRedis(decode_responses=True)
+        raw = None
+        # Reported while open, while blocked, and into the next window.
+        for now, served in [(100.0, 2), (101.0, 0), (102.0, 3), (103.0, 1), (125.5, 2)]:
+            args = [5, 20, now, 1, 8, served]
+            expected = server.eval(rate_limit.RATE_LIMIT_SCRIPT, 1, "rlw:k", *args)
+            raw, _, reply = rate_limit.sliding_window(raw, *args)
+            assert reply == expected, now
+
+
+class TestManyInstances:
+    """Locally admitted requests must reach the shared count."""
+
+    def test_instances_together_stay_within_the_documented_bound(
+        self, monkeypatch, tmp_path
+    ):
+        from core import cache
+        from core.local_cache import SqliteRedis
+
+        monkeypatch.setattr(cache, "_client", SqliteRedis(str(tmp_path / "api.sqlite3")))
+        instances = [rate_limit.LocalRateLimiter(100, 0.5, batch=0.1) for _ in range(3)]
+        admitted = 0
+        for attempt in range(600):
+            monkeypatch.setattr(rate_limit, "local_limiter", instances[attempt % 3])
+            result = asyncio.run(rate_limit.check_rate_limit("ip:github:1.2.3.4", 100, 3600, "ip"))
+            admitted += result.allowed
+
+        # limit * (1 + N * batch). Unreported, each instance alone used to
+        # spend half its bucket first: 3 * 50 + 100.
+        assert 100 <= admitted <= 100 * (1 + 3 * 0.1)
+
+    def test_a_failed_report_is_sent_with_the_next(self, script, monkeypatch):
+        limiter = rate_limit.LocalRateLimiter(100, 0.0, batch=0.05)
+        monkeypatch.setattr(rate_limit, "local_limiter", limiter)
+        script["reply"] = None
+        for _ in range(3):
+            _check()
+
+        script["reply"] = [1, 0, 60, 50, 1000]
+        _check()
+
+        # Batches of three. The first report failed, so its two earlier
+        # requests and the one it judged travel with the next.
+        assert [args[-1] for _, _, args in script["calls"]] == [2, 3]
+        assert limiter.unreported(_rule(limit=60)) == 0
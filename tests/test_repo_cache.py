@@ -0,0 +1,199 @@
+import asyncio
+import contextlib
+import json
+
+import pytest
+
+from services import attribution, repo_cache
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, payload=None):
+        self.status_code = status_code
+        self._payload = payload
+        self.headers = {}
+
+    def json(self):
+        return self._payload
+
+    async def aiter_bytes(self):
+        yield json.dumps(self._payload).encode()
+
+
+@contextlib.asynccontextmanager
+async def streamed(response):
+    yield await response
+
+
+class FakeClient:
+    def __init__(self, routes):
+        self.routes = routes
+        self.calls = []
+
+    async def get(self, url, params=None, headers=None):
+        self.calls.append(url)
+        for fragment, response in self.routes.items():
+            if fragment in url:
+                return response
+        return FakeResponse(status_code=404)
+
+    def stream(self, method, url, headers=None):
+        return streamed(self.get(url, headers=headers))
+
+
+@pytest.fixture
+def reads():
+    return []
+
+
+@pytest.fixture
+def store(monkeypatch, reads):
+    data = {}
+
+    async def fake_get(key):
+        reads.append([key])
+        return data.get(key)
+
+    async def fake_many(keys):
+        reads.append(list(keys))
+        return {key: data[key] for key in keys if key in data}
+
+    async def fake_set(key, value, ttl):
+        data[key] = value
+
+    monkeypatch.setattr(repo_cache.cache, "get_json", fake_get)
+    monkeypatch.setattr(repo_cache.cache, "get_many_json", fake_many)
+    monkeypatch.setattr(repo_cache.cache, "set_json", fake_set)
+    return data
+
+
+def _repo(name="r", pushed_at="2026-03-01T00:00:00Z"):
+    return {"name": name, "full_name": f"o/{name}", "owner": {"login": "o"}, "pushed_at": pushed_at}
+
+
+class TestRepoLanguages:
+    def test_fetched_once_per_push_for_every_caller(self, store):
+        client = FakeClient({"/repos/o/r/languages": FakeResponse(payload={"Go": 10})})
+
+        async def run():
+            first = await repo_cache.languages(client, _repo(), "t")
+            second = await attribution._fetch_repo_language_bytes(client, _repo(), "t")
+            return first, second
+
+        assert asyncio.run(run()) == ({"Go": 10}, {"Go": 10})
+        assert len(client.calls) == 1
+
+    def test_entries_are_indexed_under_the_repo(self, store, monkeypatch):
+        tagged = []
+
+        async def fake_tag(keys, tags, ttl):
+            tagged.append((keys, tags))
+
+        monkeypatch.setattr(repo_cache.cache, "tag_keys", fake_tag)
+        client = FakeClient({"/repos/o/r/languages": FakeResponse(payload={"Go": 10})})
+
+        asyncio.run(repo_cache.languages(client, _repo(), "t"))
+
+        assert tagged == [(list(store), ["repo:o/r"])]
+
+    def test_a_new_push_is_fetched_again(self, store):
+        client = FakeClient({"/repos/o/r/languages": FakeResponse(payload={"Go": 10})})
+
+        async def run():
+            await repo_cache.languages(client, _repo(), "t")
+            await repo_cache.languages(client, _repo(pushed_at="2026-04-01T00:00:00Z"), "t")
+
+        asyncio.run(run())
+
+        assert len(client.calls) == 2
+
+    def test_failures_and_unversioned_repos_are_not_cached(self, store):
+        client = FakeClient({"/repos/o/r/languages": FakeResponse(status_code=500)})
+        unversioned = {"full_name": "o/r"}
+
+        async def run():
+            await repo_cache.languages(client, _repo(), "t")
+            await repo_cache.languages(client, _repo(), "t")
+            await repo_cache.languages(client, unversioned, "t")
+
+        asyncio.run(run())
+
+        assert len(client.calls) == 3
+        assert store == {}
+
+    def test_batch_reads_the_cache_once(self, store, reads):
+        store[repo_cache.repo_key("languages", "o/a", "2026-03-01T00:00:00Z")] = {
+            "value": {"Python": 5}
+        }
+        client = FakeClient({"/repos/o/b/languages": FakeResponse(payload={"Go": 7})})
+
+        result = asyncio.run(
+            repo_cache.languages_for(
+                client, [_repo("a"), _repo("b")], "t", asyncio.Semaphore(2)
+            )
+        )
+
+        assert result == [{"Python": 5}, {"Go": 7}]
+        assert client.calls == [f"{repo_cache.GITHUB_API}/repos/o/b/languages"]
+        assert len(reads) == 1
+
+
+class TestRepoContributors:
+    def test_reduced_to_the_fields_shown(self, store):
+        payload = [
+            {
+                "login": "a",
+                "avatar_url": "https://x/a",
+                "html_url": "https://github.com/a",
+                "contributions": 4,
+                "type": "User",
+                "site_admin": False,
+            },
+            {"login": "anonymous"},
+        ]
+        client = FakeClient({"/repos/o/r/contributors": FakeResponse(payload=payload)})
+
+        result = asyncio.run(repo_cache.contributors(client, _repo(), "t"))
+
+        assert result == [
+            {
+                "login": "a",
+                "avatar_url": "https://x/a",
+                "html_url": "https://github.com/a",
+                "contributions": 4,
+            }
+        ]
+        key = repo_cache.repo_key("contributors", "o/r", "2026-03-01T00:00:00Z")
+        assert store[key] == {"value": result}
+
+
+class TestUnwalkedContributorTotals:
+    def test_shares_the_walks_per_repo_cache(self, store):
+        payload = [
+            {"author": {"login": "me"}, "total": 2, "weeks": [{"a": 30, "d": 3}]},
+        ]
+        url = "/repos/o/r/stats/contributors"
+        client = FakeClient({url: FakeResponse(payload=payload)})
+        version = "2026-03-01T00:00:00Z"
+
+        async def run():
+            deadline = attribution.Deadline(None)
+            first = await attribution._fetch_contributor_totals(
+                client, "o", "r", "me", "t", deadline, version=version
+            )
+            second = await attribution._fetch_contributor_totals(
+                client, "o", "r", "someone", "t", deadline, version=version
+            )
+            return first, second
+
+        first, second = asyncio.run(run())
+
+        assert first["user_additions"] == 30
+        assert second == {
+            "user_additions": 0,
+            "user_deletions": 0,
+            "user_commits": 0,
+            "repo_additions": 30,
+        }
+        assert len(client.calls) == 1
+        assert attribution._stats_key("o/r", version) in store